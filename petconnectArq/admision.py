@@ -0,0 +1,118 @@
+import math
+import os
+import threading
+import time
+from conexion import pool
+from metricas import contar
+
+# Mensajes listos en la cola a partir de los cuales la web responde 429 y el
+# productor frena al máximo (0 = sin control de admisión)
+ADMISION_LIMITE = int(os.environ.get('PETCONNECT_ADMISION_LIMITE', '0'))
+# Cuánto se reutiliza una lectura de profundidad antes de volver a preguntar al broker
+ADMISION_CACHE_MS = int(os.environ.get('PETCONNECT_ADMISION_CACHE_MS', '500'))
+# Retry-After cuando no se puede estimar cuánto tarda en drenarse el exceso
+ADMISION_RETRY_AFTER = int(os.environ.get('PETCONNECT_ADMISION_RETRY_AFTER', '5'))
+ADMISION_RETRY_AFTER_MAX = 60
+
+class ColaSaturada(Exception):
+    """La cola superó el límite de admisión; reintentar en `reintentar_en` segundos."""
+    def __init__(self, cola, mensajes, reintentar_en):
+        super().__init__(f"Cola '{cola}' saturada ({mensajes} mensajes pendientes)")
+        self.cola = cola
+        self.mensajes = mensajes
+        self.reintentar_en = reintentar_en
+
+class ControlAdmision:
+    """Mide la profundidad de una cola y decide si aceptar más trabajo.
+
+    La profundidad sale de un queue_declare pasivo (message_count y
+    consumer_count) y se cachea `cache_ms` para que el chequeo no agregue un
+    round-trip al broker por cada solicitud. Con dos lecturas sucesivas se
+    estima a qué ritmo los consumidores están drenando la cola, que es lo que
+    determina el Retry-After. Con `canal` se usa ese canal en vez del pool.
+    """
+    def __init__(self, cola='solicitudes_adopcion', limite=ADMISION_LIMITE,
+                 cache_ms=ADMISION_CACHE_MS, retry_after=ADMISION_RETRY_AFTER, canal=None):
+        self.cola = cola
+        self.limite = limite
+        self.cache_segundos = cache_ms / 1000
+        self.retry_after = retry_after
+        self.canal = canal
+        self._lock = threading.Lock()
+        self._leido = None  # instante (monotonic) de la última lectura
+        self._mensajes = 0
+        self._consumidores = 0
+        self._tasa_drenaje = 0.0  # mensajes/s que salen de la cola (suavizado)
+
+    @property
+    def activo(self):
+        return self.limite > 0
+
+    def _consultar(self):
+        if self.canal is not None:
+            metodo = self.canal.queue_declare(queue=self.cola, passive=True).method
+        else:
+            with pool.canal() as canal:
+                metodo = canal.queue_declare(queue=self.cola, passive=True).method
+        return metodo.message_count, metodo.consumer_count
+
+    def _actualizar(self):
+        ahora = time.monotonic()
+        if self._leido is not None and ahora - self._leido < self.cache_segundos:
+            return
+        # Un solo hilo consulta al broker; el resto usa la lectura anterior
+        if not self._lock.acquire(blocking=self._leido is None):
+            return
+        try:
+            try:
+                mensajes, consumidores = self._consultar()
+            except Exception as e:
+                # 404 (ChannelClosedByBroker): la cola todavía no existe, así que no hay nada esperando.
+                # Sin lectura no se frena a nadie: el broker caído ya se reporta al publicar
+                if getattr(e, 'reply_code', None) != 404:
+                    print(f"[Admision] No se pudo leer la profundidad de '{self.cola}': {e}")
+                mensajes, consumidores = 0, 0
+            if self._leido is not None and ahora > self._leido:
+                drenaje = (self._mensajes - mensajes) / (ahora - self._leido)
+                self._tasa_drenaje = 0.7 * self._tasa_drenaje + 0.3 * drenaje
+            self._mensajes = mensajes
+            self._consumidores = consumidores
+            self._leido = ahora
+        finally:
+            self._lock.release()
+
+    def estado(self):
+        """Última lectura de la cola (refrescada si venció la cache), haya límite o no."""
+        self._actualizar()
+        return {
+            'cola': self.cola,
+            'limite': self.limite,
+            'mensajes': self._mensajes,
+            'consumidores': self._consumidores,
+            'tasa_drenaje': round(self._tasa_drenaje, 2)
+        }
+
+    def reintentar_en(self):
+        """Segundos estimados hasta que la cola vuelva a estar bajo el límite."""
+        exceso = self._mensajes - self.limite + 1
+        if self._tasa_drenaje > 0 and self._consumidores:
+            segundos = math.ceil(exceso / self._tasa_drenaje)
+        else:
+            segundos = self.retry_after
+        return max(1, min(segundos, ADMISION_RETRY_AFTER_MAX))
+
+    def admitir(self):
+        """Lanza ColaSaturada si la cola está en el límite."""
+        if not self.activo:
+            return
+        self._actualizar()
+        if self._mensajes >= self.limite:
+            contar('rechazados_admision', self.cola)
+            raise ColaSaturada(self.cola, self._mensajes, self.reintentar_en())
+
+    def ocupacion(self):
+        """Fracción del límite ocupada (0 si no hay control de admisión)."""
+        if not self.activo:
+            return 0.0
+        self._actualizar()
+        return self._mensajes / self.limite
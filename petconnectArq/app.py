@@ -1,36 +1,156 @@
-from flask import Flask, render_template, request, jsonify
-import pika
-import json
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+import functools
+import hmac
+import os
 import time
 import threading
-from datetime import datetime
+import uuid
+from collections import OrderedDict
+from conexion import pool, PRIORIDAD_WEB
+from reglas import evaluar_solicitud_web, tramo_salarial, SALARIO_MINIMO
+from cache import CacheLRU
+from catalogo import CatalogoMascotas
+from historial import HistorialResultados
+from codec import empaquetar, desempaquetar
+from metricas import metricas, Cronometro, contar
+from notificaciones import BufferNotificaciones, DifusorNotificaciones, flujo_sse
+from difusion import DifusionWeb, NOTIFICACIONES_COMPARTIDAS
+from admision import ControlAdmision, ColaSaturada
+from arranque import Diferido, reportar_arranque
+from trazas import tramo, trazado, encabezados_traza, activar_trazas, estado_trazas
+from perfilador import perfilador
 
 app = Flask(__name__)
 
+# Modo asíncrono: /solicitar_adopcion responde 202 y el procesador decide
+MODO_ASINCRONO = os.environ.get('PETCONNECT_MODO_ASINCRONO', '0') == '1'
+# Veredictos recientes por (usuario, mascota, tramo de salario): un reenvío no pasa por RabbitMQ
+CACHE_VEREDICTOS_TAMANO = int(os.environ.get('PETCONNECT_CACHE_VEREDICTOS_TAMANO', '10000'))
+CACHE_VEREDICTOS_TTL = int(os.environ.get('PETCONNECT_CACHE_VEREDICTOS_TTL', '300'))
+CAMPOS_VEREDICTO = ('aprobado', 'resultado', 'mascota_id', 'motivo', 'salario_usuario')
+# Token de /perfil y /trazas (cabecera X-PetConnect-Token); vacío = endpoints desactivados
+ADMIN_TOKEN = os.environ.get('PETCONNECT_ADMIN_TOKEN', '')
+# Cuánto puede ocupar /perfil un worker web
+PERFIL_MAX_SEGUNDOS = 15
+
+def requiere_admin(vista):
+    """Endpoints de operación: 404 sin PETCONNECT_ADMIN_TOKEN, 403 con token incorrecto."""
+    @functools.wraps(vista)
+    def envuelta(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'No encontrado'}), 404
+        if not hmac.compare_digest(request.headers.get('X-PetConnect-Token', ''), ADMIN_TOKEN):
+            return jsonify({'error': 'Token inválido'}), 403
+        return vista(*args, **kwargs)
+    return envuelta
+
+class AlmacenResultados:
+    """Resultados de solicitudes asíncronas indexados por correlation_id."""
+    def __init__(self, ttl_segundos=600, max_entradas=10000):
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._condicion = threading.Condition()
+    
+    def _purgar(self):
+        limite = time.time() - self.ttl_segundos
+        while self._entradas:
+            solicitud_id, entrada = next(iter(self._entradas.items()))
+            if entrada['creado'] >= limite and len(self._entradas) <= self.max_entradas:
+                break
+            self._entradas.popitem(last=False)
+    
+    def registrar(self, solicitud_id):
+        """Marca una solicitud como pendiente."""
+        with self._condicion:
+            if solicitud_id in self._entradas:
+                return
+            self._entradas[solicitud_id] = {
+                'estado': 'pendiente',
+                'resultado': None,
+                'creado': time.time()
+            }
+            self._purgar()
+    
+    def completar(self, solicitud_id, resultado, crear=False):
+        """Guarda el resultado y despierta a quien lo esté esperando."""
+        with self._condicion:
+            if solicitud_id not in self._entradas:
+                if not crear:
+                    return False
+                self._entradas[solicitud_id] = {'creado': time.time()}
+                self._purgar()
+            self._entradas[solicitud_id]['estado'] = 'completado'
+            self._entradas[solicitud_id]['resultado'] = resultado
+            self._condicion.notify_all()
+            return True
+    
+    def obtener(self, solicitud_id, esperar=0):
+        """Devuelve la entrada, esperando hasta `esperar` segundos si sigue pendiente."""
+        limite = time.time() + esperar
+        with self._condicion:
+            while True:
+                entrada = self._entradas.get(solicitud_id)
+                if entrada is None or entrada['estado'] != 'pendiente':
+                    return entrada
+                restante = limite - time.time()
+                if restante <= 0:
+                    return entrada
+                self._condicion.wait(restante)
+
 class RabbitMQManager:
     def __init__(self):
-        self.notifications = []
+        self.notifications = BufferNotificaciones()
+        self.difusor = DifusorNotificaciones()
+        self.resultados = AlmacenResultados()
+        self._escucha = None
+        # Con varios workers, notificaciones y resultados se replican por un exchange fanout
+        self.difusion = DifusionWeb(self) if NOTIFICACIONES_COMPARTIDAS else None
+        self.veredictos = CacheLRU(tamano_maximo=CACHE_VEREDICTOS_TAMANO, ttl_segundos=CACHE_VEREDICTOS_TTL)
+        # Rechaza solicitudes nuevas (429) mientras solicitudes_adopcion esté sobre el límite
+        self.admision = ControlAdmision('solicitudes_adopcion')
+    
+    def veredicto_reciente(self, mascota_id, usuario_nombre, usuario_salario):
+        """Veredicto cacheado de una solicitud equivalente, o None"""
+        if not CACHE_VEREDICTOS_TTL:
+            return None
+        veredicto = self.veredictos.get((usuario_nombre, mascota_id, tramo_salarial(usuario_salario)))
+        metricas.contador(
+            'petconnect_cache_veredictos_total', 'Consultas a la cache de veredictos web',
+            resultado='fallo' if veredicto is None else 'acierto'
+        ).incrementar()
+        if veredicto is None:
+            return None
+        return dict(veredicto, salario_usuario=usuario_salario)
+    
+    def recordar_veredicto(self, usuario_nombre, veredicto):
+        """Guarda el veredicto para responder reenvíos sin volver a encolarlos"""
+        if CACHE_VEREDICTOS_TTL:
+            clave = (usuario_nombre, veredicto['mascota_id'], tramo_salarial(veredicto['salario_usuario']))
+            self.veredictos.put(clave, {campo: veredicto[campo] for campo in CAMPOS_VEREDICTO})
     
-    def send_to_rabbitmq(self, queue_name, message):
+    @trazado('send_to_rabbitmq')
+    def send_to_rabbitmq(self, queue_name, message, durable=False, **propiedades):
         """Envía mensaje a RabbitMQ SIN notificaciones automáticas"""
         try:
-            # Conexión real a RabbitMQ
-            connection = pika.BlockingConnection(
-                pika.ConnectionParameters('localhost')
-            )
-            channel = connection.channel()
-            
-            # Declarar cola SIN durable para evitar conflictos
-            channel.queue_declare(queue=queue_name)
+            # El procesador continúa la traza desde la cabecera traceparent
+            propiedades['headers'] = encabezados_traza(propiedades.get('headers'))
+            body, properties = empaquetar(message, **propiedades)
             
-            # Publicar mensaje
-            channel.basic_publish(
-                exchange='',
-                routing_key=queue_name,
-                body=json.dumps(message)
-            )
+            # Canal reutilizado del pool compartido
+            with Cronometro('web_encolado'), pool.canal() as channel:
+                # Declarar la cola (una vez por pool y por durable/argumentos)
+                pool.declarar_cola(channel, queue_name, durable=durable)
+                
+                # Publicar mensaje
+                channel.basic_publish(
+                    exchange='',
+                    routing_key=queue_name,
+                    body=body,
+                    properties=properties
+                )
             
-            connection.close()
+            contar('publicados', queue_name)
             
             # Solo log en consola para debugging
             print(f"- Mensaje enviado a cola '{queue_name}': {message['mascota_id']}")
@@ -38,13 +158,22 @@ class RabbitMQManager:
             return True
             
         except Exception as e:
+            contar('errores', queue_name)
             print(f"ERROR RabbitMQ: No se pudo conectar: {str(e)}")
             return False
     
+    @trazado()
     def process_adoption(self, mascota_id, usuario_nombre, usuario_salario):
         """Procesa una solicitud de adopción paso a paso CON notificaciones de proceso"""
         print(f"Iniciando proceso para {mascota_id} - Usuario: {usuario_nombre} - Salario: ${usuario_salario:,}")
         
+        veredicto = self.veredicto_reciente(mascota_id, usuario_nombre, usuario_salario)
+        if veredicto is not None:
+            print(f"- Veredicto en cache para {mascota_id} - Usuario: {usuario_nombre}: {veredicto['resultado']}")
+            return veredicto
+        
+        self.admision.admitir()
+        
         # Notificación de INICIO
         self.add_notification(
             "SOLICITUD ENVIADA", 
@@ -53,7 +182,9 @@ class RabbitMQManager:
         )
         
         # PASO 1: Enviar solicitud a RabbitMQ
+        solicitud_id = uuid.uuid4().hex
         solicitud = {
+            'solicitud_id': solicitud_id,
             'mascota_id': mascota_id,
             'usuario': usuario_nombre,
             'salario': usuario_salario,
@@ -62,7 +193,9 @@ class RabbitMQManager:
             'accion': 'inicio_proceso'
         }
         
-        if not self.send_to_rabbitmq('solicitudes_adopcion', solicitud):
+        # Durable como la declaran el procesador y el modo asíncrono (si no, PRECONDITION_FAILED)
+        if not self.send_to_rabbitmq('solicitudes_adopcion', solicitud, durable=True, message_id=solicitud_id,
+                                     priority=PRIORIDAD_WEB):
             return {'error': 'No se pudo enviar a RabbitMQ'}
         
         # PASO 2: Simular procesamiento (2 segundos)
@@ -77,25 +210,14 @@ class RabbitMQManager:
         
         time.sleep(1)
         
-        # Validación de salario (mayor a 1,600,000)
-        salario_suficiente = usuario_salario >= 1600000
-        nombre_valido = len(usuario_nombre) > 3
-        
-        # Aprobado solo si cumple ambas condiciones
-        aprobado = salario_suficiente and nombre_valido
-        
-        if not salario_suficiente:
-            resultado = "RECHAZADA"
-            motivo = f"Salario insuficiente (${usuario_salario:,}) para aplicar en la adopción de la mascota. Mínimo requerido: $1,600,000"
-        elif not nombre_valido:
-            resultado = "RECHAZADA"
-            motivo = "Nombre muy corto para validación"
-        else:
-            resultado = "APROBADA"
-            motivo = "¡Cumples con todos los requisitos!"
+        veredicto = evaluar_solicitud_web(mascota_id, usuario_nombre, usuario_salario)
+        aprobado = veredicto['aprobado']
+        resultado = veredicto['resultado']
+        motivo = veredicto['motivo']
         
         # PASO 3: Enviar RESULTADO a RabbitMQ
         respuesta = {
+            'solicitud_id': solicitud_id,
             'mascota_id': mascota_id,
             'usuario': usuario_nombre,
             'salario': usuario_salario,
@@ -116,47 +238,212 @@ class RabbitMQManager:
                 tipo_notificacion
             )
         
-        return {
-            'aprobado': aprobado,
-            'resultado': resultado,
+        self.guardar_en_historial(respuesta)
+        self.recordar_veredicto(usuario_nombre, veredicto)
+        return veredicto
+    
+    @trazado()
+    def submit_adoption(self, mascota_id, usuario_nombre, usuario_salario):
+        """Encola la solicitud y devuelve su id sin esperar el veredicto"""
+        solicitud_id = uuid.uuid4().hex
+        
+        veredicto = self.veredicto_reciente(mascota_id, usuario_nombre, usuario_salario)
+        if veredicto is not None:
+            # Queda resuelta de inmediato; /resultado_adopcion la encuentra como cualquier otra
+            respuesta = dict(veredicto, solicitud_id=solicitud_id, usuario=usuario_nombre,
+                             timestamp=time.time(), tipo='respuesta_adopcion', accion='resultado_final')
+            self.guardar_en_historial(respuesta)
+            self.resultados.completar(solicitud_id, respuesta, crear=True)
+            if self.difusion is not None:
+                self.difusion.completar(solicitud_id, respuesta)
+            print(f"- Veredicto en cache para {mascota_id} - Usuario: {usuario_nombre}: {veredicto['resultado']}")
+            return solicitud_id
+        
+        self.admision.admitir()
+        
+        solicitud = {
+            'solicitud_id': solicitud_id,
             'mascota_id': mascota_id,
-            'motivo': motivo,
-            'salario_usuario': usuario_salario
+            'usuario': usuario_nombre,
+            'usuario_id': usuario_nombre,
+            'salario': usuario_salario,
+            'timestamp': time.time(),
+            'tipo': 'solicitud_adopcion',
+            'accion': 'inicio_proceso'
         }
+        self.iniciar_escucha_respuestas()
+        self.resultados.registrar(solicitud_id)
+        if self.difusion is not None:
+            # La consulta del resultado puede llegar a cualquier worker
+            self.difusion.registrar(solicitud_id)
+        
+        enviado = self.send_to_rabbitmq(
+            'solicitudes_adopcion', solicitud, durable=True,
+            correlation_id=solicitud_id,
+            message_id=solicitud_id,
+            priority=PRIORIDAD_WEB,
+            reply_to='respuestas_adopcion',
+            delivery_mode=2
+        )
+        if not enviado:
+            return None
+        
+        self.add_notification(
+            "SOLICITUD ENVIADA", 
+            f"Solicitud enviada para {mascota_id} - Usuario: {usuario_nombre} - Salario: ${usuario_salario:,}",
+            "envio"
+        )
+        return solicitud_id
+    
+    def handle_response(self, ch, method, properties, body):
+        """Recibe veredictos del procesador y los guarda por correlation_id"""
+        contar('consumidos', 'respuestas_adopcion')
+        try:
+            with tramo('handle_response', padre=properties):
+                respuesta = desempaquetar(body, properties)
+                # Antes de completar: quien vea el resultado ya lo encuentra en /resultados
+                self.guardar_en_historial(respuesta)
+                self.recordar_veredicto(respuesta['usuario'], respuesta)
+                solicitud_id = properties.correlation_id
+                if solicitud_id:
+                    # Compartido: la solicitud puede estar registrada solo en otro worker
+                    # (arrancó después, o falló el evento 'registrada'), así que el veredicto
+                    # se reenvía siempre y cada worker lo aplica con crear=True
+                    if self.difusion is not None and self.difusion.completar(solicitud_id, respuesta):
+                        completada = True
+                    else:
+                        completada = self.resultados.completar(solicitud_id, respuesta,
+                                                               crear=self.difusion is not None)
+                    if completada:
+                        tipo_notificacion = "respuesta" if respuesta['aprobado'] else "error"
+                        self.add_notification(
+                            "- RESULTADO FINAL", 
+                            f"{respuesta['mascota_id']} → {respuesta['resultado']} | Motivo: {respuesta['motivo']}",
+                            tipo_notificacion
+                        )
+        except Exception as e:
+            contar('errores', 'respuestas_adopcion')
+            print(f"Error procesando respuesta: {e}")
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        contar('acks', 'respuestas_adopcion')
+    
+    def guardar_en_historial(self, respuesta):
+        """Deja el veredicto web en el histórico de /resultados; un fallo no tumba la respuesta"""
+        try:
+            historial.guardar_respuestas_web([respuesta])
+        except Exception as e:
+            contar('errores', 'historial')
+            print(f"Error guardando el veredicto en el histórico: {e}")
+    
+    def iniciar_escucha_respuestas(self):
+        """Arranca (una sola vez) el hilo que consume respuestas_adopcion"""
+        if self._escucha is not None:
+            return
+        self._escucha = threading.Thread(target=self._escuchar_respuestas, daemon=True)
+        self._escucha.start()
+    
+    def _escuchar_respuestas(self):
+        while True:
+            try:
+                # Conexión propia: si se cae, no se lleva un canal del pool de publicación
+                with pool.conexion_dedicada() as canal:
+                    pool.declarar_cola(canal, 'respuestas_adopcion')
+                    canal.basic_consume(
+                        queue='respuestas_adopcion',
+                        on_message_callback=self.handle_response
+                    )
+                    canal.start_consuming()
+            except Exception as e:
+                print(f"ERROR escuchando respuestas: {e}")
+                time.sleep(5)
     
     def add_notification(self, titulo, mensaje, tipo):
         """Agrega una notificación al sistema"""
-        notification = {
-            'id': len(self.notifications) + 1,
-            'titulo': titulo,
-            'mensaje': mensaje,
-            'tipo': tipo,
-            'timestamp': datetime.now().strftime("%H:%M:%S"),
-            'fecha': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+        if self.difusion is not None and self.difusion.notificar(titulo, mensaje, tipo):
+            # Cada worker (este incluido) la agrega al recibirla del exchange
+            print(f"- Notificación: {titulo} - {mensaje}")
+            return
         
-        self.notifications.insert(0, notification)  # Agregar al inicio
+        # El buffer descarta la más antigua al superar la capacidad (15 por defecto)
+        self.notifications.agregar(titulo, mensaje, tipo)
         print(f"- Notificación: {titulo} - {mensaje}")
         
-        # Mantener máximo 15 notificaciones
-        if len(self.notifications) > 15:
-            self.notifications.pop()
+        self.difusor.publicar()
     
     def get_notifications(self):
         """Obtiene todas las notificaciones"""
-        return self.notifications
+        return self.notifications.todas()
+    
+    def get_notifications_since(self, since):
+        """Notificaciones con id mayor a `since`, de la más antigua a la más nueva"""
+        return self.notifications.desde(since)
     
     def clear_notifications(self):
         """Limpia todas las notificaciones"""
-        self.notifications.clear()
+        if self.difusion is not None and self.difusion.limpiar():
+            return
+        self.notifications.limpiar()
+        self.difusor.publicar()
 
-# Instancia global
+# Instancia global. Nada se conecta ni abre archivos al importar: el broker en el
+# primer envío y las bases SQLite en la primera consulta
 rabbit_mq = RabbitMQManager()
+catalogo = Diferido(CatalogoMascotas, 'catalogo')
+historial = Diferido(HistorialResultados, 'historial')
+
+@app.before_request
+def iniciar_difusion():
+    """En modo multi-worker, suscribe este proceso al exchange compartido (una sola vez)"""
+    if rabbit_mq.difusion is not None:
+        rabbit_mq.difusion.iniciar()
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/mascotas')
+def listar_mascotas():
+    """Página del catálogo de mascotas (?tipo=&dificultad=&disponible=&pagina=&por_pagina=)"""
+    disponible = request.args.get('disponible')
+    pagina = catalogo.listar(
+        tipo=request.args.get('tipo'),
+        dificultad=request.args.get('dificultad'),
+        disponible=None if disponible is None else disponible.lower() in ('1', 'true', 'si'),
+        pagina=request.args.get('pagina', 1, type=int),
+        por_pagina=request.args.get('por_pagina', 20, type=int)
+    )
+    return jsonify(pagina)
+
+@app.route('/mascotas/<mascota_id>')
+def obtener_mascota(mascota_id):
+    """Datos de una mascota (servidos desde la cache del catálogo)"""
+    mascota = catalogo.obtener(mascota_id)
+    if mascota is None:
+        return jsonify({'error': 'Mascota no encontrada'}), 404
+    return jsonify(mascota)
+
+@app.route('/resultados')
+def listar_resultados():
+    """Histórico de veredictos (?usuario=&mascota=&por_pagina=&cursor=), más recientes primero"""
+    try:
+        pagina = historial.consultar(
+            usuario=request.args.get('usuario'),
+            mascota=request.args.get('mascota'),
+            cursor=request.args.get('cursor'),
+            por_pagina=request.args.get('por_pagina', 50, type=int)
+        )
+    except ValueError:
+        return jsonify({'error': 'Cursor inválido'}), 400
+    return jsonify(pagina)
+
+@app.route('/resultados/<solicitud_id>')
+def obtener_resultado(solicitud_id):
+    """Veredicto guardado de una solicitud"""
+    resultado = historial.obtener(solicitud_id)
+    if resultado is None:
+        return jsonify({'error': 'Resultado no encontrado'}), 404
+    return jsonify(resultado)
+
 @app.route('/solicitar_adopcion', methods=['POST'])
 def solicitar_adopcion():
     datos = request.json
@@ -173,6 +460,16 @@ def solicitar_adopcion():
         
         print(f"- Nueva solicitud: {mascota_id} por {usuario_nombre} - Salario: ${usuario_salario:,}")
         
+        if MODO_ASINCRONO:
+            solicitud_id = rabbit_mq.submit_adoption(mascota_id, usuario_nombre, usuario_salario)
+            if solicitud_id is None:
+                return jsonify({'error': 'No se pudo enviar a RabbitMQ'}), 503
+            
+            return jsonify({
+                'estado': 'pendiente',
+                'solicitud_id': solicitud_id
+            }), 202
+        
         resultado = rabbit_mq.process_adoption(mascota_id, usuario_nombre, usuario_salario)
         
         return jsonify({
@@ -180,6 +477,12 @@ def solicitar_adopcion():
             'resultado': resultado
         })
         
+    except ColaSaturada as e:
+        print(f"- Solicitud rechazada por saturación: {e}")
+        return jsonify({
+            'error': 'Hay demasiadas solicitudes en espera, intenta de nuevo en unos segundos',
+            'reintentar_en': e.reintentar_en
+        }), 429, {'Retry-After': str(e.reintentar_en)}
     except ValueError:
         print(f"Error: Salario no válido")
         rabbit_mq.add_notification("ERROR", "El salario debe ser un número válido", "error")
@@ -189,10 +492,77 @@ def solicitar_adopcion():
         rabbit_mq.add_notification("ERROR", f"Error procesando solicitud: {str(e)}", "error")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/resultado_adopcion/<solicitud_id>')
+def resultado_adopcion(solicitud_id):
+    """Consulta (o espera con ?esperar=N) el resultado de una solicitud asíncrona"""
+    esperar = min(float(request.args.get('esperar', 0)), 30)
+    entrada = rabbit_mq.resultados.obtener(solicitud_id, esperar)
+    
+    if entrada is None:
+        return jsonify({'error': 'Solicitud desconocida'}), 404
+    if entrada['estado'] == 'pendiente':
+        return jsonify({'estado': 'pendiente', 'solicitud_id': solicitud_id}), 202
+    
+    return jsonify({
+        'estado': 'success',
+        'solicitud_id': solicitud_id,
+        'resultado': entrada['resultado']
+    })
+
 @app.route('/notificaciones')
 def get_notificaciones():
-    """Endpoint para obtener notificaciones actualizadas"""
-    return jsonify(rabbit_mq.get_notifications())
+    """Endpoint para obtener notificaciones actualizadas
+    
+    Con ?since=<id> devuelve solo las nuevas (long-poll si además se pasa ?esperar=N).
+    """
+    if 'since' not in request.args:
+        return jsonify(rabbit_mq.get_notifications())
+    
+    since = request.args.get('since', 0, type=int)
+    esperar = min(request.args.get('esperar', 0, type=float), 30)
+    
+    version = rabbit_mq.difusor.version()
+    nuevas = rabbit_mq.get_notifications_since(since)
+    if not nuevas and esperar > 0:
+        rabbit_mq.difusor.esperar(version, esperar)
+        nuevas = rabbit_mq.get_notifications_since(since)
+    
+    return jsonify(nuevas)
+
+@app.route('/notificaciones/stream')
+def stream_notificaciones():
+    """Server-Sent Events: empuja solo las notificaciones nuevas a cada navegador"""
+    desde = request.headers.get('Last-Event-ID', type=int) or request.args.get('since', 0, type=int)
+    
+    return Response(
+        stream_with_context(flujo_sse(rabbit_mq, desde)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/metrics')
+def exportar_metricas():
+    """Métricas del proceso web en formato de texto de Prometheus"""
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/perfil')
+@requiere_admin
+def perfil_muestreo():
+    """Perfila este worker ?segundos=N (máx. 15) y devuelve pilas colapsadas para flamegraph.pl"""
+    segundos = max(0.1, min(request.args.get('segundos', 5, type=float), PERFIL_MAX_SEGUNDOS))
+    if not perfilador.iniciar(segundos):
+        return jsonify({'error': 'Ya hay un perfil en curso'}), 409
+    perfilador.esperar()
+    return Response(perfilador.detener(), mimetype='text/plain')
+
+@app.route('/trazas', methods=['GET', 'POST'])
+@requiere_admin
+def configurar_trazas():
+    """Estado de las trazas de este worker; POST {"activo": bool, "muestreo": 0-1} las cambia en caliente"""
+    if request.method == 'POST':
+        datos = request.json or {}
+        return jsonify(activar_trazas(datos.get('activo', True), datos.get('muestreo')))
+    return jsonify(estado_trazas())
 
 @app.route('/limpiar_notificaciones', methods=['POST'])
 def limpiar_notificaciones():
@@ -204,18 +574,15 @@ def limpiar_notificaciones():
 def reset_rabbitmq():
     """Elimina y recrea las colas para resetear"""
     try:
-        connection = pika.BlockingConnection(pika.ConnectionParameters('localhost'))
-        channel = connection.channel()
-        
-        # Eliminar colas existentes
-        channel.queue_delete(queue='solicitudes_adopcion')
-        channel.queue_delete(queue='respuestas_adopcion')
-        
-        # Crear nuevas colas
-        channel.queue_declare(queue='solicitudes_adopcion')
-        channel.queue_declare(queue='respuestas_adopcion')
-        
-        connection.close()
+        with pool.canal() as channel:
+            # Eliminar colas existentes
+            for cola in ('solicitudes_adopcion', 'respuestas_adopcion'):
+                channel.queue_delete(queue=cola)
+                pool.olvidar_cola(cola)
+            
+            # Crear nuevas colas
+            pool.declarar_cola(channel, 'solicitudes_adopcion', durable=True)
+            pool.declarar_cola(channel, 'respuestas_adopcion')
         
         rabbit_mq.clear_notifications()
         
@@ -231,7 +598,11 @@ def reset_rabbitmq():
         rabbit_mq.add_notification("- ERROR RESET", f"Error reseteando RabbitMQ: {str(e)}", "error")
         return jsonify({'error': str(e)}), 500
 
+reportar_arranque('web')
+
 if __name__ == '__main__':
     print("- Iniciando PetConnect con RabbitMQ...")
-    print("- Validación de salario activada: Mínimo $1,600,000")
+    print(f"- Validación de salario activada: Mínimo ${SALARIO_MINIMO:,}")
+    if MODO_ASINCRONO:
+        print("- Modo asíncrono activado: las decisiones las toma procesador.py")
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,93 @@
+import logging
+import os
+import threading
+import time
+from metricas import observar_etapa
+
+logger = logging.getLogger(__name__)
+
+# Con 1, además del resumen se loguea cada etapa a medida que termina
+PERFIL_ARRANQUE = os.environ.get('PETCONNECT_PERFIL_ARRANQUE', '0') == '1'
+
+def _inicio_proceso():
+    """Instante (time.monotonic) en que arrancó el proceso.
+
+    En Linux sale de /proc; si no se puede leer, se toma el import de este módulo.
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            campos = f.read().rsplit(')', 1)[1].split()
+        desde_boot = int(campos[19]) / os.sysconf('SC_CLK_TCK')
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return time.monotonic() - max(0.0, uptime - desde_boot)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.monotonic()
+
+INICIO_PROCESO = _inicio_proceso()
+
+_etapas = []  # (etapa, segundos) en orden de finalización
+_reportados = set()
+_lock = threading.Lock()
+
+class etapa_arranque:
+    """Context manager que mide una etapa de la inicialización de un componente."""
+    def __init__(self, etapa):
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_excepcion, excepcion, traza):
+        segundos = time.perf_counter() - self.inicio
+        observar_etapa(f'arranque_{self.etapa}', segundos)
+        with _lock:
+            _etapas.append((self.etapa, segundos))
+        if PERFIL_ARRANQUE:
+            logger.info(f"[Arranque] {self.etapa}: {segundos * 1000:.1f} ms")
+        return False
+
+def reportar_arranque(componente):
+    """Loguea (una vez por componente) cuánto tardó en estar listo y en qué se fue el tiempo.
+
+    Lo no medido por etapa_arranque (intérprete e imports) aparece como 'imports'.
+    """
+    with _lock:
+        if componente in _reportados:
+            return None
+        _reportados.add(componente)
+        etapas = list(_etapas)
+    total = time.monotonic() - INICIO_PROCESO
+    medido = {}
+    for etapa, segundos in etapas:
+        medido[etapa] = medido.get(etapa, 0.0) + segundos
+    medido['imports'] = max(0.0, total - sum(medido.values()))
+    observar_etapa(f'arranque_listo_{componente}', total)
+    detalle = ', '.join(f"{etapa} {segundos * 1000:.0f} ms"
+                        for etapa, segundos in sorted(medido.items(), key=lambda e: -e[1]))
+    logger.info(f"[Arranque] {componente} listo en {total * 1000:.0f} ms ({detalle})")
+    return total
+
+class Diferido:
+    """Crea el objeto con `fabrica()` en el primer acceso a uno de sus atributos.
+
+    Sirve para globales de módulo (catálogo, histórico) que no deben abrir
+    archivos ni conexiones al importar.
+    """
+    def __init__(self, fabrica, etapa=None):
+        self._fabrica = fabrica
+        self._etapa = etapa
+        self._objeto = None
+        self._lock = threading.Lock()
+
+    def _obtener(self):
+        if self._objeto is None:
+            with self._lock:
+                if self._objeto is None:
+                    with etapa_arranque(self._etapa or getattr(self._fabrica, '__name__', 'diferido')):
+                        self._objeto = self._fabrica()
+        return self._objeto
+
+    def __getattr__(self, nombre):
+        return getattr(self._obtener(), nombre)
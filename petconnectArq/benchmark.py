@@ -0,0 +1,357 @@
+"""Benchmark de carga del pipeline de adopciones.
+
+Modos:
+  pipeline  Productor -> Procesador -> Consumidor a una tasa y concurrencia dadas.
+            Con --broker directo los componentes se conectan en proceso, sin
+            broker (mide solo el costo de CPU); con --broker memoria pasan por
+            el broker en memoria (colas, prefetch y acks reales, sin red); con
+            --broker rabbitmq usan el broker local.
+  web       Golpea /solicitar_adopcion y /notificaciones de la app Flask, por
+            HTTP (--url) o en proceso con el cliente de pruebas (--en-proceso).
+
+Ejemplos:
+  python benchmark.py pipeline --mensajes 5000 --concurrencia 4 --trabajadores 8
+  python benchmark.py pipeline --broker memoria --mensajes 5000 --trabajadores 8
+  python benchmark.py pipeline --broker rabbitmq --tasa 200 --mensajes 2000
+  python benchmark.py web --url http://localhost:5000 --peticiones 1000 --concurrencia 16
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import os
+import random
+import resource
+import threading
+import time
+import tracemalloc
+import types
+import urllib.request
+
+import pika
+
+MASCOTAS = ['Budy_001', 'Luna_002', 'Max_003', 'Molly_004', 'Simba_005']
+
+# Archivos de cada componente, para repartir la memoria asignada
+COMPONENTES = {
+    'productor': ('productor.py',),
+    'procesador': ('procesador.py', 'reglas.py', 'catalogo.py', 'cache.py'),
+    'consumidor': ('consumidor.py',),
+    'compartido': ('codec.py', 'conexion.py', 'metricas.py', 'broker_memoria.py'),
+}
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    indice = min(len(valores_ordenados) - 1, int(round(p * (len(valores_ordenados) - 1))))
+    return valores_ordenados[indice]
+
+class Medidor:
+    """Latencias y conteo de mensajes completados, seguro entre hilos."""
+    def __init__(self, esperados):
+        self.esperados = esperados
+        self.latencias = []
+        self.errores = 0
+        self._lock = threading.Lock()
+        self.completo = threading.Event()
+
+    def registrar(self, latencia):
+        with self._lock:
+            self.latencias.append(latencia)
+            if len(self.latencias) >= self.esperados:
+                self.completo.set()
+
+    def error(self):
+        with self._lock:
+            self.errores += 1
+
+    def resumen(self, segundos):
+        latencias = sorted(self.latencias)
+        return {
+            'completados': len(latencias),
+            'errores': self.errores,
+            'segundos': round(segundos, 3),
+            'por_segundo': round(len(latencias) / segundos, 1) if segundos else 0.0,
+            'p50_ms': round(percentil(latencias, 0.50) * 1000, 2),
+            'p95_ms': round(percentil(latencias, 0.95) * 1000, 2),
+            'p99_ms': round(percentil(latencias, 0.99) * 1000, 2),
+        }
+
+class _ConexionDirecta:
+    """Parte de BlockingConnection que usan los componentes."""
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.is_open = True
+
+    def add_callback_threadsafe(self, callback):
+        with self._lock:
+            callback()
+
+    def process_data_events(self, time_limit=0):
+        pass
+
+    def call_later(self, delay, callback):
+        temporizador = threading.Timer(delay, self.add_callback_threadsafe, (callback,))
+        temporizador.daemon = True
+        temporizador.start()
+        return temporizador
+
+class CanalDirecto:
+    """Stand-in en proceso de un canal de pika.
+
+    Cada basic_publish se entrega en el mismo hilo al callback suscrito a la
+    cola, sin red ni broker: sirve para medir el costo propio de los componentes.
+    """
+    is_open = True
+
+    def __init__(self):
+        self.connection = _ConexionDirecta()
+        self._consumidores = {}
+        self._tags = itertools.count(1)
+
+    def queue_declare(self, queue, **kwargs):
+        pass
+
+    def exchange_declare(self, exchange, **kwargs):
+        pass
+
+    def queue_bind(self, queue, exchange, **kwargs):
+        pass
+
+    def basic_qos(self, **kwargs):
+        pass
+
+    def basic_consume(self, queue, on_message_callback, **kwargs):
+        self._consumidores[queue] = on_message_callback
+        return queue
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, **kwargs):
+        callback = self._consumidores.get(routing_key)
+        if callback is not None:
+            metodo = types.SimpleNamespace(
+                delivery_tag=next(self._tags), routing_key=routing_key, redelivered=False
+            )
+            # Como en pika, los callbacks corren de a uno (el "hilo" de la conexión)
+            with self.connection._lock:
+                callback(self, metodo, properties or pika.BasicProperties(), body)
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        pass
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        pass
+
+def _datos_aleatorios():
+    return {
+        'experiencia_previa': random.choice([True, False]),
+        'tipo_vivienda': random.choice(['casa', 'apartamento']),
+        'otros_animales': random.choice([True, False])
+    }
+
+def _consumidor_medido(medidor, **kwargs):
+    from consumidor import ConsumidorResultados
+
+    class ConsumidorMedido(ConsumidorResultados):
+        def _describir_resultado(self, resultado):
+            lineas = super()._describir_resultado(resultado)
+            medidor.registrar(time.time() - resultado['timestamp_solicitud'])
+            return lineas
+
+    return ConsumidorMedido(**kwargs)
+
+def _producir(productor, cantidad, intervalo, medidor):
+    """Publica `cantidad` solicitudes espaciadas `intervalo` segundos (0 = sin pausa)."""
+    proximo = time.perf_counter()
+    for _ in range(cantidad):
+        try:
+            productor.publicar_solicitud_adopcion(
+                random.choice(MASCOTAS), f"user_{random.randint(1, 10000)}", _datos_aleatorios()
+            )
+        except Exception:
+            medidor.error()
+        if intervalo:
+            proximo += intervalo
+            espera = proximo - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+
+def _repartir(total, partes):
+    return [total // partes + (1 if i < total % partes else 0) for i in range(partes)]
+
+def _memoria_por_componente(instantanea):
+    memoria = dict.fromkeys(COMPONENTES, 0)
+    for estadistica in instantanea.statistics('filename'):
+        archivo = os.path.basename(estadistica.traceback[0].filename)
+        for componente, archivos in COMPONENTES.items():
+            if archivo in archivos:
+                memoria[componente] += estadistica.size
+    return {componente: round(bytes_ / 1024, 1) for componente, bytes_ in memoria.items()}
+
+def benchmark_pipeline(args):
+    from procesador import ProcesadorAdopciones
+    from productor import ProductorAdopciones
+
+    medidor = Medidor(args.mensajes)
+    intervalo = args.concurrencia / args.tasa if args.tasa else 0
+    tracemalloc.start()
+
+    if args.broker == 'directo':
+        canal = CanalDirecto()
+        procesador = ProcesadorAdopciones(
+            trabajadores=args.trabajadores, demora=(args.demora,), canal=canal, planificar=args.planificar
+        )
+        consumidor = _consumidor_medido(medidor, canal=canal, lote=args.lote)
+        procesador.suscribir()
+        consumidor.suscribir()
+        productores = [ProductorAdopciones(canal=canal) for _ in range(args.concurrencia)]
+        detener = lambda: procesador.ejecutor and procesador.ejecutor.shutdown(wait=True)
+    else:
+        from conexion import pool
+        if args.broker == 'memoria':
+            pool.usar_transporte('memoria')
+        pool.tamano = max(pool.tamano, args.concurrencia + 2)
+        listos = threading.Barrier(3)
+        componentes = {}
+
+        def correr(nombre, fabrica):
+            componente = componentes[nombre] = fabrica()
+            componente.suscribir()
+            listos.wait()
+            componente.canal.start_consuming()
+
+        for nombre, fabrica in (
+            ('procesador', lambda: ProcesadorAdopciones(
+                trabajadores=args.trabajadores, demora=(args.demora,), planificar=args.planificar
+            )),
+            ('consumidor', lambda: _consumidor_medido(medidor, lote=args.lote)),
+        ):
+            threading.Thread(target=correr, args=(nombre, fabrica), daemon=True).start()
+        listos.wait()
+        productores = [ProductorAdopciones() for _ in range(args.concurrencia)]
+
+        def detener():
+            for componente in componentes.values():
+                componente.canal.connection.add_callback_threadsafe(componente.canal.stop_consuming)
+
+    hilos = [
+        threading.Thread(target=_producir, args=(productor, cantidad, intervalo, medidor))
+        for productor, cantidad in zip(productores, _repartir(args.mensajes, args.concurrencia))
+    ]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    medidor.completo.wait(args.timeout)
+    segundos = time.perf_counter() - inicio
+    detener()
+
+    resultado = medidor.resumen(segundos)
+    resultado['memoria_kb'] = _memoria_por_componente(tracemalloc.take_snapshot())
+    tracemalloc.stop()
+    return resultado
+
+def _peticion_http(url, ruta, datos=None):
+    peticion = urllib.request.Request(
+        url + ruta,
+        data=json.dumps(datos).encode() if datos is not None else None,
+        headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(peticion, timeout=60) as respuesta:
+        respuesta.read()
+        return respuesta.status
+
+def benchmark_web(args):
+    if args.en_proceso:
+        from app import app
+        clientes = threading.local()
+
+        def pedir(ruta, datos=None):
+            if not hasattr(clientes, 'cliente'):
+                clientes.cliente = app.test_client()
+            if datos is None:
+                return clientes.cliente.get(ruta).status_code
+            return clientes.cliente.post(ruta, json=datos).status_code
+    else:
+        pedir = lambda ruta, datos=None: _peticion_http(args.url.rstrip('/'), ruta, datos)
+
+    medidores = {
+        '/solicitar_adopcion': Medidor(args.peticiones),
+        '/notificaciones': Medidor(args.peticiones),
+    }
+
+    def trabajar(cantidad):
+        for _ in range(cantidad):
+            if random.random() < args.proporcion_notificaciones:
+                ruta, datos = '/notificaciones', None
+            else:
+                ruta = '/solicitar_adopcion'
+                datos = {
+                    'mascota_id': random.choice(MASCOTAS),
+                    'usuario_nombre': f"Usuario{random.randint(1, 10000)}",
+                    'usuario_salario': random.choice([1200000, 1600000, 2500000])
+                }
+            inicio = time.perf_counter()
+            try:
+                estado = pedir(ruta, datos)
+            except Exception:
+                estado = None
+            if estado is None or estado >= 400:
+                medidores[ruta].error()
+            else:
+                medidores[ruta].registrar(time.perf_counter() - inicio)
+
+    hilos = [threading.Thread(target=trabajar, args=(cantidad,))
+             for cantidad in _repartir(args.peticiones, args.concurrencia)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+    return {ruta: medidor.resumen(segundos) for ruta, medidor in medidores.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    modos = parser.add_subparsers(dest='modo', required=True)
+
+    pipeline = modos.add_parser('pipeline', help='Productor -> Procesador -> Consumidor')
+    pipeline.add_argument('--broker', choices=['directo', 'memoria', 'rabbitmq'], default='directo')
+    pipeline.add_argument('--mensajes', type=int, default=1000)
+    pipeline.add_argument('--tasa', type=float, default=0, help='mensajes/s objetivo (0 = lo más rápido posible)')
+    pipeline.add_argument('--concurrencia', type=int, default=1, help='hilos productores')
+    pipeline.add_argument('--trabajadores', type=int, default=1, help='hilos del procesador')
+    pipeline.add_argument('--demora', type=float, default=0.0, help='segundos de procesamiento simulado')
+    pipeline.add_argument('--planificar', action='store_true', help='procesador con prioridad/equidad/agrupación')
+    pipeline.add_argument('--lote', type=int, default=0, help='consumidor por lotes de N resultados (0 = de a uno)')
+    pipeline.add_argument('--timeout', type=float, default=300)
+
+    web = modos.add_parser('web', help='Carga HTTP sobre la app Flask')
+    web.add_argument('--url', default='http://localhost:5000')
+    web.add_argument('--en-proceso', action='store_true', help='usar el cliente de pruebas de Flask')
+    web.add_argument('--peticiones', type=int, default=500)
+    web.add_argument('--concurrencia', type=int, default=8)
+    web.add_argument('--proporcion-notificaciones', type=float, default=0.5)
+
+    parser.add_argument('--con-logs', action='store_true', help='no silenciar prints/logs de los componentes')
+    args = parser.parse_args()
+
+    ejecutar = benchmark_pipeline if args.modo == 'pipeline' else benchmark_web
+    if args.con_logs:
+        resultado = ejecutar(args)
+    else:
+        logging.disable(logging.INFO)
+        with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+            resultado = ejecutar(args)
+        logging.disable(logging.NOTSET)
+
+    resultado_final = {
+        'modo': args.modo,
+        'resultado': resultado,
+        'rss_max_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+    print(json.dumps(resultado_final, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,543 @@
+"""Broker AMQP mínimo en memoria, compatible con la parte de pika que usa PetConnect.
+
+Imita la semántica de BlockingConnection/BlockingChannel: los callbacks de los
+consumidores se ejecutan en el hilo que llama a start_consuming() o
+process_data_events() de su conexión; hay ack/nack, prefetch por canal,
+reentrega de mensajes sin ack al cerrar un canal y confirmaciones de
+publicación. Las colas viven mientras viva el broker (aunque se desconecten los
+consumidores), lo que alcanza para un nodo único y para benchmarks
+reproducibles. Respeta los argumentos x-message-ttl, x-dead-letter-exchange y
+x-dead-letter-routing-key de las colas (reintentos diferidos y DLQ), y
+x-max-length con x-overflow drop-head o reject-publish.
+"""
+import copy
+import functools
+import heapq
+import itertools
+import queue
+import threading
+import time
+import types
+from collections import OrderedDict, deque
+
+# pika (métodos, propiedades, excepciones) se importa dentro de cada función:
+# importar este módulo no lo carga, como TransportePika en conexion.py
+
+class _Mensaje:
+    __slots__ = ('exchange', 'routing_key', 'body', 'properties', 'redelivered', 'expira')
+
+    def __init__(self, exchange, routing_key, body, properties):
+        import pika
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.body = body
+        self.properties = properties or pika.BasicProperties()
+        self.redelivered = False
+        self.expira = None
+
+class _MensajesPorPrioridad:
+    """Cola con x-max-priority: FIFO dentro de cada prioridad, mayor prioridad primero."""
+    def __init__(self, prioridad_maxima):
+        self.prioridad_maxima = prioridad_maxima
+        self._niveles = [deque() for _ in range(prioridad_maxima + 1)]
+
+    def _nivel(self, mensaje):
+        prioridad = getattr(mensaje.properties, 'priority', None) or 0
+        return self._niveles[min(prioridad, self.prioridad_maxima)]
+
+    def append(self, mensaje):
+        self._nivel(mensaje).append(mensaje)
+
+    def appendleft(self, mensaje):
+        self._nivel(mensaje).appendleft(mensaje)
+
+    def _primer_nivel(self):
+        for nivel in reversed(self._niveles):
+            if nivel:
+                return nivel
+        raise IndexError('cola vacía')
+
+    def popleft(self):
+        return self._primer_nivel().popleft()
+
+    def __getitem__(self, indice):
+        if indice != 0:
+            raise IndexError(indice)
+        return self._primer_nivel()[0]
+
+    def __len__(self):
+        return sum(len(nivel) for nivel in self._niveles)
+
+    def clear(self):
+        for nivel in self._niveles:
+            nivel.clear()
+
+class _Cola:
+    def __init__(self, nombre, durable, argumentos):
+        self.nombre = nombre
+        self.durable = bool(durable)
+        self.argumentos = argumentos or {}
+        prioridad_maxima = self.argumentos.get('x-max-priority')
+        self.mensajes = _MensajesPorPrioridad(prioridad_maxima) if prioridad_maxima else deque()
+        self.consumidores = []
+        self.turno = 0
+
+class _Consumidor:
+    __slots__ = ('tag', 'canal', 'cola', 'callback', 'auto_ack')
+
+    def __init__(self, tag, canal, cola, callback, auto_ack):
+        self.tag = tag
+        self.canal = canal
+        self.cola = cola
+        self.callback = callback
+        self.auto_ack = auto_ack
+
+class BrokerMemoria:
+    """Estado compartido del broker: colas, exchanges y enlaces."""
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._cambios = threading.Condition(self._lock)
+        self._vencimientos = []  # heap de (instante, cola) para los TTL
+        self._reloj = None
+        self.colas = {}
+        self.exchanges = {'': 'direct'}
+        self.enlaces = {}  # exchange -> [(cola, routing_key)]
+        self._nombres = itertools.count(1)
+
+    def conectar(self):
+        return ConexionMemoria(self)
+
+    # --- Topología -------------------------------------------------------
+
+    def declarar_cola(self, nombre, durable=False, passive=False, argumentos=None):
+        from pika.exceptions import ChannelClosedByBroker
+        with self._lock:
+            nombre = nombre or f"amq.gen-{next(self._nombres)}"
+            cola = self.colas.get(nombre)
+            if cola is None:
+                if passive:
+                    raise ChannelClosedByBroker(404, f"NOT_FOUND - no queue '{nombre}'")
+                cola = self.colas[nombre] = _Cola(nombre, durable, argumentos)
+            elif not passive and (cola.durable != bool(durable) or cola.argumentos != (argumentos or {})):
+                # Como RabbitMQ: redeclarar con otra durabilidad o argumentos no cambia la cola, falla
+                raise ChannelClosedByBroker(
+                    406, f"PRECONDITION_FAILED - inequivalent arg for queue '{nombre}'"
+                )
+            return cola
+
+    def eliminar_cola(self, nombre):
+        with self._lock:
+            cola = self.colas.pop(nombre, None)
+            if cola is None:
+                return 0
+            for enlaces in self.enlaces.values():
+                enlaces[:] = [(c, rk) for c, rk in enlaces if c != nombre]
+            for consumidor in list(cola.consumidores):
+                consumidor.canal._consumidores.pop(consumidor.tag, None)
+            return len(cola.mensajes)
+
+    def purgar_cola(self, nombre):
+        with self._lock:
+            cola = self.colas[nombre]
+            cantidad = len(cola.mensajes)
+            cola.mensajes.clear()
+            return cantidad
+
+    def declarar_exchange(self, nombre, tipo='direct'):
+        with self._lock:
+            self.exchanges.setdefault(nombre, tipo)
+            self.enlaces.setdefault(nombre, [])
+
+    def vincular(self, cola, exchange, routing_key=''):
+        from pika.exceptions import ChannelClosedByBroker
+        with self._lock:
+            if exchange not in self.exchanges:
+                raise ChannelClosedByBroker(404, f"NOT_FOUND - no exchange '{exchange}'")
+            enlace = (cola, routing_key)
+            if enlace not in self.enlaces[exchange]:
+                self.enlaces[exchange].append(enlace)
+
+    def _destinos(self, exchange, routing_key):
+        from pika.exceptions import ChannelClosedByBroker
+        if exchange == '':
+            return [routing_key] if routing_key in self.colas else []
+        tipo = self.exchanges.get(exchange)
+        if tipo is None:
+            raise ChannelClosedByBroker(404, f"NOT_FOUND - no exchange '{exchange}'")
+        enlaces = self.enlaces.get(exchange, [])
+        if tipo == 'fanout':
+            return [cola for cola, _ in enlaces]
+        return [cola for cola, rk in enlaces if rk == routing_key]
+
+    def enrutable(self, exchange, routing_key):
+        """True si el mensaje llegaría a alguna cola (para mandatory)."""
+        with self._lock:
+            return any(nombre in self.colas for nombre in self._destinos(exchange, routing_key))
+
+    # --- Mensajes --------------------------------------------------------
+
+    def publicar(self, exchange, routing_key, body, properties):
+        """Enruta el mensaje. Devuelve False si alguna cola destino lo rechazó (reject-publish)."""
+        aceptado = True
+        with self._lock:
+            for nombre in self._destinos(exchange, routing_key):
+                cola = self.colas.get(nombre)
+                if cola is None:
+                    continue
+                aceptado &= self._encolar(cola, _Mensaje(exchange, routing_key, body, properties))
+        return aceptado
+
+    def _encolar(self, cola, mensaje):
+        maximo = cola.argumentos.get('x-max-length')
+        if maximo is not None and len(cola.mensajes) >= maximo:
+            if cola.argumentos.get('x-overflow', 'drop-head') != 'drop-head':
+                return False
+            self._enviar_a_dlx(cola, cola.mensajes.popleft(), 'maxlen')
+        ttl = cola.argumentos.get('x-message-ttl')
+        expiracion = getattr(mensaje.properties, 'expiration', None)
+        if expiracion is not None:
+            ttl = int(expiracion) if ttl is None else min(ttl, int(expiracion))
+        if ttl is not None:
+            mensaje.expira = time.monotonic() + ttl / 1000
+            self._programar(mensaje.expira, cola.nombre)
+        cola.mensajes.append(mensaje)
+        self._despachar(cola)
+        return True
+
+    def reencolar(self, nombre_cola, mensaje):
+        """Devuelve un mensaje al frente de su cola marcado como reentregado."""
+        with self._lock:
+            cola = self.colas.get(nombre_cola)
+            if cola is None:
+                return
+            mensaje.redelivered = True
+            cola.mensajes.appendleft(mensaje)
+            self._despachar(cola)
+
+    def descartar(self, nombre_cola, mensaje):
+        """Mensaje rechazado sin reencolar: va al dead-letter exchange de la cola, si tiene."""
+        with self._lock:
+            cola = self.colas.get(nombre_cola)
+            if cola is not None:
+                self._enviar_a_dlx(cola, mensaje, 'rejected')
+
+    def _enviar_a_dlx(self, cola, mensaje, motivo):
+        from pika.exceptions import ChannelClosedByBroker
+        exchange = cola.argumentos.get('x-dead-letter-exchange')
+        if exchange is None:
+            return
+        routing_key = cola.argumentos.get('x-dead-letter-routing-key', mensaje.routing_key)
+        propiedades = copy.copy(mensaje.properties)
+        propiedades.expiration = None
+        cabeceras = dict(propiedades.headers or {})
+        cabeceras['x-death'] = [{
+            'queue': cola.nombre,
+            'reason': motivo,
+            'count': 1,
+            'exchange': mensaje.exchange,
+            'routing-keys': [mensaje.routing_key],
+        }] + list(cabeceras.get('x-death', []))
+        propiedades.headers = cabeceras
+        try:
+            destinos = self._destinos(exchange, routing_key)
+        except ChannelClosedByBroker:
+            return
+        for nombre in destinos:
+            if nombre in self.colas:
+                self._encolar(self.colas[nombre], _Mensaje(exchange, routing_key, mensaje.body, propiedades))
+
+    def _programar(self, instante, nombre_cola):
+        heapq.heappush(self._vencimientos, (instante, nombre_cola))
+        if self._reloj is None:
+            self._reloj = threading.Thread(target=self._vigilar_vencimientos, name='broker-memoria-ttl', daemon=True)
+            self._reloj.start()
+        self._cambios.notify()
+
+    def _vigilar_vencimientos(self):
+        with self._lock:
+            while True:
+                if not self._vencimientos:
+                    self._cambios.wait()
+                    continue
+                instante, nombre_cola = self._vencimientos[0]
+                espera = instante - time.monotonic()
+                if espera > 0:
+                    self._cambios.wait(espera)
+                    continue
+                heapq.heappop(self._vencimientos)
+                cola = self.colas.get(nombre_cola)
+                if cola is not None:
+                    self._expirar(cola)
+
+    def _expirar(self, cola):
+        # Como en RabbitMQ, solo expira lo que está a la cabeza de la cola
+        ahora = time.monotonic()
+        while cola.mensajes and cola.mensajes[0].expira is not None and cola.mensajes[0].expira <= ahora:
+            self._enviar_a_dlx(cola, cola.mensajes.popleft(), 'expired')
+
+    def agregar_consumidor(self, consumidor):
+        with self._lock:
+            consumidor.cola.consumidores.append(consumidor)
+            self._despachar(consumidor.cola)
+
+    def quitar_consumidor(self, consumidor):
+        with self._lock:
+            if consumidor in consumidor.cola.consumidores:
+                consumidor.cola.consumidores.remove(consumidor)
+
+    def despachar_canal(self, canal):
+        """Reintenta entregar en las colas que consume `canal` (se liberó prefetch)."""
+        with self._lock:
+            for cola in {c.cola for c in canal._consumidores.values()}:
+                self._despachar(cola)
+
+    def _despachar(self, cola):
+        # Reparte en round-robin entre los consumidores con prefetch disponible
+        self._expirar(cola)
+        while cola.mensajes and cola.consumidores:
+            for _ in range(len(cola.consumidores)):
+                cola.turno = (cola.turno + 1) % len(cola.consumidores)
+                consumidor = cola.consumidores[cola.turno]
+                if consumidor.canal._tiene_capacidad():
+                    break
+            else:
+                return
+            consumidor.canal._entregar(consumidor, cola.mensajes.popleft())
+
+class CanalMemoria:
+    """Equivalente en memoria de pika BlockingChannel."""
+    def __init__(self, conexion, numero):
+        self.connection = conexion
+        self.channel_number = numero
+        self.broker = conexion.broker
+        self.is_open = True
+        self.prefetch = 0
+        self._tags = itertools.count(1)
+        self._sin_ack = OrderedDict()  # delivery_tag -> (cola, mensaje)
+        self._consumidores = {}
+        self._consumiendo = False
+        self._confirmaciones = False
+        self._al_confirmar = None
+        self._al_devolver = None
+
+    # --- Topología -------------------------------------------------------
+
+    def queue_declare(self, queue='', passive=False, durable=False, exclusive=False,
+                      auto_delete=False, arguments=None):
+        import pika
+        from pika.exceptions import ChannelClosedByBroker
+        try:
+            cola = self.broker.declarar_cola(queue, durable, passive, arguments)
+        except ChannelClosedByBroker:
+            self.close()
+            raise
+        metodo = pika.spec.Queue.DeclareOk(
+            queue=cola.nombre,
+            message_count=len(cola.mensajes),
+            consumer_count=len(cola.consumidores)
+        )
+        return types.SimpleNamespace(method=metodo)
+
+    def queue_delete(self, queue, if_unused=False, if_empty=False):
+        import pika
+        return types.SimpleNamespace(method=pika.spec.Queue.DeleteOk(self.broker.eliminar_cola(queue)))
+
+    def queue_purge(self, queue):
+        import pika
+        return types.SimpleNamespace(method=pika.spec.Queue.PurgeOk(self.broker.purgar_cola(queue)))
+
+    def exchange_declare(self, exchange, exchange_type='direct', passive=False, durable=False,
+                         auto_delete=False, internal=False, arguments=None):
+        tipo = getattr(exchange_type, 'value', exchange_type)
+        self.broker.declarar_exchange(exchange, tipo)
+
+    def queue_bind(self, queue, exchange, routing_key=None, arguments=None):
+        self.broker.vincular(queue, exchange, routing_key if routing_key is not None else queue)
+
+    # --- Publicación -----------------------------------------------------
+
+    def confirm_delivery(self, ack_nack_callback=None, callback=None):
+        """Modo confirm.
+
+        Sin argumentos, como BlockingChannel: basic_publish lanza NackError si la
+        cola rechazó el mensaje y UnroutableError si era mandatory y no tenía
+        destino. Con `ack_nack_callback`, como el Channel asíncrono de pika:
+        basic_publish no lanza y cada publicación recibe su Basic.Ack o
+        Basic.Nack (delivery tags desde 1) en el hilo de la conexión.
+        """
+        import pika
+        self._confirmaciones = True
+        self._al_confirmar = ack_nack_callback
+        self._tags_publicados = itertools.count(1)
+        if callback is not None:
+            self.connection.add_callback_threadsafe(
+                lambda: callback(types.SimpleNamespace(method=pika.spec.Confirm.SelectOk()))
+            )
+
+    def add_on_return_callback(self, callback):
+        """`callback(canal, method, properties, body)` por cada mensaje mandatory sin destino."""
+        self._al_devolver = callback
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        import pika
+        from pika.exceptions import NackError, UnroutableError
+        if isinstance(body, str):
+            body = body.encode()
+        if mandatory and not self.broker.enrutable(exchange, routing_key):
+            if self._confirmaciones and self._al_confirmar is None:
+                raise UnroutableError([])
+            if self._al_devolver is not None:
+                devuelto = pika.spec.Basic.Return(reply_code=312, reply_text='NO_ROUTE',
+                                                  exchange=exchange, routing_key=routing_key)
+                self.connection.add_callback_threadsafe(functools.partial(
+                    self._al_devolver, self, devuelto, properties or pika.BasicProperties(), body
+                ))
+            # Como en RabbitMQ, el mensaje devuelto igual se confirma con un ack
+            aceptado = True
+        else:
+            aceptado = self.broker.publicar(exchange, routing_key, body, properties)
+        if not self._confirmaciones:
+            return
+        if self._al_confirmar is None:
+            if not aceptado:
+                raise NackError([])
+            return
+        tag = next(self._tags_publicados)
+        metodo = pika.spec.Basic.Ack(delivery_tag=tag) if aceptado else pika.spec.Basic.Nack(delivery_tag=tag)
+        self.connection.add_callback_threadsafe(
+            functools.partial(self._al_confirmar, types.SimpleNamespace(method=metodo))
+        )
+
+    # --- Consumo ---------------------------------------------------------
+
+    def basic_qos(self, prefetch_size=0, prefetch_count=0, global_qos=False):
+        self.prefetch = prefetch_count
+        self.broker.despachar_canal(self)
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False, exclusive=False,
+                      consumer_tag=None, arguments=None):
+        cola = self.broker.declarar_cola(queue, passive=True)
+        tag = consumer_tag or f"ctag{self.channel_number}.{len(self._consumidores) + 1}"
+        consumidor = _Consumidor(tag, self, cola, on_message_callback, auto_ack)
+        self._consumidores[tag] = consumidor
+        self.broker.agregar_consumidor(consumidor)
+        return tag
+
+    def basic_cancel(self, consumer_tag):
+        consumidor = self._consumidores.pop(consumer_tag, None)
+        if consumidor is not None:
+            self.broker.quitar_consumidor(consumidor)
+        return []
+
+    def _tiene_capacidad(self):
+        return self.is_open and (self.prefetch == 0 or len(self._sin_ack) < self.prefetch)
+
+    def _entregar(self, consumidor, mensaje):
+        import pika
+        tag = next(self._tags)
+        if not consumidor.auto_ack:
+            self._sin_ack[tag] = (consumidor.cola.nombre, mensaje)
+        metodo = pika.spec.Basic.Deliver(
+            consumer_tag=consumidor.tag,
+            delivery_tag=tag,
+            redelivered=mensaje.redelivered,
+            exchange=mensaje.exchange,
+            routing_key=mensaje.routing_key
+        )
+        self.connection.add_callback_threadsafe(
+            lambda: consumidor.callback(self, metodo, mensaje.properties, mensaje.body)
+        )
+
+    def _tomar(self, delivery_tag, multiple):
+        # _sin_ack lo llena _entregar desde el hilo que despacha, con el lock del broker
+        with self.broker._lock:
+            if multiple:
+                tags = [t for t in self._sin_ack if delivery_tag == 0 or t <= delivery_tag]
+            else:
+                tags = [delivery_tag] if delivery_tag in self._sin_ack else []
+            return [self._sin_ack.pop(t) for t in tags]
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        self._tomar(delivery_tag, multiple)
+        self.broker.despachar_canal(self)
+
+    def basic_nack(self, delivery_tag=0, multiple=False, requeue=True):
+        for nombre_cola, mensaje in self._tomar(delivery_tag, multiple):
+            if requeue:
+                self.broker.reencolar(nombre_cola, mensaje)
+            else:
+                self.broker.descartar(nombre_cola, mensaje)
+        self.broker.despachar_canal(self)
+
+    def basic_reject(self, delivery_tag, requeue=True):
+        self.basic_nack(delivery_tag, multiple=False, requeue=requeue)
+
+    def start_consuming(self):
+        self._consumiendo = True
+        while self._consumiendo and self._consumidores and self.is_open:
+            self.connection.process_data_events(time_limit=0.1)
+
+    def stop_consuming(self, consumer_tag=None):
+        for tag in [consumer_tag] if consumer_tag else list(self._consumidores):
+            self.basic_cancel(tag)
+        self._consumiendo = False
+
+    def close(self):
+        """Cierra el canal: sus mensajes sin ack vuelven a la cola como reentregas."""
+        if not self.is_open:
+            return
+        self.is_open = False
+        for tag in list(self._consumidores):
+            self.basic_cancel(tag)
+        with self.broker._lock:
+            pendientes, self._sin_ack = list(self._sin_ack.values()), OrderedDict()
+            for nombre_cola, mensaje in reversed(pendientes):
+                self.broker.reencolar(nombre_cola, mensaje)
+
+class ConexionMemoria:
+    """Equivalente en memoria de pika BlockingConnection."""
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+        self._eventos = queue.Queue()
+        self._canales = []
+        self._numeros = itertools.count(1)
+
+    def channel(self):
+        canal = CanalMemoria(self, next(self._numeros))
+        self._canales.append(canal)
+        return canal
+
+    def add_callback_threadsafe(self, callback):
+        self._eventos.put(callback)
+
+    def process_data_events(self, time_limit=0):
+        """Ejecuta los callbacks pendientes (entregas, confirmaciones, etc.)."""
+        limite = time.monotonic() + (time_limit or 0)
+        while True:
+            restante = limite - time.monotonic()
+            try:
+                evento = self._eventos.get(timeout=restante) if restante > 0 else self._eventos.get_nowait()
+            except queue.Empty:
+                return
+            evento()
+
+    def call_later(self, delay, callback):
+        """Ejecuta `callback` en el hilo de la conexión pasados `delay` segundos."""
+        temporizador = threading.Timer(delay, self.add_callback_threadsafe, (callback,))
+        temporizador.daemon = True
+        temporizador.start()
+        return temporizador
+
+    def remove_timeout(self, temporizador):
+        temporizador.cancel()
+
+    def sleep(self, duration):
+        self.process_data_events(time_limit=duration)
+
+    def close(self):
+        if not self.is_open:
+            return
+        self.is_open = False
+        for canal in self._canales:
+            canal.close()
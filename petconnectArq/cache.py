@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+
+class CacheLRU:
+    """Cache en memoria acotada (LRU) con expiración por TTL, segura entre hilos."""
+    def __init__(self, tamano_maximo=1024, ttl_segundos=60):
+        self.tamano_maximo = tamano_maximo
+        self.ttl_segundos = ttl_segundos
+        self._datos = OrderedDict()  # clave -> (expira, valor)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def get(self, clave, defecto=None):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return defecto
+            expira, valor = entrada
+            if expira < time.monotonic():
+                del self._datos[clave]
+                self.fallos += 1
+                return defecto
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def put(self, clave, valor, ttl_segundos=None):
+        ttl = self.ttl_segundos if ttl_segundos is None else ttl_segundos
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.tamano_maximo:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, clave=None):
+        """Elimina una clave, o toda la cache si no se indica ninguna."""
+        with self._lock:
+            if clave is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(clave, None)
+
+    def estadisticas(self):
+        return {
+            'entradas': len(self._datos),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos
+        }
+
+    def __len__(self):
+        return len(self._datos)
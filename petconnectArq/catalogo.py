@@ -0,0 +1,167 @@
+import os
+import sqlite3
+import threading
+from cache import CacheLRU
+
+CATALOGO_DB = os.environ.get(
+    'PETCONNECT_CATALOGO_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalogo.db')
+)
+
+# Catálogo inicial (se carga solo si la base está vacía)
+MASCOTAS_INICIALES = [
+    {'mascota_id': 'Budy_001', 'nombre': 'Budy', 'tipo': 'perro', 'dificultad': 'baja',
+     'sexo': 'Macho', 'edad': '2 años', 'tamano': 'Mediano',
+     'descripcion': 'Budy es un golden retriever juguetón y cariñoso. Le encanta correr y jugar a la pelota.',
+     'imagen': 'https://images.unsplash.com/photo-1552053831-71594a27632d?w=300&h=200&fit=crop'},
+    {'mascota_id': 'Luna_002', 'nombre': 'Luna', 'tipo': 'gato', 'dificultad': 'baja',
+     'sexo': 'Hembra', 'edad': '1 año', 'tamano': 'Pequeño',
+     'descripcion': 'Luna es una gatita tranquila y curiosa. Le gusta observar desde la ventana y tomar siestas al sol.',
+     'imagen': 'https://images.unsplash.com/photo-1514888286974-6c03e2ca1dba?w=300&h=200&fit=crop'},
+    {'mascota_id': 'Max_003', 'nombre': 'Max', 'tipo': 'perro', 'dificultad': 'media',
+     'sexo': 'Macho', 'edad': '3 años', 'tamano': 'Grande',
+     'descripcion': 'Max es un pastor alemán leal y protector. Ideal para familias activas que disfruten de paseos largos.',
+     'imagen': 'https://images.unsplash.com/photo-1588943211346-0908a1fb0b01?w=300&h=200&fit=crop'},
+    # Las evalúa el procesador (las usan productor.py y benchmark.py) pero no se
+    # listan en la página: no tienen foto ni ficha
+    {'mascota_id': 'Molly_004', 'nombre': 'Molly', 'tipo': 'perro', 'dificultad': 'alta',
+     'disponible': False},
+    {'mascota_id': 'Simba_005', 'nombre': 'Simba', 'tipo': 'gato', 'dificultad': 'media',
+     'disponible': False},
+]
+
+COLUMNAS = ('mascota_id', 'nombre', 'tipo', 'dificultad', 'disponible',
+            'sexo', 'edad', 'tamano', 'descripcion', 'imagen')
+
+_NO_EXISTE = object()
+
+class CatalogoMascotas:
+    """Catálogo de mascotas en SQLite con índices secundarios y cache LRU/TTL.
+
+    Se comporta como un mapping de solo lectura (`get`, `[]`, `in`) para que el
+    procesador y el motor de reglas lo usen en lugar del dict fijo.
+    """
+    def __init__(self, ruta=CATALOGO_DB, tamano_cache=4096, ttl_cache=60):
+        self.ruta = ruta
+        self.cache = CacheLRU(tamano_maximo=tamano_cache, ttl_segundos=ttl_cache)
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        self._crear_esquema()
+
+    def _crear_esquema(self):
+        with self._lock, self._conexion:
+            self._conexion.executescript('''
+                CREATE TABLE IF NOT EXISTS mascotas (
+                    mascota_id TEXT PRIMARY KEY,
+                    nombre TEXT NOT NULL,
+                    tipo TEXT NOT NULL,
+                    dificultad TEXT NOT NULL,
+                    disponible INTEGER NOT NULL DEFAULT 1,
+                    sexo TEXT,
+                    edad TEXT,
+                    tamano TEXT,
+                    descripcion TEXT,
+                    imagen TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_mascotas_tipo ON mascotas (tipo, disponible, mascota_id);
+                CREATE INDEX IF NOT EXISTS idx_mascotas_dificultad ON mascotas (dificultad, disponible, mascota_id);
+                CREATE INDEX IF NOT EXISTS idx_mascotas_disponible ON mascotas (disponible, mascota_id);
+            ''')
+            vacia = self._conexion.execute('SELECT 1 FROM mascotas LIMIT 1').fetchone() is None
+        if vacia:
+            self.guardar_varias(MASCOTAS_INICIALES)
+
+    def _a_dict(self, fila):
+        mascota = dict(fila)
+        mascota['disponible'] = bool(mascota['disponible'])
+        return mascota
+
+    def obtener(self, mascota_id):
+        """Datos de una mascota (o None). Las consultas repetidas salen de la cache."""
+        mascota = self.cache.get(mascota_id, _NO_EXISTE)
+        if mascota is not _NO_EXISTE:
+            return mascota
+
+        with self._lock:
+            fila = self._conexion.execute(
+                'SELECT * FROM mascotas WHERE mascota_id = ?', (mascota_id,)
+            ).fetchone()
+        mascota = self._a_dict(fila) if fila else None
+        # También se cachean los ids inexistentes para no golpear la base
+        self.cache.put(mascota_id, mascota)
+        return mascota
+
+    def get(self, mascota_id, defecto=None):
+        mascota = self.obtener(mascota_id)
+        return defecto if mascota is None else mascota
+
+    def __getitem__(self, mascota_id):
+        mascota = self.obtener(mascota_id)
+        if mascota is None:
+            raise KeyError(mascota_id)
+        return mascota
+
+    def __contains__(self, mascota_id):
+        return self.obtener(mascota_id) is not None
+
+    def listar(self, tipo=None, dificultad=None, disponible=None, pagina=1, por_pagina=20):
+        """Página de mascotas filtrada por los campos indexados."""
+        condiciones = []
+        parametros = []
+        if tipo:
+            condiciones.append('tipo = ?')
+            parametros.append(tipo)
+        if dificultad:
+            condiciones.append('dificultad = ?')
+            parametros.append(dificultad)
+        if disponible is not None:
+            condiciones.append('disponible = ?')
+            parametros.append(int(disponible))
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+
+        pagina = max(1, pagina)
+        por_pagina = max(1, min(por_pagina, 100))
+        with self._lock:
+            total = self._conexion.execute(f'SELECT COUNT(*) FROM mascotas {where}', parametros).fetchone()[0]
+            filas = self._conexion.execute(
+                f'SELECT * FROM mascotas {where} ORDER BY mascota_id LIMIT ? OFFSET ?',
+                parametros + [por_pagina, (pagina - 1) * por_pagina]
+            ).fetchall()
+
+        return {
+            'mascotas': [self._a_dict(fila) for fila in filas],
+            'pagina': pagina,
+            'por_pagina': por_pagina,
+            'total': total
+        }
+
+    def guardar_varias(self, mascotas):
+        """Inserta o actualiza mascotas e invalida sus entradas en la cache."""
+        filas = [
+            tuple(int(m.get('disponible', True)) if c == 'disponible' else m.get(c) for c in COLUMNAS)
+            for m in mascotas
+        ]
+        marcadores = ', '.join('?' for _ in COLUMNAS)
+        with self._lock, self._conexion:
+            self._conexion.executemany(
+                f"INSERT OR REPLACE INTO mascotas ({', '.join(COLUMNAS)}) VALUES ({marcadores})",
+                filas
+            )
+        for mascota in mascotas:
+            self.cache.invalidar(mascota['mascota_id'])
+
+    def guardar(self, mascota):
+        self.guardar_varias([mascota])
+
+    def marcar_disponible(self, mascota_id, disponible):
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                'UPDATE mascotas SET disponible = ? WHERE mascota_id = ?',
+                (int(disponible), mascota_id)
+            )
+        self.cache.invalidar(mascota_id)
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
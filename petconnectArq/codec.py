@@ -0,0 +1,95 @@
+import json
+import os
+
+try:
+    import msgpack
+except ImportError:  # msgpack es opcional: sin él solo está disponible JSON
+    msgpack = None
+
+# Codec usado al publicar: 'json' (legible) o 'compacto' (msgpack con esquema)
+PETCONNECT_CODEC = os.environ.get('PETCONNECT_CODEC', 'json')
+
+# Esquemas de los mensajes del sistema, indexados por el campo 'tipo'.
+# El formato compacto envía solo los valores en este orden, así que los campos
+# nuevos se agregan SIEMPRE al final y nunca se reordenan ni se eliminan.
+ESQUEMAS = (
+    ('solicitud_adopcion', ('tipo', 'solicitud_id', 'mascota_id', 'usuario_id', 'datos_adicionales',
+                            'timestamp', 'estado', 'usuario', 'salario', 'accion')),
+    ('notificacion', ('tipo', 'usuario_id', 'mensaje', 'tipo_notificacion', 'timestamp')),
+    ('resultado_adopcion', ('tipo', 'solicitud_id', 'mascota_id', 'usuario_id', 'resultado',
+                            'procesado_por', 'timestamp', 'timestamp_solicitud')),
+    ('respuesta_adopcion', ('tipo', 'solicitud_id', 'mascota_id', 'usuario', 'salario', 'resultado',
+                            'aprobado', 'motivo', 'timestamp', 'accion', 'salario_usuario')),
+)
+
+class CodecJSON:
+    """Texto JSON: el formato original, fácil de leer en la consola de RabbitMQ."""
+    nombre = 'json'
+    content_type = 'application/json'
+
+    def codificar(self, mensaje):
+        return json.dumps(mensaje, separators=(',', ':')).encode()
+
+    def decodificar(self, body):
+        return json.loads(body)
+
+class CodecCompacto:
+    """msgpack con esquema: [id de esquema, máscara de campos presentes, valores...].
+
+    Los nombres de los campos no viajan en el mensaje. Los mensajes sin esquema
+    conocido (o con campos extra) se envían como mapa msgpack normal.
+    """
+    nombre = 'compacto'
+    content_type = 'application/x-petconnect+msgpack'
+
+    def __init__(self, esquemas=ESQUEMAS):
+        self.esquemas = [campos for tipo, campos in esquemas]
+        self.por_tipo = {tipo: (i, campos, frozenset(campos)) for i, (tipo, campos) in enumerate(esquemas)}
+
+    def codificar(self, mensaje):
+        esquema = self.por_tipo.get(mensaje.get('tipo'))
+        if esquema is None or not esquema[2].issuperset(mensaje):
+            return msgpack.packb(mensaje, use_bin_type=True)
+
+        id_esquema, campos, _ = esquema
+        mascara = 0
+        valores = []
+        for bit, campo in enumerate(campos):
+            if campo in mensaje:
+                mascara |= 1 << bit
+                valores.append(mensaje[campo])
+        return msgpack.packb([id_esquema, mascara] + valores, use_bin_type=True)
+
+    def decodificar(self, body):
+        datos = msgpack.unpackb(body, raw=False, strict_map_key=False)
+        if not isinstance(datos, list):
+            return datos
+
+        id_esquema, mascara, valores = datos[0], datos[1], iter(datos[2:])
+        return {
+            campo: next(valores)
+            for bit, campo in enumerate(self.esquemas[id_esquema])
+            if mascara & (1 << bit)
+        }
+
+CODECS = {CodecJSON.content_type: CodecJSON()}
+if msgpack is not None:
+    CODECS[CodecCompacto.content_type] = CodecCompacto()
+
+def obtener_codec(nombre=PETCONNECT_CODEC):
+    """Codec por nombre; si falta msgpack se usa JSON."""
+    for codec in CODECS.values():
+        if codec.nombre == nombre:
+            return codec
+    return CODECS[CodecJSON.content_type]
+
+def empaquetar(mensaje, codec=None, **propiedades):
+    """Codifica un mensaje y arma sus BasicProperties con el content_type correspondiente."""
+    from pika import BasicProperties  # diferido: solo hace falta al publicar
+    codec = codec or obtener_codec()
+    return codec.codificar(mensaje), BasicProperties(content_type=codec.content_type, **propiedades)
+
+def desempaquetar(body, properties=None):
+    """Decodifica según el content_type del mensaje (sin content_type se asume JSON)."""
+    content_type = getattr(properties, 'content_type', None) or CodecJSON.content_type
+    return CODECS[content_type].decodificar(body)
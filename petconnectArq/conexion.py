@@ -1,22 +1,444 @@
-import pika
 import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def conectar_rabbitmq():
-    """Establece conexión con RabbitMQ con manejo de errores."""
-    try:
-        conexion = pika.BlockingConnection(
-            pika.ConnectionParameters(
-                host='localhost',
-                heartbeat=600,
-                blocked_connection_timeout=300
-            )
+RABBITMQ_HOST = os.environ.get('RABBITMQ_HOST', 'localhost')
+POOL_TAMANO = int(os.environ.get('RABBITMQ_POOL_TAMANO', '4'))
+# Prioridades de solicitudes_adopcion: web interactiva > productor > cargas por lote.
+# Con PETCONNECT_PRIORIDAD_MAXIMA > 0 la cola se declara con x-max-priority y el
+# broker entrega por prioridad. Es opcional porque RabbitMQ no deja cambiar los
+# argumentos de una cola existente (PRECONDITION_FAILED): para activarlo hay que
+# borrar o migrar solicitudes_adopcion antes. Sin él, la prioridad de cada mensaje
+# la sigue usando el planificador del procesador.
+PRIORIDAD_MAXIMA = int(os.environ.get('PETCONNECT_PRIORIDAD_MAXIMA', '0'))
+_TOPE_PRIORIDAD = PRIORIDAD_MAXIMA or 10
+PRIORIDAD_WEB = min(8, _TOPE_PRIORIDAD)
+PRIORIDAD_NORMAL = min(5, _TOPE_PRIORIDAD)
+PRIORIDAD_LOTE = min(1, _TOPE_PRIORIDAD)
+
+# Tope duro de mensajes listos en solicitudes_adopcion (0 = sin tope). Al
+# llegar, el broker rechaza las publicaciones nuevas (nack con confirms; sin
+# confirms se pierden), así que conviene dejar PETCONNECT_ADMISION_LIMITE por debajo.
+COLA_MAX_LONGITUD = int(os.environ.get('PETCONNECT_COLA_MAX_LONGITUD', '0'))
+
+# Argumentos con los que se declara cada cola, iguales en todos los componentes.
+# Cambiarlos sobre una cola ya existente en RabbitMQ da PRECONDITION_FAILED:
+# hay que borrarla (o migrarla con una policy) antes de desplegar el cambio.
+# Cada cola principal descarta al DLX de su PoliticaReintentos (<cola>.dlx), así
+# un basic_nack(requeue=False) termina en <cola>.dlq y no se pierde.
+ARGUMENTOS_COLAS = {
+    cola: {'x-dead-letter-exchange': f"{cola}.dlx"}
+    for cola in ('solicitudes_adopcion', 'notificaciones', 'resultados_adopcion')
+}
+if PRIORIDAD_MAXIMA:
+    ARGUMENTOS_COLAS['solicitudes_adopcion']['x-max-priority'] = PRIORIDAD_MAXIMA
+if COLA_MAX_LONGITUD:
+    ARGUMENTOS_COLAS['solicitudes_adopcion'].update({
+        'x-max-length': COLA_MAX_LONGITUD,
+        'x-overflow': 'reject-publish'
+    })
+
+# 'rabbitmq' (broker real) o 'memoria' (broker en proceso, sin RabbitMQ)
+PETCONNECT_BROKER = os.environ.get('PETCONNECT_BROKER', 'rabbitmq')
+
+class TransportePika:
+    """Conexiones bloqueantes de pika contra un RabbitMQ real."""
+    nombre = 'rabbitmq'
+
+    def __init__(self, host=RABBITMQ_HOST, heartbeat=600, blocked_connection_timeout=300):
+        # pika se importa al crear el transporte y no con este módulo (~100 ms de arranque)
+        import pika
+        self._pika = pika
+        self.parametros = pika.ConnectionParameters(
+            host=host,
+            heartbeat=heartbeat,
+            blocked_connection_timeout=blocked_connection_timeout
         )
+
+    def conectar(self):
+        return self._pika.BlockingConnection(self.parametros)
+
+    def conectar_confirmaciones(self, al_confirmar, al_devolver):
+        return CanalConfirmacionesPika(self._pika, self.parametros, al_confirmar, al_devolver)
+
+class CanalConfirmacionesPika:
+    """Canal en modo confirm que no espera el ack de cada publicación.
+
+    BlockingChannel.confirm_delivery() hace que cada basic_publish espere su
+    propio ack (un viaje de ida y vuelta por mensaje), así que este canal va
+    sobre una SelectConnection: basic_publish solo escribe, y los Basic.Ack /
+    Basic.Nack (y los Basic.Return de mandatory) llegan a `al_confirmar` y
+    `al_devolver` mientras corre esperar().
+    """
+    def __init__(self, pika, parametros, al_confirmar, al_devolver, timeout=30):
+        self._pika = pika
+        self._al_confirmar = al_confirmar
+        self._al_devolver = al_devolver
+        self._condicion = None
+        self._error = None
+        self._listo = False
+        self._esperando = False
+        self.canal = None
+        self.conexion = pika.SelectConnection(
+            parametros,
+            on_open_callback=self._conexion_abierta,
+            on_open_error_callback=self._conexion_cerrada,
+            on_close_callback=self._conexion_cerrada
+        )
+        if not self.esperar(lambda: self._listo, timeout):
+            self.close()
+            raise pika.exceptions.AMQPConnectionError('El canal de confirmaciones no abrió a tiempo')
+
+    def _conexion_abierta(self, conexion):
+        conexion.channel(on_open_callback=self._canal_abierto)
+
+    def _canal_abierto(self, canal):
+        self.canal = canal
+        canal.add_on_close_callback(self._canal_cerrado)
+        canal.add_on_return_callback(self._al_devolver)
+        canal.confirm_delivery(ack_nack_callback=self._confirmado, callback=self._modo_confirm)
+
+    def _modo_confirm(self, frame):
+        self._listo = True
+        self._revisar()
+
+    def _confirmado(self, frame):
+        self._al_confirmar(frame)
+        self._revisar()
+
+    def _canal_cerrado(self, canal, motivo):
+        self._fallar(motivo)
+
+    def _conexion_cerrada(self, conexion, motivo):
+        self._fallar(motivo)
+
+    def _fallar(self, motivo):
+        if self._error is None:
+            self._error = motivo if isinstance(motivo, Exception) else self._pika.exceptions.AMQPConnectionError(motivo)
+        self._detener()
+
+    def _revisar(self):
+        if self._condicion is not None and self._condicion():
+            self._detener()
+
+    def _detener(self):
+        # stop() fuera de start() dejaría marcado el próximo esperar() para salir enseguida
+        if self._esperando:
+            self.conexion.ioloop.stop()
+
+    @property
+    def is_open(self):
+        return self._error is None and self.canal is not None and self.canal.is_open
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        self.canal.basic_publish(exchange, routing_key, body, properties, mandatory)
+
+    def esperar(self, condicion, timeout):
+        """Atiende la conexión hasta que `condicion()` se cumpla o pase `timeout`. Devuelve condicion()."""
+        if self._error is None and not condicion():
+            ioloop = self.conexion.ioloop
+            self._condicion = condicion
+            self._esperando = True
+            temporizador = ioloop.call_later(timeout, ioloop.stop)
+            try:
+                ioloop.start()
+            finally:
+                self._esperando = False
+                self._condicion = None
+                ioloop.remove_timeout(temporizador)
+        if self._error is not None:
+            raise self._error
+        return condicion()
+
+    def close(self):
+        if self.conexion.is_open:
+            self.conexion.close()
+            try:
+                self.esperar(lambda: self.conexion.is_closed, 5)
+            except Exception:
+                pass
+
+class CanalConfirmacionesMemoria:
+    """Lo mismo que CanalConfirmacionesPika sobre el broker en memoria."""
+    def __init__(self, broker, al_confirmar, al_devolver):
+        self.conexion = broker.conectar()
+        self.canal = self.conexion.channel()
+        self.canal.add_on_return_callback(al_devolver)
+        self.canal.confirm_delivery(ack_nack_callback=al_confirmar)
+
+    @property
+    def is_open(self):
+        return self.canal.is_open
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        self.canal.basic_publish(exchange, routing_key, body, properties, mandatory)
+
+    def esperar(self, condicion, timeout):
+        """Atiende la conexión hasta que `condicion()` se cumpla o pase `timeout`. Devuelve condicion()."""
+        limite = time.monotonic() + timeout
+        while not condicion():
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            self.conexion.process_data_events(time_limit=min(restante, 0.05))
+        return condicion()
+
+    def close(self):
+        self.conexion.close()
+
+class TransporteMemoria:
+    """Conexiones a un broker en memoria compartido por todo el proceso."""
+    nombre = 'memoria'
+
+    def __init__(self, broker=None):
+        from broker_memoria import BrokerMemoria
+        self.broker = broker or BrokerMemoria()
+
+    def conectar(self):
+        return self.broker.conectar()
+
+    def conectar_confirmaciones(self, al_confirmar, al_devolver):
+        return CanalConfirmacionesMemoria(self.broker, al_confirmar, al_devolver)
+
+TRANSPORTES = {
+    TransportePika.nombre: TransportePika,
+    TransporteMemoria.nombre: TransporteMemoria,
+}
+
+def crear_transporte(nombre=PETCONNECT_BROKER, **kwargs):
+    """Instancia el transporte por nombre ('rabbitmq' o 'memoria')."""
+    try:
+        return TRANSPORTES[nombre](**kwargs)
+    except KeyError:
+        raise ValueError(f"Broker desconocido: {nombre} (opciones: {', '.join(TRANSPORTES)})")
+
+class _EntradaPool:
+    """Conexión y canal reutilizables."""
+    def __init__(self, conexion, canal):
+        self.conexion = conexion
+        self.canal = canal
+
+class PoolConexiones:
+    """Pool thread-safe de conexiones/canales de larga duración sobre un transporte.
+
+    No se conecta hasta que se pide el primer canal, y el transporte se crea
+    recién entonces, así que importar este módulo no cuesta nada.
+    """
+    def __init__(self, host=RABBITMQ_HOST, tamano=POOL_TAMANO, heartbeat=600,
+                 blocked_connection_timeout=300, timeout_espera=10, transporte=None):
+        self._parametros = (host, heartbeat, blocked_connection_timeout)
+        self._transporte = transporte
+        self.tamano = tamano
+        self.timeout_espera = timeout_espera
+        self._libres = queue.LifoQueue()
+        self._creadas = 0
+        self._lock = threading.Lock()
+        self._entradas = {}  # id(canal) -> _EntradaPool
+        # Colas/exchanges ya declarados en el broker por cualquier canal del pool
+        self._declaradas = set()
+
+    @property
+    def transporte(self):
+        if self._transporte is None:
+            with self._lock:
+                if self._transporte is None:
+                    if PETCONNECT_BROKER == TransportePika.nombre:
+                        self._transporte = TransportePika(*self._parametros)
+                    else:
+                        self._transporte = crear_transporte(PETCONNECT_BROKER)
+        return self._transporte
+
+    def _crear_entrada(self):
+        conexion = self.transporte.conectar()
         canal = conexion.channel()
-        logger.info("Conexión establecida con RabbitMQ")
-        return canal
+        entrada = _EntradaPool(conexion, canal)
+        with self._lock:
+            self._entradas[id(canal)] = entrada
+        logger.info(f"Conexión establecida con el broker ({self.transporte.nombre})")
+        return entrada
+
+    def _esta_sana(self, entrada):
+        """Health check: la conexión sigue abierta y responde a heartbeats."""
+        try:
+            if not (entrada.conexion.is_open and entrada.canal.is_open):
+                return False
+            entrada.conexion.process_data_events(time_limit=0)
+            return True
+        except Exception as e:
+            logger.warning(f"Conexión del pool no saludable: {e}")
+            return False
+
+    def _descartar(self, entrada):
+        with self._lock:
+            self._entradas.pop(id(entrada.canal), None)
+            self._creadas -= 1
+            # Si se cayó el broker, las colas no durables ya no existen: declarar de nuevo
+            self._declaradas.clear()
+        try:
+            if entrada.conexion.is_open:
+                entrada.conexion.close()
+        except Exception:
+            pass
+
+    def obtener(self):
+        """Toma un canal del pool, reconectando si el que estaba libre murió."""
+        limite = time.monotonic() + self.timeout_espera
+        while True:
+            try:
+                entrada = self._libres.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    puede_crear = self._creadas < self.tamano
+                    if puede_crear:
+                        self._creadas += 1
+                if puede_crear:
+                    try:
+                        return self._crear_entrada().canal
+                    except Exception:
+                        with self._lock:
+                            self._creadas -= 1
+                        raise
+                # Espera en tramos cortos: si otra conexión se descarta, se puede crear una nueva
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise RuntimeError("No hay conexiones libres en el pool de RabbitMQ")
+                try:
+                    entrada = self._libres.get(timeout=min(restante, 0.1))
+                except queue.Empty:
+                    continue
+
+            if self._esta_sana(entrada):
+                return entrada.canal
+            self._descartar(entrada)
+
+    def devolver(self, canal, descartar=False):
+        """Devuelve un canal al pool (o lo descarta si falló)."""
+        entrada = self._entradas.get(id(canal))
+        if entrada is None:
+            return
+        if descartar or not self._esta_sana(entrada):
+            self._descartar(entrada)
+        else:
+            self._libres.put(entrada)
+
+    @contextmanager
+    def canal(self):
+        """Context manager que presta un canal y lo devuelve al terminar."""
+        canal = self.obtener()
+        try:
+            yield canal
+        except Exception as e:
+            self.devolver(canal, descartar=_es_error_amqp(e))
+            raise
+        else:
+            self.devolver(canal)
+
+    def canal_dedicado(self):
+        """Canal sobre una conexión propia, fuera del pool.
+
+        Para los consumidores de larga duración (start_consuming): no ocupan el
+        lugar de los que publican, y si la conexión se cae no queda contada en
+        el pool. Quien lo pide cierra su conexión (canal.connection.close()).
+        """
+        conexion = self.transporte.conectar()
+        logger.info(f"Conexión dedicada establecida con el broker ({self.transporte.nombre})")
+        return conexion.channel()
+
+    @contextmanager
+    def conexion_dedicada(self):
+        """Como canal_dedicado(), pero cierra la conexión al salir del bloque."""
+        canal = self.canal_dedicado()
+        try:
+            yield canal
+        finally:
+            try:
+                if canal.connection.is_open:
+                    canal.connection.close()
+            except Exception:
+                pass
+
+    def canal_confirmaciones(self, al_confirmar, al_devolver):
+        """Canal en modo confirm asíncrono sobre una conexión propia (ver CanalConfirmacionesPika).
+
+        `al_confirmar(frame)` recibe cada Basic.Ack/Basic.Nack y
+        `al_devolver(canal, method, properties, body)` cada mensaje mandatory sin destino.
+        """
+        return self.transporte.conectar_confirmaciones(al_confirmar, al_devolver)
+
+    def declarar_cola(self, canal, cola, **kwargs):
+        """queue_declare una sola vez por proceso para cada cola.
+
+        Las declaraciones son del broker, no del canal: una vez que un canal del
+        pool declaró la cola, los demás no vuelven a hacerlo. El memo distingue
+        durable y arguments, así que una declaración distinta de la misma cola
+        sí llega al broker y falla (PRECONDITION_FAILED) en lugar de omitirse.
+        Los canales ajenos al pool (p. ej. los de benchmark.py) declaran siempre.
+        """
+        if cola in ARGUMENTOS_COLAS:
+            kwargs.setdefault('arguments', ARGUMENTOS_COLAS[cola])
+        clave = ('cola', cola, bool(kwargs.get('durable')), repr(sorted((kwargs.get('arguments') or {}).items())))
+        del_pool = id(canal) in self._entradas
+        if del_pool and clave in self._declaradas:
+            return
+        canal.queue_declare(queue=cola, **kwargs)
+        if del_pool:
+            self._declaradas.add(clave)
+
+    def declarar_exchange(self, canal, exchange, **kwargs):
+        """exchange_declare una sola vez por proceso para cada exchange."""
+        clave = ('exchange', exchange)
+        del_pool = id(canal) in self._entradas
+        if del_pool and clave in self._declaradas:
+            return
+        canal.exchange_declare(exchange=exchange, **kwargs)
+        if del_pool:
+            self._declaradas.add(clave)
+
+    def olvidar_cola(self, cola):
+        """Invalida el memo de una cola (p. ej. después de queue_delete)."""
+        with self._lock:
+            self._declaradas = {clave for clave in self._declaradas if clave[:2] != ('cola', cola)}
+
+    def cerrar(self):
+        """Cierra todas las conexiones libres del pool."""
+        while True:
+            try:
+                self._descartar(self._libres.get_nowait())
+            except queue.Empty:
+                break
+
+    def usar_transporte(self, transporte):
+        """Cambia el transporte de las conexiones nuevas (p. ej. a 'memoria')."""
+        if isinstance(transporte, str):
+            transporte = crear_transporte(transporte)
+        self.cerrar()
+        self._transporte = transporte
+        self._declaradas.clear()
+        return transporte
+
+def _es_error_amqp(error):
+    """True si el error deja inservible el canal (conexión o canal cerrados)."""
+    # Import local: con un canal en uso pika ya está cargado y no cuesta nada
+    from pika.exceptions import AMQPConnectionError, AMQPChannelError
+    return isinstance(error, (AMQPConnectionError, AMQPChannelError))
+
+# Pool compartido por todo el proceso
+pool = PoolConexiones()
+
+def conectar_rabbitmq():
+    """Canal de un consumidor de larga duración, sobre su propia conexión.
+
+    No sale del pool: los componentes lo retienen mientras consumen, y el pool
+    queda para los préstamos cortos de quienes publican.
+    """
+    try:
+        return pool.canal_dedicado()
     except Exception as e:
         logger.error(f"Error conectando a RabbitMQ: {e}")
         raise
@@ -24,7 +446,7 @@ def conectar_rabbitmq():
 def declarar_colas(canal):
     """Declara todas las colas necesarias para el sistema."""
     colas = ['solicitudes_adopcion', 'notificaciones', 'resultados_adopcion']
-    
+
     for cola in colas:
-        canal.queue_declare(queue=cola, durable=True)
-        logger.info(f"Cola '{cola}' declarada correctamente")
\ No newline at end of file
+        pool.declarar_cola(canal, cola, durable=True)
+        logger.info(f"Cola '{cola}' declarada correctamente")
@@ -1,71 +1,239 @@
 from conexion import conectar_rabbitmq, declarar_colas
-import json
+from codec import desempaquetar
+from metricas import Cronometro, contar, observar_etapa, iniciar_volcado_periodico
+from reintentos import PoliticaReintentos
+from historial import HistorialResultados
+from arranque import etapa_arranque, reportar_arranque
+from trazas import tramo
+from perfilador import instalar_senales
+from logging.handlers import QueueHandler, QueueListener
+import functools
 import logging
+import os
+import queue
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Modo por lotes: hasta CONSUMIDOR_LOTE resultados o CONSUMIDOR_LOTE_MS ms (0 = de a uno)
+CONSUMIDOR_LOTE = int(os.environ.get('CONSUMIDOR_LOTE', '0'))
+CONSUMIDOR_LOTE_MS = int(os.environ.get('CONSUMIDOR_LOTE_MS', '200'))
+
+def crear_log_diferido(nombre):
+    """Logger cuyos registros escribe un hilo aparte (QueueHandler + QueueListener).
+    
+    Quien loguea solo encola el registro; la E/S la hacen los handlers del
+    logger raíz desde el hilo del QueueListener.
+    """
+    cola = queue.SimpleQueue()
+    log = logging.getLogger(nombre)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    log.addHandler(QueueHandler(cola))
+    oyente = QueueListener(cola, *logging.getLogger().handlers, respect_handler_level=True)
+    oyente.start()
+    return log, oyente
+
 class ConsumidorResultados:
-    def __init__(self):
-        self.canal = conectar_rabbitmq()
-        declarar_colas(self.canal)
+    def __init__(self, canal=None, lote=CONSUMIDOR_LOTE, lote_ms=CONSUMIDOR_LOTE_MS, historial=None):
+        # La conexión y la declaración de colas se hacen en el primer uso de self.canal
+        self._canal = canal
+        self._canal_listo = False
+        # Cada resultado queda en el histórico consultable antes de hacer ack
+        if historial is None:
+            with etapa_arranque('historial'):
+                historial = HistorialResultados()
+        self.historial = historial
+        self.reintentos = {
+            cola: PoliticaReintentos(cola) for cola in ('resultados_adopcion', 'notificaciones')
+        }
+        
+        self.lote = lote
+        self.lote_ms = lote_ms
+        self._pendientes = []  # (method, properties, body) sin ack del lote en curso
+        self._generacion = 0
+        self.log, self._oyente_log = logger, None
+        if self.lote > 1:
+            self.log, self._oyente_log = crear_log_diferido(f"{__name__}.lote")
+    
+    @property
+    def canal(self):
+        """Canal del consumidor: se conecta y declara las colas la primera vez que se usa."""
+        if self._canal_listo and not self._canal.is_open:
+            # La conexión se cayó: se abre otra y se vuelven a declarar las colas
+            self._canal, self._canal_listo = None, False
+        if not self._canal_listo:
+            if self._canal is None:
+                with etapa_arranque('conexion'):
+                    self._canal = conectar_rabbitmq()
+            with etapa_arranque('declaracion'):
+                declarar_colas(self._canal)
+                for politica in self.reintentos.values():
+                    politica.declarar(self._canal)
+            self._canal_listo = True
+        return self._canal
     
     def manejar_resultado(self, ch, method, properties, body):
         """Maneja los resultados de las solicitudes procesadas."""
         try:
-            resultado = json.loads(body.decode())
-            solicitud = resultado['solicitud_original']
-            datos_resultado = resultado['resultado']
-            
-            estado = "APROBADO" if datos_resultado['aprobado'] else "RECHAZADO"
-            logger.info(f"[Consumidor] Resultado recibido:")
-            logger.info(f"   Mascota: {solicitud['mascota_id']}")
-            logger.info(f"   Usuario: {solicitud['usuario_id']}")
-            logger.info(f"   Estado: {estado}")
-            logger.info(f"   Mensaje: {datos_resultado['mensaje']}")
-            
-            # Mostrar criterios evaluados
-            if 'criterios_evaluados' in datos_resultado:
-                logger.info("   Criterios evaluados:")
-                for criterio, valor in datos_resultado['criterios_evaluados'].items():
-                    estado_criterio = "CUMPLE" if valor else "NO CUMPLE"
-                    logger.info(f"     {estado_criterio} {criterio}")
-            
-            logger.info("=" * 50)
+            with Cronometro('consumidor'), tramo('manejar_resultado', padre=properties):
+                resultado = desempaquetar(body, properties)
+                self._registrar_resultado(resultado)
+                with tramo('historial'):
+                    self.historial.guardar_varios([resultado])
             
             ch.basic_ack(delivery_tag=method.delivery_tag)
+            contar('acks', 'resultados_adopcion')
             
         except Exception as e:
-            logger.error(f"[Consumidor] Error procesando resultado: {e}")
+            contar('errores', 'resultados_adopcion')
+            self.log.error(f"[Consumidor] Error procesando resultado: {e}")
+            self.reintentos['resultados_adopcion'].fallo(ch, method, properties, body, e)
+    
+    def acumular_resultado(self, ch, method, properties, body):
+        """Callback del modo por lotes: junta resultados hasta completar el lote o vencer el plazo."""
+        self._pendientes.append((method, properties, body))
+        if len(self._pendientes) >= self.lote:
+            self.procesar_lote(ch)
+        elif len(self._pendientes) == 1:
+            ch.connection.call_later(
+                self.lote_ms / 1000,
+                functools.partial(self._vencer_lote, ch, self._generacion)
+            )
+    
+    def _vencer_lote(self, ch, generacion):
+        # El temporizador puede llegar después de que el lote ya se llenó y procesó
+        if generacion == self._generacion and self._pendientes:
+            self.procesar_lote(ch)
+    
+    def procesar_lote(self, ch):
+        """Procesa los resultados acumulados y los confirma con un solo ack múltiple."""
+        pendientes, self._pendientes = self._pendientes, []
+        self._generacion += 1
+        lineas = []
+        correctos = []  # (mensaje, resultado)
+        
+        with Cronometro('consumidor_lote'), tramo('procesar_lote', mensajes=len(pendientes)):
+            for method, properties, body in pendientes:
+                try:
+                    with tramo('manejar_resultado', padre=properties):
+                        resultado = desempaquetar(body, properties)
+                        lineas.extend(self._describir_resultado(resultado))
+                    correctos.append(((method, properties, body), resultado))
+                except Exception as e:
+                    contar('errores', 'resultados_adopcion')
+                    self.log.error(f"[Consumidor] Error procesando resultado: {e}")
+                    # Primero los fallidos (ack individual); el ack múltiple no debe cubrir un tag ya confirmado
+                    self.reintentos['resultados_adopcion'].fallo(ch, method, properties, body, e)
+            
+            try:
+                # Un solo INSERT por lote
+                with tramo('historial'):
+                    self.historial.guardar_varios([resultado for _, resultado in correctos])
+            except Exception as e:
+                contar('errores', 'resultados_adopcion')
+                self.log.error(f"[Consumidor] Error guardando el lote en el histórico: {e}")
+                for (method, properties, body), _ in correctos:
+                    self.reintentos['resultados_adopcion'].fallo(ch, method, properties, body, e)
+                correctos = []
+            
+            # Las notificaciones del mismo canal se confirman en su callback,
+            # así que el ack múltiple solo cubre resultados de este lote
+            if correctos:
+                (ultimo, _, _), _ = correctos[-1]
+                ch.basic_ack(delivery_tag=ultimo.delivery_tag, multiple=True)
+                contar('acks', 'resultados_adopcion', len(correctos))
+        
+        if lineas:
+            self.log.info("\n".join(lineas))
+    
+    def _registrar_resultado(self, resultado):
+        """Registra (en el log) un resultado ya decodificado."""
+        for linea in self._describir_resultado(resultado):
+            self.log.info(linea)
     
+    def _describir_resultado(self, resultado):
+        """Cuenta un resultado ya decodificado y devuelve sus líneas de log."""
+        contar('consumidos', 'resultados_adopcion')
+        if 'timestamp_solicitud' in resultado:
+            observar_etapa('extremo_a_extremo', time.time() - resultado['timestamp_solicitud'])
+        
+        # Los resultados referencian la solicitud por id; los antiguos traían una copia
+        solicitud = resultado.get('solicitud_original', resultado)
+        datos_resultado = resultado['resultado']
+        
+        estado = "APROBADO" if datos_resultado['aprobado'] else "RECHAZADO"
+        lineas = [
+            f"[Consumidor] Resultado recibido:",
+            f"   Mascota: {solicitud['mascota_id']}",
+            f"   Usuario: {solicitud['usuario_id']}",
+            f"   Estado: {estado}",
+            f"   Mensaje: {datos_resultado['mensaje']}",
+        ]
+        
+        # Mostrar criterios evaluados
+        if 'criterios_evaluados' in datos_resultado:
+            lineas.append("   Criterios evaluados:")
+            for criterio, valor in datos_resultado['criterios_evaluados'].items():
+                estado_criterio = "CUMPLE" if valor else "NO CUMPLE"
+                lineas.append(f"     {estado_criterio} {criterio}")
+        
+        lineas.append("=" * 50)
+        return lineas
+
     def manejar_notificacion(self, ch, method, properties, body):
         """Maneja las notificaciones del sistema."""
         try:
-            notificacion = json.loads(body.decode())
-            
-            tipo_texto = {
-                'success': 'EXITO',
-                'warning': 'ADVERTENCIA',
-                'info': 'INFORMACION',
-                'error': 'ERROR'
-            }
-            
-            tipo = tipo_texto.get(notificacion['tipo_notificacion'], 'NOTIFICACION')
-            logger.info(f"[{tipo}] Para {notificacion['usuario_id']}: {notificacion['mensaje']}")
-            
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+            with tramo('manejar_notificacion', padre=properties):
+                notificacion = desempaquetar(body, properties)
+                contar('consumidos', 'notificaciones')
+                
+                tipo_texto = {
+                    'success': 'EXITO',
+                    'warning': 'ADVERTENCIA',
+                    'info': 'INFORMACION',
+                    'error': 'ERROR'
+                }
+                
+                tipo = tipo_texto.get(notificacion['tipo_notificacion'], 'NOTIFICACION')
+                self.log.info(f"[{tipo}] Para {notificacion['usuario_id']}: {notificacion['mensaje']}")
+                
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+                contar('acks', 'notificaciones')
             
         except Exception as e:
-            logger.error(f"[Consumidor] Error procesando notificación: {e}")
+            contar('errores', 'notificaciones')
+            self.log.error(f"[Consumidor] Error procesando notificación: {e}")
+            self.reintentos['notificaciones'].fallo(ch, method, properties, body, e)
     
     def iniciar_consumo(self):
         """Inicia el consumo de resultados y notificaciones."""
         print("[Consumidor] Iniciando consumidor de resultados...")
+        if self.lote > 1:
+            print(f"[Consumidor] Modo por lotes: {self.lote} mensajes o {self.lote_ms} ms")
         
+        self.suscribir()
+        reportar_arranque('consumidor')
+        
+        try:
+            print("[Consumidor] Escuchando resultados y notificaciones...")
+            self.canal.start_consuming()
+        except KeyboardInterrupt:
+            print("[Consumidor] Deteniendo consumidor...")
+            self.detener()
+        except Exception as e:
+            print(f"[Consumidor] Error: {e}")
+    
+    def suscribir(self):
+        """Registra los consumidores de resultados y notificaciones sin bloquear."""
         # Consumir resultados de adopción
+        if self.lote > 1:
+            # Con margen para seguir recibiendo mientras se procesa un lote completo
+            self.canal.basic_qos(prefetch_count=self.lote * 2)
         self.canal.basic_consume(
             queue='resultados_adopcion',
-            on_message_callback=self.manejar_resultado
+            on_message_callback=self.acumular_resultado if self.lote > 1 else self.manejar_resultado
         )
         
         # Consumir notificaciones
@@ -73,15 +241,17 @@ class ConsumidorResultados:
             queue='notificaciones',
             on_message_callback=self.manejar_notificacion
         )
-        
-        try:
-            print("[Consumidor] Escuchando resultados y notificaciones...")
-            self.canal.start_consuming()
-        except KeyboardInterrupt:
-            print("[Consumidor] Deteniendo consumidor...")
-        except Exception as e:
-            print(f"[Consumidor] Error: {e}")
+    
+    def detener(self):
+        """Procesa lo que quedó del lote en curso y vacía el log diferido."""
+        if self._pendientes and self.canal.is_open:
+            self.procesar_lote(self.canal)
+        if self._oyente_log is not None:
+            self._oyente_log.stop()
+            self._oyente_log = None
 
 if __name__ == "__main__":
+    iniciar_volcado_periodico('consumidor')
+    instalar_senales('consumidor')
     consumidor = ConsumidorResultados()
     consumidor.iniciar_consumo()
\ No newline at end of file
@@ -0,0 +1,71 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from cache import CacheLRU
+
+DEDUP_TAMANO = int(os.environ.get('PETCONNECT_DEDUP_TAMANO', '10000'))
+DEDUP_TTL = int(os.environ.get('PETCONNECT_DEDUP_TTL', '3600'))
+# Ruta SQLite para que los veredictos sobrevivan a reinicios del procesador ('' = solo memoria)
+DEDUP_DB = os.environ.get('PETCONNECT_DEDUP_DB', '')
+
+class RegistroVeredictos:
+    """Veredictos ya publicados por solicitud_id, para no reprocesar reentregas.
+
+    Cache LRU/TTL en memoria; opcionalmente respaldada en SQLite (`ruta`) para
+    reconocer duplicados también después de reiniciar el procesador.
+    """
+    def __init__(self, tamano_maximo=DEDUP_TAMANO, ttl_segundos=DEDUP_TTL, ruta=DEDUP_DB):
+        self.ttl_segundos = ttl_segundos
+        self.cache = CacheLRU(tamano_maximo=tamano_maximo, ttl_segundos=ttl_segundos)
+        self._conexion = None
+        self._lock = threading.Lock()
+        if ruta:
+            self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+            with self._lock, self._conexion:
+                self._conexion.execute('''
+                    CREATE TABLE IF NOT EXISTS veredictos (
+                        solicitud_id TEXT PRIMARY KEY,
+                        expira REAL NOT NULL,
+                        veredicto TEXT NOT NULL
+                    )
+                ''')
+                self._conexion.execute('DELETE FROM veredictos WHERE expira < ?', (time.time(),))
+
+    def obtener(self, solicitud_id):
+        """Veredicto publicado para la solicitud, o None si no se ha procesado."""
+        if not solicitud_id:
+            return None
+        veredicto = self.cache.get(solicitud_id)
+        if veredicto is not None or self._conexion is None:
+            return veredicto
+
+        with self._lock:
+            fila = self._conexion.execute(
+                'SELECT veredicto, expira FROM veredictos WHERE solicitud_id = ?', (solicitud_id,)
+            ).fetchone()
+        if fila is None or fila[1] < time.time():
+            return None
+        veredicto = json.loads(fila[0])
+        self.cache.put(solicitud_id, veredicto, ttl_segundos=fila[1] - time.time())
+        return veredicto
+
+    def guardar(self, solicitud_id, veredicto):
+        if not solicitud_id:
+            return
+        self.cache.put(solicitud_id, veredicto)
+        if self._conexion is not None:
+            with self._lock, self._conexion:
+                self._conexion.execute(
+                    'INSERT OR REPLACE INTO veredictos VALUES (?, ?, ?)',
+                    (solicitud_id, time.time() + self.ttl_segundos, json.dumps(veredicto))
+                )
+
+    def estadisticas(self):
+        return self.cache.estadisticas()
+
+    def cerrar(self):
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from datetime import datetime
+from conexion import pool
+from codec import empaquetar, desempaquetar
+from metricas import contar
+
+# Replicar notificaciones y resultados asíncronos entre workers/nodos de la app web
+NOTIFICACIONES_COMPARTIDAS = os.environ.get('PETCONNECT_NOTIFICACIONES_COMPARTIDAS', '0') == '1'
+EXCHANGE_WEB = os.environ.get('PETCONNECT_EXCHANGE_WEB', 'petconnect.web')
+
+class DifusionWeb:
+    """Estado de la capa web compartido por un exchange fanout.
+
+    Cada worker declara una cola exclusiva enlazada a `EXCHANGE_WEB`. Los cambios
+    (notificación nueva, limpieza, solicitud asíncrona registrada o resuelta)
+    no se aplican directo sobre la memoria local: se publican en el exchange y
+    cada worker, incluido el que los originó, los aplica al recibirlos. Así
+    cualquier worker responde igual a /notificaciones, al stream SSE y a
+    /resultado_adopcion. Los ids de notificación los pone cada worker al
+    recibirlas, en su orden de llegada.
+
+    Un worker que arranca tarde solo ve lo publicado desde que se suscribió.
+    """
+    def __init__(self, manager, exchange=EXCHANGE_WEB, timeout_arranque=2):
+        self.manager = manager
+        self.exchange = exchange
+        self.timeout_arranque = timeout_arranque
+        self._hilo = None
+        self._lock = threading.Lock()
+        self._listo = threading.Event()
+        self._esperado = False  # ya se esperó una vez a que el hilo se suscribiera
+        self._avisado = False   # ya se avisó que se entrega solo en local
+
+    def iniciar(self):
+        """Arranca (una sola vez por proceso) el hilo que aplica los eventos del exchange."""
+        if self._hilo is None:
+            with self._lock:
+                if self._hilo is None:
+                    self._hilo = threading.Thread(target=self._escuchar, name='difusion-web', daemon=True)
+                    self._hilo.start()
+
+    def _escuchar(self):
+        while True:
+            try:
+                # Conexión propia: una caída no se lleva un canal del pool de publicación
+                with pool.conexion_dedicada() as canal:
+                    pool.declarar_exchange(canal, self.exchange, exchange_type='fanout', durable=True)
+                    cola = canal.queue_declare(queue='', exclusive=True, auto_delete=True).method.queue
+                    canal.queue_bind(queue=cola, exchange=self.exchange)
+                    canal.basic_consume(queue=cola, on_message_callback=self._aplicar, auto_ack=True)
+                    self._listo.set()
+                    self._avisado = False
+                    canal.start_consuming()
+                self._listo.clear()
+            except Exception as e:
+                self._listo.clear()
+                print(f"ERROR en la difusión entre workers: {e}")
+                time.sleep(5)
+
+    def publicar(self, evento, **datos):
+        """Publica un evento para todos los workers. Devuelve False si no se pudo."""
+        self.iniciar()
+        # Sin la cola enlazada, lo que publique este worker no le volvería. Solo la
+        # primera llamada espera al hilo; después, sin broker, se entrega en local al instante
+        if not self._listo.is_set():
+            if self._esperado or not self._listo.wait(self.timeout_arranque):
+                self._esperado = True
+                if not self._avisado:
+                    self._avisado = True
+                    print(f"[Difusion] Sin conexión a '{self.exchange}': eventos solo en este worker")
+                return False
+        self._esperado = True
+        try:
+            body, propiedades = empaquetar(dict(datos, tipo='evento_web', evento=evento))
+            with pool.canal() as canal:
+                pool.declarar_exchange(canal, self.exchange, exchange_type='fanout', durable=True)
+                canal.basic_publish(exchange=self.exchange, routing_key='', body=body, properties=propiedades)
+            contar('publicados', self.exchange)
+            return True
+        except Exception as e:
+            contar('errores', self.exchange)
+            print(f"ERROR publicando evento web '{evento}': {e}")
+            return False
+
+    def _aplicar(self, ch, method, properties, body):
+        try:
+            evento = desempaquetar(body, properties)
+            tipo = evento['evento']
+            if tipo == 'notificacion':
+                self.manager.notifications.agregar(
+                    evento['titulo'], evento['mensaje'], evento['tipo_notificacion'],
+                    momento=datetime.fromtimestamp(evento['timestamp'])
+                )
+                self.manager.difusor.publicar()
+            elif tipo == 'limpiar':
+                self.manager.notifications.limpiar()
+                self.manager.difusor.publicar()
+            elif tipo == 'registrada':
+                self.manager.resultados.registrar(evento['solicitud_id'])
+            elif tipo == 'resultado':
+                self.manager.resultados.completar(evento['solicitud_id'], evento['resultado'], crear=True)
+            contar('consumidos', self.exchange)
+        except Exception as e:
+            contar('errores', self.exchange)
+            print(f"ERROR aplicando evento web: {e}")
+
+    # Atajos usados por RabbitMQManager
+
+    def notificar(self, titulo, mensaje, tipo):
+        return self.publicar(
+            'notificacion', titulo=titulo, mensaje=mensaje,
+            tipo_notificacion=tipo, timestamp=time.time()
+        )
+
+    def limpiar(self):
+        return self.publicar('limpiar')
+
+    def registrar(self, solicitud_id):
+        return self.publicar('registrada', solicitud_id=solicitud_id)
+
+    def completar(self, solicitud_id, resultado):
+        return self.publicar('resultado', solicitud_id=solicitud_id, resultado=resultado)
@@ -0,0 +1,12 @@
+# Configuración de gunicorn para servir wsgi:app (ver wsgi.py)
+import multiprocessing
+import os
+
+bind = os.environ.get('PETCONNECT_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('PETCONNECT_WEB_WORKERS', multiprocessing.cpu_count()))
+# Hilos por worker: el stream SSE y el long-poll mantienen una petición abierta por cliente
+worker_class = 'gthread'
+threads = int(os.environ.get('PETCONNECT_WEB_HILOS', '32'))
+timeout = 60
+graceful_timeout = 30
+preload_app = False
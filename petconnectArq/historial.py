@@ -0,0 +1,142 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+HISTORIAL_DB = os.environ.get(
+    'PETCONNECT_HISTORIAL_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados.db')
+)
+
+class HistorialResultados:
+    """Histórico de veredictos en SQLite (WAL), pensado para millones de filas.
+
+    Se escribe por lotes desde ConsumidorResultados y se consulta desde la app
+    web. Las consultas paginan por cursor (timestamp, id) sobre los índices de
+    usuario, mascota y tiempo, así que una página cuesta lo mismo al principio
+    que al final del histórico (sin OFFSET).
+    """
+    def __init__(self, ruta=HISTORIAL_DB):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        self._crear_esquema()
+
+    def _crear_esquema(self):
+        with self._lock, self._conexion:
+            # WAL: los lectores (app web) no bloquean al escritor (consumidor)
+            self._conexion.execute('PRAGMA journal_mode=WAL')
+            self._conexion.execute('PRAGMA synchronous=NORMAL')
+            self._conexion.executescript('''
+                CREATE TABLE IF NOT EXISTS resultados (
+                    id INTEGER PRIMARY KEY,
+                    solicitud_id TEXT UNIQUE,
+                    usuario_id TEXT,
+                    mascota_id TEXT NOT NULL,
+                    aprobado INTEGER NOT NULL,
+                    puntaje INTEGER,
+                    mensaje TEXT,
+                    timestamp REAL NOT NULL,
+                    detalle TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_resultados_usuario ON resultados (usuario_id, timestamp);
+                CREATE INDEX IF NOT EXISTS idx_resultados_mascota ON resultados (mascota_id, timestamp);
+                CREATE INDEX IF NOT EXISTS idx_resultados_timestamp ON resultados (timestamp);
+            ''')
+
+    def guardar_varios(self, resultados):
+        """Inserta mensajes resultado_adopcion en una sola transacción.
+
+        Las reentregas de una misma solicitud_id se ignoran.
+        """
+        filas = []
+        for resultado in resultados:
+            solicitud = resultado.get('solicitud_original', resultado)
+            datos = resultado['resultado']
+            filas.append((
+                resultado.get('solicitud_id'),
+                solicitud.get('usuario_id'),
+                solicitud['mascota_id'],
+                int(bool(datos['aprobado'])),
+                datos.get('puntaje'),
+                datos.get('mensaje'),
+                resultado.get('timestamp') or time.time(),
+                json.dumps(datos.get('criterios_evaluados', {}))
+            ))
+        with self._lock, self._conexion:
+            self._conexion.executemany(
+                'INSERT OR IGNORE INTO resultados '
+                '(solicitud_id, usuario_id, mascota_id, aprobado, puntaje, mensaje, timestamp, detalle) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                filas
+            )
+        return len(filas)
+
+    def guardar_respuestas_web(self, respuestas):
+        """Inserta veredictos del portal (mensajes respuesta_adopcion).
+
+        Traen `usuario` y `motivo` en vez de `usuario_id` y `resultado`; se
+        guardan en las mismas columnas que los del procesador.
+        """
+        return self.guardar_varios([{
+            'solicitud_id': respuesta.get('solicitud_id'),
+            'usuario_id': respuesta.get('usuario'),
+            'mascota_id': respuesta['mascota_id'],
+            'timestamp': respuesta.get('timestamp'),
+            'resultado': {'aprobado': respuesta['aprobado'], 'mensaje': respuesta.get('motivo')}
+        } for respuesta in respuestas])
+
+    def _a_dict(self, fila):
+        resultado = dict(fila)
+        resultado['aprobado'] = bool(resultado['aprobado'])
+        resultado['criterios_evaluados'] = json.loads(resultado.pop('detalle') or '{}')
+        return resultado
+
+    def obtener(self, solicitud_id):
+        with self._lock:
+            fila = self._conexion.execute(
+                'SELECT * FROM resultados WHERE solicitud_id = ?', (solicitud_id,)
+            ).fetchone()
+        return self._a_dict(fila) if fila else None
+
+    def consultar(self, usuario=None, mascota=None, cursor=None, por_pagina=50):
+        """Página de resultados, del más reciente al más antiguo.
+
+        `cursor` es el valor 'siguiente' de la página anterior.
+        """
+        condiciones = []
+        parametros = []
+        if usuario:
+            condiciones.append('usuario_id = ?')
+            parametros.append(usuario)
+        if mascota:
+            condiciones.append('mascota_id = ?')
+            parametros.append(mascota)
+        if cursor:
+            timestamp, id_ = cursor.split(':')
+            condiciones.append('(timestamp, id) < (?, ?)')
+            parametros += [float(timestamp), int(id_)]
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+
+        por_pagina = max(1, min(por_pagina, 500))
+        with self._lock:
+            filas = self._conexion.execute(
+                f'SELECT * FROM resultados {where} ORDER BY timestamp DESC, id DESC LIMIT ?',
+                parametros + [por_pagina + 1]
+            ).fetchall()
+
+        siguiente = None
+        if len(filas) > por_pagina:
+            filas = filas[:por_pagina]
+            siguiente = f"{filas[-1]['timestamp']!r}:{filas[-1]['id']}"
+        return {
+            'resultados': [self._a_dict(fila) for fila in filas],
+            'por_pagina': por_pagina,
+            'siguiente': siguiente
+        }
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
@@ -0,0 +1,175 @@
+import bisect
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Intervalo (segundos) del volcado periódico en procesador.py / consumidor.py; 0 lo desactiva
+METRICAS_INTERVALO = float(os.environ.get('PETCONNECT_METRICAS_INTERVALO', '60'))
+
+# Límites de los buckets de latencia en segundos (estilo Prometheus)
+BUCKETS_LATENCIA = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _formatear_etiquetas(etiquetas, extra=None):
+    pares = list(etiquetas) + ([extra] if extra else [])
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pares) + '}'
+
+class Contador:
+    """Contador monótono."""
+    def __init__(self):
+        self.valor = 0
+        self._lock = threading.Lock()
+
+    def incrementar(self, cantidad=1):
+        with self._lock:
+            self.valor += cantidad
+
+class Histograma:
+    """Histograma de buckets fijos: observar es O(log buckets) y no guarda muestras."""
+    def __init__(self, buckets=BUCKETS_LATENCIA):
+        self.buckets = tuple(buckets)
+        self.conteos = [0] * (len(self.buckets) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def observar(self, valor):
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            self.conteos[indice] += 1
+            self.suma += valor
+            self.total += 1
+
+    def percentil(self, p):
+        """Percentil aproximado (límite superior del bucket que lo contiene)."""
+        with self._lock:
+            if not self.total:
+                return 0.0
+            objetivo = p * self.total
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float('inf'),), self.conteos):
+                acumulado += conteo
+                if acumulado >= objetivo:
+                    return limite
+        return float('inf')
+
+class RegistroMetricas:
+    """Registro de métricas del proceso, exportable en formato de texto de Prometheus."""
+    def __init__(self):
+        self._metricas = {}  # nombre -> (tipo, ayuda, {etiquetas: métrica})
+        self._lock = threading.Lock()
+
+    def _obtener(self, tipo, nombre, ayuda, etiquetas, fabrica):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            familia = self._metricas.setdefault(nombre, (tipo, ayuda, {}))[2]
+            metrica = familia.get(clave)
+            if metrica is None:
+                metrica = familia[clave] = fabrica()
+        return metrica
+
+    def contador(self, nombre, ayuda='', **etiquetas):
+        return self._obtener('counter', nombre, ayuda, etiquetas, Contador)
+
+    def histograma(self, nombre, ayuda='', **etiquetas):
+        return self._obtener('histogram', nombre, ayuda, etiquetas, Histograma)
+
+    def _familias(self):
+        with self._lock:
+            return [(nombre, tipo, ayuda, list(familia.items()))
+                    for nombre, (tipo, ayuda, familia) in sorted(self._metricas.items())]
+
+    def exportar(self):
+        """Todas las métricas en formato de exposición de texto de Prometheus."""
+        lineas = []
+        for nombre, tipo, ayuda, series in self._familias():
+            if ayuda:
+                lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} {tipo}')
+            for etiquetas, metrica in series:
+                if tipo == 'counter':
+                    lineas.append(f'{nombre}{_formatear_etiquetas(etiquetas)} {metrica.valor}')
+                    continue
+                acumulado = 0
+                for limite, conteo in zip(metrica.buckets, metrica.conteos):
+                    acumulado += conteo
+                    lineas.append(f'{nombre}_bucket{_formatear_etiquetas(etiquetas, ("le", limite))} {acumulado}')
+                lineas.append(f'{nombre}_bucket{_formatear_etiquetas(etiquetas, ("le", "+Inf"))} {metrica.total}')
+                lineas.append(f'{nombre}_sum{_formatear_etiquetas(etiquetas)} {metrica.suma}')
+                lineas.append(f'{nombre}_count{_formatear_etiquetas(etiquetas)} {metrica.total}')
+        return '\n'.join(lineas) + '\n'
+
+    def resumen(self):
+        """Líneas legibles con conteos, medias y p95 para el log."""
+        lineas = []
+        for nombre, tipo, ayuda, series in self._familias():
+            for etiquetas, metrica in series:
+                serie = f'{nombre}{_formatear_etiquetas(etiquetas)}'
+                if tipo == 'counter':
+                    lineas.append(f'{serie} = {metrica.valor}')
+                elif metrica.total:
+                    media = metrica.suma / metrica.total
+                    lineas.append(f'{serie} n={metrica.total} media={media:.3f}s p95<={metrica.percentil(0.95)}s')
+        return lineas
+
+# Registro global del proceso
+metricas = RegistroMetricas()
+
+def observar_etapa(etapa, segundos):
+    """Registra la duración de una etapa del pipeline de adopción."""
+    metricas.histograma(
+        'petconnect_etapa_segundos',
+        'Duración de cada etapa del pipeline de adopción',
+        etapa=etapa
+    ).observar(max(segundos, 0.0))
+
+def contar(evento, cola, cantidad=1):
+    """Cuenta publicaciones, consumos, acks y errores por cola."""
+    metricas.contador(
+        f'petconnect_{evento}_total',
+        f'Mensajes ({evento}) por cola',
+        cola=cola
+    ).incrementar(cantidad)
+
+class Cronometro:
+    """Context manager que mide un bloque y lo registra como etapa."""
+    def __init__(self, etapa):
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_excepcion, excepcion, traza):
+        observar_etapa(self.etapa, time.perf_counter() - self.inicio)
+        return False
+
+def iniciar_volcado_periodico(nombre, intervalo=METRICAS_INTERVALO):
+    """Escribe el resumen de métricas en el log cada `intervalo` segundos (hilo demonio)."""
+    if intervalo <= 0:
+        return None
+
+    def volcar():
+        previos = {}
+        while True:
+            time.sleep(intervalo)
+            logger.info(f"[Métricas {nombre}]")
+            for linea in metricas.resumen():
+                logger.info(f"   {linea}")
+            # Tasas por segundo de los contadores desde el volcado anterior
+            for familia, tipo, ayuda, series in metricas._familias():
+                if tipo != 'counter':
+                    continue
+                for etiquetas, contador in series:
+                    clave = (familia, etiquetas)
+                    tasa = (contador.valor - previos.get(clave, 0)) / intervalo
+                    previos[clave] = contador.valor
+                    logger.info(f"   {familia}{_formatear_etiquetas(etiquetas)} {tasa:.2f}/s")
+
+    hilo = threading.Thread(target=volcar, name=f'metricas-{nombre}', daemon=True)
+    hilo.start()
+    return hilo
@@ -0,0 +1,66 @@
+"""Nodo único: app web, procesador y consumidor (y opcionalmente el productor de
+prueba) en un solo proceso.
+
+Por defecto usa el broker en memoria, así que no necesita RabbitMQ:
+
+  python nodo.py                  # app en :5000 + procesador + consumidor
+  python nodo.py --simular        # además lanza simular_solicitudes()
+  PETCONNECT_BROKER=rabbitmq python nodo.py   # mismos componentes contra RabbitMQ
+"""
+import argparse
+import os
+import threading
+
+# Antes de importar los componentes: el transporte y el modo se leen al importar
+os.environ.setdefault('PETCONNECT_BROKER', 'memoria')
+os.environ.setdefault('PETCONNECT_MODO_ASINCRONO', '1')
+
+from conexion import pool
+from metricas import iniciar_volcado_periodico
+from arranque import reportar_arranque
+from perfilador import instalar_senales
+
+def iniciar_componente(nombre, fabrica):
+    """Crea el componente, registra sus consumidores y consume en un hilo propio."""
+    listo = threading.Event()
+    componentes = []
+
+    def correr():
+        componente = fabrica()
+        componente.suscribir()
+        componentes.append(componente)
+        listo.set()
+        componente.canal.start_consuming()
+
+    threading.Thread(target=correr, name=nombre, daemon=True).start()
+    listo.wait()
+    print(f"[Nodo] {nombre} en marcha")
+    return componentes[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--puerto', type=int, default=5000)
+    parser.add_argument('--simular', action='store_true', help='publicar solicitudes de prueba con el productor')
+    args = parser.parse_args()
+
+    from procesador import ProcesadorAdopciones
+    from consumidor import ConsumidorResultados
+    from productor import simular_solicitudes
+    from app import app
+
+    # Cada componente consume por su propia conexión: el pool queda para la app
+    print(f"[Nodo] Broker: {pool.transporte.nombre}")
+
+    iniciar_componente('procesador', ProcesadorAdopciones)
+    iniciar_componente('consumidor', ConsumidorResultados)
+    iniciar_volcado_periodico('nodo')
+    instalar_senales('nodo')
+
+    if args.simular:
+        threading.Thread(target=simular_solicitudes, name='productor', daemon=True).start()
+
+    reportar_arranque('nodo')
+    app.run(port=args.puerto, threaded=True, use_reloader=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+MAX_NOTIFICACIONES = int(os.environ.get('PETCONNECT_MAX_NOTIFICACIONES', '15'))
+
+_ultimo_id = 0
+_lock_ids = threading.Lock()
+
+def nuevo_id_global():
+    """Id de notificación creciente en el tiempo y distinto entre workers.
+
+    Milisegundos desde epoch * 1000 + pid % 1000 (cabe en un entero seguro de
+    JavaScript); dentro de un proceso nunca se repite ni retrocede, y tras un
+    reinicio sigue siendo mayor que los ids que ya vieron los navegadores.
+    """
+    global _ultimo_id
+    with _lock_ids:
+        _ultimo_id = max(_ultimo_id + 1000, time.time_ns() // 1_000_000 * 1000 + os.getpid() % 1000)
+        return _ultimo_id
+
+class Notificacion:
+    """Registro inmutable de una notificación."""
+    __slots__ = ('id', 'titulo', 'mensaje', 'tipo', 'timestamp', 'fecha')
+
+    def __init__(self, id, titulo, mensaje, tipo, momento):
+        self.id = id
+        self.titulo = titulo
+        self.mensaje = mensaje
+        self.tipo = tipo
+        self.timestamp = momento.strftime("%H:%M:%S")
+        self.fecha = momento.strftime("%Y-%m-%d %H:%M:%S")
+
+    def a_dict(self):
+        return {
+            'id': self.id,
+            'titulo': self.titulo,
+            'mensaje': self.mensaje,
+            'tipo': self.tipo,
+            'timestamp': self.timestamp,
+            'fecha': self.fecha
+        }
+
+class BufferNotificaciones:
+    """Buffer circular acotado de notificaciones en orden de llegada.
+
+    Agregar es O(1) y `desde(id)` solo recorre las notificaciones nuevas. El id
+    se asigna al agregar (nuevo_id_global), así que crece con el orden de
+    llegada y no vuelve a empezar al reiniciar el proceso. Con varios workers
+    (ver difusion.py) cada uno numera lo que recibe del exchange: un id del
+    emisor podría llegar después de otro mayor y `desde` lo saltaría.
+    """
+    def __init__(self, capacidad=MAX_NOTIFICACIONES):
+        self.capacidad = capacidad
+        self._items = deque(maxlen=capacidad)
+        self._lock = threading.Lock()
+        self.limpiezas = 0
+
+    def agregar(self, titulo, mensaje, tipo, momento=None):
+        momento = momento or datetime.now()
+        with self._lock:
+            # El id se toma bajo el lock: el orden de ids es el orden de la deque
+            notificacion = Notificacion(nuevo_id_global(), titulo, mensaje, tipo, momento)
+            self._items.append(notificacion)
+        return notificacion
+
+    def todas(self):
+        """Todas las notificaciones, de la más nueva a la más antigua."""
+        with self._lock:
+            return [n.a_dict() for n in reversed(self._items)]
+
+    def desde(self, id_notificacion):
+        """Notificaciones con id mayor a `id_notificacion`, de la más antigua a la más nueva."""
+        with self._lock:
+            recientes = list(itertools.takewhile(lambda n: n.id > id_notificacion, reversed(self._items)))
+        recientes.reverse()
+        return [n.a_dict() for n in recientes]
+
+    def limpiar(self):
+        with self._lock:
+            self._items.clear()
+            self.limpiezas += 1
+
+    def __len__(self):
+        return len(self._items)
+
+class DifusorNotificaciones:
+    """Difusor en memoria: un solo punto de publicación al que esperan todos los clientes.
+
+    Los clientes (SSE o long-poll) no consultan periódicamente: se bloquean en la
+    misma condición y solo se despiertan cuando hay algo nuevo que enviar.
+    """
+    def __init__(self):
+        self._condicion = threading.Condition()
+        self._version = 0
+
+    def publicar(self):
+        """Avisa a todos los suscriptores de que hay novedades."""
+        with self._condicion:
+            self._version += 1
+            self._condicion.notify_all()
+
+    def version(self):
+        with self._condicion:
+            return self._version
+
+    def esperar(self, version, timeout):
+        """Bloquea hasta que la versión cambie o pase el timeout. Devuelve la versión actual."""
+        with self._condicion:
+            self._condicion.wait_for(lambda: self._version != version, timeout)
+            return self._version
+
+def formatear_evento_sse(datos, evento=None, id_evento=None):
+    """Serializa un evento en formato text/event-stream."""
+    lineas = []
+    if id_evento is not None:
+        lineas.append(f"id: {id_evento}")
+    if evento:
+        lineas.append(f"event: {evento}")
+    lineas.append(f"data: {json.dumps(datos)}")
+    return "\n".join(lineas) + "\n\n"
+
+def flujo_sse(manager, desde=0, latido_segundos=15):
+    """Generador de eventos SSE con las notificaciones posteriores a `desde`."""
+    ultimo_id = desde
+    limpiezas = manager.notifications.limpiezas
+    version = manager.difusor.version()
+
+    # Indica al navegador cada cuánto reintentar si se corta la conexión
+    yield "retry: 3000\n\n"
+
+    while True:
+        if manager.notifications.limpiezas != limpiezas:
+            limpiezas = manager.notifications.limpiezas
+            yield formatear_evento_sse({}, evento='limpiar')
+
+        for notificacion in manager.get_notifications_since(ultimo_id):
+            ultimo_id = notificacion['id']
+            yield formatear_evento_sse(notificacion, id_evento=ultimo_id)
+
+        nueva_version = manager.difusor.esperar(version, latido_segundos)
+        if nueva_version == version:
+            # Comentario de latido para mantener viva la conexión a través de proxies
+            yield f": latido {int(time.time())}\n\n"
+        version = nueva_version
@@ -0,0 +1,128 @@
+"""Perfilador por muestreo que se activa y desactiva sin reiniciar el proceso.
+
+Cada PETCONNECT_PERFIL_INTERVALO_MS toma la pila de todos los hilos
+(sys._current_frames) y cuenta cuántas veces aparece cada una. Es tiempo de
+reloj, no de CPU: un hilo esperando en el socket de pika o en un lock también
+suma, que es justo lo que se quiere ver cuando el procesador se frena.
+
+La salida es el formato de pilas colapsadas ("hilo;archivo:función;... N"),
+que aceptan flamegraph.pl, speedscope e inferno:
+
+  kill -USR1 <pid>            # empieza a muestrear; otra vez para escribir el .folded
+  kill -USR2 <pid>            # activa/desactiva las trazas (trazas.py)
+  curl -H "X-PetConnect-Token: $PETCONNECT_ADMIN_TOKEN" 'localhost:5000/perfil?segundos=10' > web.folded
+  flamegraph.pl web.folded > web.svg
+"""
+import logging
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from trazas import activar_trazas, estado_trazas
+
+logger = logging.getLogger(__name__)
+
+PERFIL_INTERVALO_MS = float(os.environ.get('PETCONNECT_PERFIL_INTERVALO_MS', '5'))
+PERFIL_DIRECTORIO = os.environ.get('PETCONNECT_PERFIL_DIR', tempfile.gettempdir())
+
+class PerfiladorMuestreo:
+    def __init__(self, intervalo_ms=PERFIL_INTERVALO_MS, directorio=PERFIL_DIRECTORIO):
+        self.intervalo = intervalo_ms / 1000
+        self.directorio = directorio
+        self.muestras = Counter()
+        self.total = 0
+        self._hilo = None
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def activo(self):
+        return self._hilo is not None
+
+    def iniciar(self, segundos=None):
+        """Empieza a muestrear (descartando lo anterior); con `segundos` se detiene solo."""
+        with self._lock:
+            if self._hilo is not None:
+                return False
+            self.muestras = Counter()
+            self.total = 0
+            self._detener.clear()
+            limite = time.monotonic() + segundos if segundos else None
+            self._hilo = threading.Thread(target=self._muestrear, args=(limite,), name='perfilador', daemon=True)
+            self._hilo.start()
+        logger.info(f"[Perfilador] Muestreando cada {self.intervalo * 1000:.0f} ms")
+        return True
+
+    def _muestrear(self, limite):
+        propio = threading.get_ident()
+        while not self._detener.wait(self.intervalo):
+            nombres = {hilo.ident: hilo.name for hilo in threading.enumerate()}
+            for ident, marco in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                pila = []
+                while marco is not None:
+                    codigo = marco.f_code
+                    pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                    marco = marco.f_back
+                pila.append(nombres.get(ident, str(ident)))
+                self.muestras[';'.join(reversed(pila))] += 1
+            self.total += 1
+            if limite is not None and time.monotonic() >= limite:
+                break
+
+    def esperar(self):
+        """Bloquea hasta que termine un muestreo iniciado con `segundos`."""
+        hilo = self._hilo
+        if hilo is not None:
+            hilo.join()
+
+    def detener(self):
+        """Detiene el muestreo y devuelve las pilas colapsadas."""
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+            if hilo is None:
+                return self.colapsado()
+            self._detener.set()
+        hilo.join()
+        logger.info(f"[Perfilador] Detenido tras {self.total} muestras")
+        return self.colapsado()
+
+    def colapsado(self):
+        return ''.join(f"{pila} {veces}\n" for pila, veces in self.muestras.most_common())
+
+    def guardar(self, componente):
+        """Detiene el muestreo y escribe el .folded en PETCONNECT_PERFIL_DIR. Devuelve la ruta."""
+        contenido = self.detener()
+        ruta = os.path.join(self.directorio, f"perfil-{componente}-{os.getpid()}-{int(time.time())}.folded")
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write(contenido)
+        logger.info(f"[Perfilador] Pilas colapsadas en {ruta}")
+        return ruta
+
+    def alternar(self, componente):
+        """Inicia el muestreo, o lo detiene y lo guarda si ya estaba en marcha."""
+        if self.activo:
+            return self.guardar(componente)
+        self.iniciar()
+        return None
+
+# Perfilador del proceso
+perfilador = PerfiladorMuestreo()
+
+def instalar_senales(componente):
+    """SIGUSR1 alterna el perfilador y SIGUSR2 las trazas (solo desde el hilo principal).
+
+    No se usa en la app web: gunicorn ya reserva esas señales; ahí están /perfil y /trazas.
+    """
+    if not hasattr(signal, 'SIGUSR1') or threading.current_thread() is not threading.main_thread():
+        return False
+    # El trabajo se hace en un hilo: el handler corre en el hilo principal entre bytecodes
+    signal.signal(signal.SIGUSR1, lambda signum, marco: threading.Thread(
+        target=perfilador.alternar, args=(componente,), daemon=True).start())
+    signal.signal(signal.SIGUSR2, lambda signum, marco: activar_trazas(not estado_trazas()['activo']))
+    return True
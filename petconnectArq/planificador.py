@@ -0,0 +1,149 @@
+import os
+import time
+from collections import OrderedDict, deque
+
+# Límite por usuario (solicitudes/s, 0 = sin límite) y ráfaga permitida
+PLANIFICADOR_TASA_USUARIO = float(os.environ.get('PROCESADOR_TASA_USUARIO', '0'))
+PLANIFICADOR_RAFAGA_USUARIO = int(os.environ.get('PROCESADOR_RAFAGA_USUARIO', '5'))
+# Máximo de solicitudes de una misma mascota que se deciden juntas
+PLANIFICADOR_MAX_GRUPO = int(os.environ.get('PROCESADOR_MAX_GRUPO', '16'))
+
+class Pendiente:
+    """Solicitud recibida (aún sin ack) esperando turno en el planificador."""
+    __slots__ = ('method', 'properties', 'body', 'solicitud', 'usuario', 'mascota_id', 'prioridad')
+
+    def __init__(self, method, properties, body, solicitud):
+        self.method = method
+        self.properties = properties
+        self.body = body
+        self.solicitud = solicitud
+        self.usuario = solicitud.get('usuario_id', solicitud.get('usuario'))
+        self.mascota_id = solicitud['mascota_id']
+        self.prioridad = properties.priority or 0
+
+class CuboTokens:
+    """Token bucket: `tasa` fichas por segundo, hasta `rafaga` acumuladas."""
+    def __init__(self, tasa, rafaga):
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.fichas = float(rafaga)
+        self.ultimo = time.monotonic()
+
+    def _recargar(self, ahora):
+        # `ahora` puede ser anterior a la creación del cubo (se toma una vez por ronda)
+        if ahora > self.ultimo:
+            self.fichas = min(self.rafaga, self.fichas + (ahora - self.ultimo) * self.tasa)
+            self.ultimo = ahora
+
+    def disponible(self, ahora):
+        self._recargar(ahora)
+        return self.fichas >= 1
+
+    def consumir(self):
+        self.fichas -= 1
+
+    def espera(self, ahora):
+        """Segundos hasta la próxima ficha."""
+        self._recargar(ahora)
+        return max(0.0, (1 - self.fichas) / self.tasa)
+
+class PlanificadorSolicitudes:
+    """Orden de atención de las solicitudes que el procesador tiene en su ventana.
+
+    - Prioridad: entre los usuarios con turno se atiende primero la solicitud
+      de mayor prioridad AMQP (web interactiva antes que cargas por lote).
+    - Equidad: cada usuario tiene su propia fila y los empates se resuelven en
+      round-robin, así que la ráfaga de un usuario no deja esperando al resto.
+      Con `tasa_usuario` además se limita cada usuario con un token bucket.
+    - Agrupación: al elegir una solicitud se llevan también las demás
+      pendientes de la misma mascota (hasta `max_grupo`) para decidirlas juntas.
+
+    No es thread-safe: se usa solo desde el hilo de la conexión.
+    """
+    def __init__(self, tasa_usuario=PLANIFICADOR_TASA_USUARIO,
+                 rafaga_usuario=PLANIFICADOR_RAFAGA_USUARIO, max_grupo=PLANIFICADOR_MAX_GRUPO):
+        self.tasa_usuario = tasa_usuario
+        self.rafaga_usuario = rafaga_usuario
+        self.max_grupo = max(1, max_grupo)
+        self._filas = OrderedDict()  # usuario -> deque[Pendiente], en orden de turno
+        self._cubos = {}
+        self._total = 0
+
+    def __len__(self):
+        return self._total
+
+    def agregar(self, pendiente):
+        fila = self._filas.get(pendiente.usuario)
+        if fila is None:
+            fila = self._filas[pendiente.usuario] = deque()
+        fila.append(pendiente)
+        self._total += 1
+
+    def _cubo(self, usuario):
+        if not self.tasa_usuario:
+            return None
+        cubo = self._cubos.get(usuario)
+        if cubo is None:
+            cubo = self._cubos[usuario] = CuboTokens(self.tasa_usuario, self.rafaga_usuario)
+        return cubo
+
+    def _tiene_turno(self, usuario, ahora):
+        cubo = self._cubo(usuario)
+        return cubo is None or cubo.disponible(ahora)
+
+    def _tomar(self, usuario, pendiente):
+        fila = self._filas[usuario]
+        fila.remove(pendiente)
+        if not fila:
+            del self._filas[usuario]
+        self._total -= 1
+        cubo = self._cubo(usuario)
+        if cubo is not None:
+            cubo.consumir()
+
+    def siguiente_grupo(self):
+        """Saca el próximo grupo (solicitudes de una misma mascota), o [] si nadie tiene turno."""
+        ahora = time.monotonic()
+        elegido = None
+        for usuario, fila in self._filas.items():
+            if not self._tiene_turno(usuario, ahora):
+                continue
+            # max() se queda con el primero en empate: el usuario con el turno más antiguo
+            candidato = max(fila, key=lambda p: p.prioridad)
+            if elegido is None or candidato.prioridad > elegido.prioridad:
+                elegido = candidato
+        if elegido is None:
+            return []
+
+        grupo = [elegido]
+        self._tomar(elegido.usuario, elegido)
+        for usuario in list(self._filas):
+            for pendiente in list(self._filas.get(usuario, ())):
+                if len(grupo) >= self.max_grupo:
+                    break
+                if pendiente.mascota_id == elegido.mascota_id and self._tiene_turno(usuario, ahora):
+                    grupo.append(pendiente)
+                    self._tomar(usuario, pendiente)
+
+        # El usuario atendido pasa al final del turno
+        if elegido.usuario in self._filas:
+            self._filas.move_to_end(elegido.usuario)
+        return grupo
+
+    def espera(self):
+        """Segundos hasta que algún usuario limitado recupere turno (None si no hay pendientes)."""
+        if not self._filas:
+            return None
+        ahora = time.monotonic()
+        esperas = []
+        for usuario in self._filas:
+            cubo = self._cubo(usuario)
+            esperas.append(0.0 if cubo is None else cubo.espera(ahora))
+        return min(esperas)
+
+    def vaciar(self):
+        """Saca todas las pendientes (p. ej. para devolverlas a la cola al detenerse)."""
+        pendientes = [p for fila in self._filas.values() for p in fila]
+        self._filas.clear()
+        self._total = 0
+        return pendientes
@@ -1,64 +1,301 @@
 from conexion import conectar_rabbitmq, declarar_colas
-import json
+from reglas import MotorReglas, evaluar_solicitud_web
+from catalogo import CatalogoMascotas
+from codec import empaquetar, desempaquetar
+from dedup import RegistroVeredictos
+from reintentos import PoliticaReintentos
+from planificador import PlanificadorSolicitudes, Pendiente
+from metricas import Cronometro, contar, observar_etapa, iniciar_volcado_periodico
+from arranque import etapa_arranque, reportar_arranque
+from trazas import tramo, trazado, encabezados_traza, en_contexto
+from perfilador import instalar_senales
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import os
+import signal
+import threading
 import time
 import random
-import pika
+
+PROCESADOR_TRABAJADORES = int(os.environ.get('PROCESADOR_TRABAJADORES', '1'))
+PROCESADOR_PREFETCH = int(os.environ.get('PROCESADOR_PREFETCH', '0'))  # 0 = igual a trabajadores
+# Rango (segundos) del tiempo de procesamiento simulado, p. ej. "1,3" o "0" para benchmarks
+PROCESADOR_DEMORA = tuple(float(x) for x in os.environ.get('PROCESADOR_DEMORA', '1,3').split(','))
+# Planificación con prioridad, equidad por usuario y agrupación por mascota
+PROCESADOR_PLANIFICAR = os.environ.get('PROCESADOR_PLANIFICAR', '0') == '1'
+# En modo planificado el prefetch por defecto es trabajadores * ventana
+PROCESADOR_VENTANA = int(os.environ.get('PROCESADOR_VENTANA', '8'))
+
 class ProcesadorAdopciones:
-    def __init__(self):
-        self.canal = conectar_rabbitmq()
-        declarar_colas(self.canal)
-        self.mascotas_info = {
-            'Budy_001': {'nombre': 'Budy', 'tipo': 'perro', 'dificultad': 'baja'},
-            'Luna_002': {'nombre': 'Luna', 'tipo': 'gato', 'dificultad': 'baja'},
-            'Max_003': {'nombre': 'Max', 'tipo': 'perro', 'dificultad': 'media'},
-            'Molly_004': {'nombre': 'Molly', 'tipo': 'perro', 'dificultad': 'alta'},
-            'Simba_005': {'nombre': 'Simba', 'tipo': 'gato', 'dificultad': 'media'}
-        }
+    def __init__(self, trabajadores=PROCESADOR_TRABAJADORES, prefetch=PROCESADOR_PREFETCH,
+                 demora=PROCESADOR_DEMORA, canal=None, planificar=PROCESADOR_PLANIFICAR):
+        # La conexión y la declaración de colas se hacen en el primer uso de self.canal
+        self._canal = canal
+        self._canal_listo = False
+        # Fallos: reintento diferido con backoff exponencial y luego DLQ
+        self.reintentos = PoliticaReintentos('solicitudes_adopcion')
+        self.trabajadores = max(1, trabajadores)
+        self.planificador = PlanificadorSolicitudes() if planificar else None
+        self._reloj_planificador = False
+        self.prefetch = prefetch or self.trabajadores * (PROCESADOR_VENTANA if planificar else 1)
+        self.ejecutor = None
+        self._en_vuelo = 0
+        self._lock_en_vuelo = threading.Lock()
+        self._consumer_tag = None
+        self.demora = demora
+        # Catálogo indexado en SQLite con cache LRU/TTL (misma interfaz .get que un dict)
+        with etapa_arranque('catalogo'):
+            self.mascotas_info = CatalogoMascotas()
+        # Criterios compilados una sola vez a tablas de búsqueda
+        with etapa_arranque('reglas'):
+            self.motor = MotorReglas(self.mascotas_info)
+        # Veredictos ya publicados: las reentregas se confirman sin recalcular
+        with etapa_arranque('dedup'):
+            self.veredictos = RegistroVeredictos()
+    
+    @property
+    def canal(self):
+        """Canal del procesador: se conecta y declara las colas la primera vez que se usa."""
+        if self._canal_listo and not self._canal.is_open:
+            # La conexión se cayó: se abre otra y se vuelven a declarar las colas
+            self._canal, self._canal_listo = None, False
+        if not self._canal_listo:
+            if self._canal is None:
+                with etapa_arranque('conexion'):
+                    self._canal = conectar_rabbitmq()
+            with etapa_arranque('declaracion'):
+                declarar_colas(self._canal)
+                self.reintentos.declarar(self._canal)
+            self._canal_listo = True
+        return self._canal
     
     def procesar_solicitud(self, ch, method, properties, body):
         """Procesa una solicitud de adopción recibida."""
         try:
-            solicitud = json.loads(body.decode())
-            mascota_id = solicitud['mascota_id']
-            usuario_id = solicitud['usuario_id']
-            
-            print(f"[Procesador] Procesando solicitud: {mascota_id} para {usuario_id}")
+            publicar = self.evaluar_solicitud(body, properties)
+            publicar()
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            contar('acks', 'solicitudes_adopcion')
             
-            # Simular tiempo de procesamiento realista
-            tiempo_procesamiento = random.uniform(1, 3)
-            time.sleep(tiempo_procesamiento)
+        except Exception as e:
+            contar('errores', 'solicitudes_adopcion')
+            print(f"[Procesador] Error procesando solicitud: {e}")
+            self.reintentos.fallo(ch, method, properties, body, e)
+    
+    def evaluar_solicitud(self, body, properties):
+        """Hace el trabajo pesado de una solicitud y devuelve la publicación pendiente.
+        
+        Es seguro llamarlo desde un hilo trabajador: no toca el canal. El callable
+        devuelto sí publica y debe ejecutarse en el hilo de la conexión.
+        """
+        with tramo('procesar_solicitud', padre=properties):
+            solicitud, previo = self.decodificar_solicitud(body, properties)
+            if previo is not None:
+                return self.publicacion_duplicado(solicitud, previo, properties)
+            if self.decidida_en_la_web(solicitud, properties):
+                return lambda: None
             
-            # Validar la adopción con criterios más realistas
-            resultado = self.validar_adopcion_completa(solicitud)
+            observar_etapa('espera_cola', time.time() - solicitud['timestamp'])
+            print(f"[Procesador] Procesando solicitud: {solicitud['mascota_id']} para "
+                  f"{solicitud.get('usuario_id', solicitud.get('usuario'))}")
             
+            with Cronometro('procesamiento'):
+                self._simular_demora()
+                return self.resolver_solicitud(solicitud, properties)
+    
+    def decodificar_solicitud(self, body, properties):
+        """Decodifica la solicitud. Devuelve (solicitud, veredicto ya publicado o None)."""
+        with tramo('desempaquetar', bytes=len(body)):
+            solicitud = desempaquetar(body, properties)
+        if 'mascota_id' not in solicitud:
+            raise KeyError('mascota_id')
+        
+        contar('consumidos', 'solicitudes_adopcion')
+        solicitud_id = solicitud.get('solicitud_id')
+        previo = self.veredictos.obtener(solicitud_id)
+        if previo is not None:
+            contar('duplicados', 'solicitudes_adopcion')
+            print(f"[Procesador] Solicitud {solicitud_id} ya procesada, no se recalcula")
+        return solicitud, previo
+    
+    def decidida_en_la_web(self, solicitud, properties):
+        """True si es el aviso de una solicitud que el portal ya decidió (modo síncrono).
+        
+        process_adoption la publica sin reply_to y resuelve el veredicto él mismo:
+        decidirla otra vez publicaría un segundo veredicto, quizá distinto, con
+        la misma solicitud_id. Solo queda confirmarla.
+        """
+        if solicitud.get('accion') == 'inicio_proceso' and not properties.reply_to:
+            contar('omitidos', 'solicitudes_adopcion')
+            return True
+        return False
+    
+    def publicacion_duplicado(self, solicitud, veredicto, properties):
+        """Publicación pendiente de la reentrega de una solicitud ya resuelta.
+        
+        Si la envió el portal web se le responde de nuevo con el veredicto
+        guardado (puede que la primera respuesta no haya llegado); si no, solo
+        queda confirmarla.
+        """
+        if properties.reply_to:
+            return en_contexto(functools.partial(self.responder_solicitud_web, solicitud, properties, veredicto))
+        return lambda: None
+    
+    def _simular_demora(self):
+        # Simular tiempo de procesamiento realista
+        tiempo_procesamiento = random.uniform(self.demora[0], self.demora[-1])
+        if tiempo_procesamiento > 0:
+            time.sleep(tiempo_procesamiento)
+    
+    def resolver_solicitud(self, solicitud, properties):
+        """Decide una solicitud ya decodificada y devuelve su publicación pendiente.
+        
+        La publicación conserva el tramo actual aunque corra en el hilo de la conexión.
+        """
+        # Solicitudes del portal web: responder a la cola indicada en reply_to
+        if properties.reply_to:
+            return en_contexto(functools.partial(self.responder_solicitud_web, solicitud, properties))
+        
+        # Validar la adopción con criterios más realistas
+        resultado = self.validar_adopcion_completa(solicitud)
+        
+        def publicar():
             # Publicar resultado
             self.publicar_resultado(solicitud, resultado)
-            
-            print(f"[Procesador] Solicitud procesada: {mascota_id} - {'APROBADA' if resultado['aprobado'] else 'RECHAZADA'}")
-            
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            
+            print(f"[Procesador] Solicitud procesada: {solicitud['mascota_id']} - {'APROBADA' if resultado['aprobado'] else 'RECHAZADA'}")
+        
+        return en_contexto(publicar)
+    
+    def evaluar_grupo(self, grupo):
+        """Decide juntas varias solicitudes pendientes de la misma mascota.
+        
+        El costo fijo (demora simulada, búsqueda en el catálogo) se paga una sola
+        vez por grupo. Devuelve una publicación por solicitud, en el mismo orden.
+        """
+        for pendiente in grupo:
+            observar_etapa('espera_cola', time.time() - pendiente.solicitud['timestamp'])
+        print(f"[Procesador] Procesando {len(grupo)} solicitud(es) para {grupo[0].mascota_id}")
+        
+        with Cronometro('procesamiento'):
+            self._simular_demora()
+            publicaciones = []
+            for pendiente in grupo:
+                with tramo('procesar_solicitud', padre=pendiente.properties, grupo=len(grupo)):
+                    publicaciones.append(self.resolver_solicitud(pendiente.solicitud, pendiente.properties))
+            return publicaciones
+    
+    def despachar_solicitud(self, ch, method, properties, body):
+        """Callback del modo multi-trabajador: delega la solicitud al pool de hilos."""
+        with self._lock_en_vuelo:
+            self._en_vuelo += 1
+        self.ejecutor.submit(self._trabajar, ch, method, properties, body)
+    
+    def _trabajar(self, ch, method, properties, body):
+        publicar = error = None
+        try:
+            publicar = self.evaluar_solicitud(body, properties)
+        except Exception as e:
+            contar('errores', 'solicitudes_adopcion')
+            print(f"[Procesador] Error procesando solicitud: {e}")
+            error = e
+        
+        # pika no es thread-safe: publicar y hacer ack desde el hilo de la conexión
+        ch.connection.add_callback_threadsafe(
+            functools.partial(self._finalizar, ch, method, properties, body, publicar, error)
+        )
+    
+    def _finalizar(self, ch, method, properties, body, publicar, error):
+        try:
+            self._completar(ch, method, properties, body, publicar, error)
+        finally:
+            with self._lock_en_vuelo:
+                self._en_vuelo -= 1
+    
+    def _completar(self, ch, method, properties, body, publicar, error):
+        try:
+            if error is not None:
+                self.reintentos.fallo(ch, method, properties, body, error)
+            else:
+                publicar()
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+                contar('acks', 'solicitudes_adopcion')
         except Exception as e:
+            contar('errores', 'solicitudes_adopcion')
+            print(f"[Procesador] Error publicando resultado: {e}")
+            self.reintentos.fallo(ch, method, properties, body, e)
+    
+    def planificar_solicitud(self, ch, method, properties, body):
+        """Callback del modo planificado: deja la solicitud en el planificador y lanza los grupos con turno."""
+        try:
+            solicitud, previo = self.decodificar_solicitud(body, properties)
+            if previo is not None or self.decidida_en_la_web(solicitud, properties):
+                # Ya estamos en el hilo de la conexión: responder y confirmar aquí mismo
+                if previo is not None:
+                    self.publicacion_duplicado(solicitud, previo, properties)()
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+                contar('acks', 'solicitudes_adopcion')
+            else:
+                self.planificador.agregar(Pendiente(method, properties, body, solicitud))
+        except Exception as e:
+            contar('errores', 'solicitudes_adopcion')
             print(f"[Procesador] Error procesando solicitud: {e}")
+            self.reintentos.fallo(ch, method, properties, body, e)
+            return
+        self._lanzar_grupos(ch)
+    
+    def _lanzar_grupos(self, ch):
+        while self._en_vuelo < self.trabajadores:
+            grupo = self.planificador.siguiente_grupo()
+            if not grupo:
+                break
+            with self._lock_en_vuelo:
+                self._en_vuelo += 1
+            self.ejecutor.submit(self._trabajar_grupo, ch, grupo)
+        
+        # Usuarios limitados por tasa: volver a intentar cuando recuperen turno
+        espera = self.planificador.espera()
+        if espera is not None and self._en_vuelo < self.trabajadores and not self._reloj_planificador:
+            self._reloj_planificador = True
+            ch.connection.call_later(max(espera, 0.01), functools.partial(self._despertar_planificador, ch))
+    
+    def _despertar_planificador(self, ch):
+        self._reloj_planificador = False
+        self._lanzar_grupos(ch)
+    
+    def _trabajar_grupo(self, ch, grupo):
+        publicaciones = error = None
+        try:
+            publicaciones = self.evaluar_grupo(grupo)
+        except Exception as e:
+            contar('errores', 'solicitudes_adopcion')
+            print(f"[Procesador] Error procesando grupo de {grupo[0].mascota_id}: {e}")
+            error = e
+        
+        ch.connection.add_callback_threadsafe(
+            functools.partial(self._finalizar_grupo, ch, grupo, publicaciones, error)
+        )
     
+    def _finalizar_grupo(self, ch, grupo, publicaciones, error):
+        try:
+            for i, pendiente in enumerate(grupo):
+                self._completar(
+                    ch, pendiente.method, pendiente.properties, pendiente.body,
+                    publicaciones[i] if publicaciones else None, error
+                )
+        finally:
+            with self._lock_en_vuelo:
+                self._en_vuelo -= 1
+        self._lanzar_grupos(ch)
+    
+    @trazado()
     def validar_adopcion_completa(self, solicitud):
         """Valida la adopción con criterios detallados."""
         datos = solicitud.get('datos_adicionales', {})
         mascota_id = solicitud['mascota_id']
         info_mascota = self.mascotas_info.get(mascota_id, {})
         
-        # Criterios de validación
-        criterios = {
-            'experiencia_suficiente': self.validar_experiencia(datos, info_mascota),
-            'vivienda_adecuada': self.validar_vivienda(datos, info_mascota),
-            'compatibilidad_animales': self.validar_compatibilidad(datos, info_mascota),
-            'tiempo_suficiente': self.validar_tiempo(datos),
-            'estabilidad_economica': random.random() > 0.2  # 80% de aprobación
-        }
-        
-        # Calcular puntaje
-        puntaje_total = sum(1 for criterio in criterios.values() if criterio)
-        aprobado = puntaje_total >= 3  # Necesita al menos 3 de 5 criterios
+        # Criterios de validación (tablas precompiladas por el motor de reglas)
+        criterios, puntaje_total, aprobado = self.motor.evaluar(mascota_id, datos)
         
         # Generar mensaje personalizado
         mensaje = self.generar_mensaje_resultado(aprobado, criterios, info_mascota)
@@ -72,42 +309,7 @@ class ProcesadorAdopciones:
             'tiempo_procesamiento_segundos': round(time.time() - solicitud['timestamp'], 2)
         }
     
-    def validar_experiencia(self, datos, info_mascota):
-        """Valida experiencia previa con mascotas."""
-        tiene_experiencia = datos.get('experiencia_previa', False)
-        dificultad = info_mascota.get('dificultad', 'baja')
-        
-        if dificultad == 'alta':
-            return tiene_experiencia
-        elif dificultad == 'media':
-            return tiene_experiencia or random.random() > 0.3
-        else:
-            return True  # Baja dificultad, no necesita experiencia
-    
-    def validar_vivienda(self, datos, info_mascota):
-        """Valida que la vivienda sea adecuada."""
-        tipo_vivienda = datos.get('tipo_vivienda', 'desconocido')
-        tipo_mascota = info_mascota.get('tipo', 'perro')
-        
-        if tipo_mascota == 'perro':
-            return tipo_vivienda in ['casa', 'apartamento']
-        else:  # gato
-            return tipo_vivienda in ['casa', 'apartamento', 'duplex']
-    
-    def validar_compatibilidad(self, datos, info_mascota):
-        """Valida compatibilidad con otros animales."""
-        tiene_otros_animales = datos.get('otros_animales', False)
-        
-        if not tiene_otros_animales:
-            return True
-        
-        # Si tiene otros animales, validar compatibilidad
-        return random.random() > 0.4  # 60% de compatibilidad
-    
-    def validar_tiempo(self, datos):
-        """Valida que tenga tiempo suficiente."""
-        return random.random() > 0.3  # 70% de aprobación
-    
+    @trazado()
     def generar_mensaje_resultado(self, aprobado, criterios, info_mascota):
         """Genera mensaje personalizado según el resultado."""
         nombre_mascota = info_mascota.get('nombre', 'la mascota')
@@ -129,40 +331,139 @@ class ProcesadorAdopciones:
         
         return random.choice(mensajes)
     
+    @trazado()
     def publicar_resultado(self, solicitud, resultado):
         """Publica el resultado del procesamiento."""
+        # Se referencia la solicitud por id en lugar de copiarla entera
         mensaje_resultado = {
-            'solicitud_original': solicitud,
+            'tipo': 'resultado_adopcion',
+            'solicitud_id': solicitud.get('solicitud_id'),
+            'mascota_id': solicitud['mascota_id'],
+            'usuario_id': solicitud.get('usuario_id', solicitud.get('usuario')),
             'resultado': resultado,
             'procesado_por': 'sistema_adopciones_v2',
-            'timestamp': time.time()
+            'timestamp': time.time(),
+            'timestamp_solicitud': solicitud['timestamp']
         }
         
-        self.canal.basic_publish(
-            exchange='',
-            routing_key='resultados_adopcion',
-            body=json.dumps(mensaje_resultado),
-            properties=pika.BasicProperties(delivery_mode=2)
+        with Cronometro('publicacion_resultado'):
+            with tramo('empaquetar'):
+                body, propiedades = empaquetar(mensaje_resultado, delivery_mode=2, headers=encabezados_traza())
+            
+            with tramo('basic_publish', cola='resultados_adopcion'):
+                self.canal.basic_publish(
+                    exchange='',
+                    routing_key='resultados_adopcion',
+                    body=body,
+                    properties=propiedades
+                )
+        contar('publicados', 'resultados_adopcion')
+        self.veredictos.guardar(solicitud.get('solicitud_id'), resultado)
+    
+    @trazado()
+    def responder_solicitud_web(self, solicitud, properties, veredicto=None):
+        """Publica el veredicto en reply_to conservando el correlation_id (con `veredicto`, lo reenvía)."""
+        nuevo = veredicto is None
+        if nuevo:
+            veredicto = evaluar_solicitud_web(
+                solicitud['mascota_id'], solicitud['usuario'], solicitud['salario']
+            )
+        respuesta = dict(veredicto,
+            solicitud_id=solicitud.get('solicitud_id'),
+            usuario=solicitud['usuario'],
+            timestamp=time.time(),
+            tipo='respuesta_adopcion',
+            accion='resultado_final'
         )
+        with tramo('empaquetar'):
+            body, propiedades = empaquetar(
+                respuesta,
+                correlation_id=properties.correlation_id,
+                delivery_mode=2,
+                headers=encabezados_traza()
+            )
+        
+        with Cronometro('publicacion_resultado'), tramo('basic_publish', cola=properties.reply_to):
+            self.canal.basic_publish(
+                exchange='',
+                routing_key=properties.reply_to,
+                body=body,
+                properties=propiedades
+            )
+        contar('publicados', properties.reply_to)
+        if nuevo:
+            self.veredictos.guardar(solicitud.get('solicitud_id'), veredicto)
+        
+        print(f"[Procesador] Respuesta web enviada: {solicitud['mascota_id']} - {veredicto['resultado']}")
     
     def iniciar_procesamiento(self):
         """Inicia el consumo de solicitudes de adopción."""
         print("[Procesador v2] Iniciando procesador inteligente...")
         print("Sistema de validación con 5 criterios activado")
+        print(f"Trabajadores: {self.trabajadores} - Prefetch: {self.prefetch}"
+              f"{' - Planificación por prioridad/usuario/mascota' if self.planificador else ''}")
         
-        self.canal.basic_qos(prefetch_count=1)
-        self.canal.basic_consume(
-            queue='solicitudes_adopcion',
-            on_message_callback=self.procesar_solicitud
-        )
+        # SIGTERM se trata igual que Ctrl+C para drenar lo que está en vuelo.
+        # signal.signal solo se puede llamar desde el hilo principal
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self._interrumpir())
+        
+        self.suscribir()
+        reportar_arranque('procesador')
         
         try:
             self.canal.start_consuming()
         except KeyboardInterrupt:
             print("[Procesador] Deteniendo procesador...")
+            self.detener()
         except Exception as e:
             print(f"[Procesador] Error: {e}")
+    
+    def suscribir(self):
+        """Registra el consumidor de solicitudes_adopcion sin bloquear."""
+        if self.planificador is not None or self.trabajadores > 1:
+            self.ejecutor = ThreadPoolExecutor(
+                max_workers=self.trabajadores,
+                thread_name_prefix='procesador'
+            )
+            callback = self.planificar_solicitud if self.planificador is not None else self.despachar_solicitud
+        else:
+            callback = self.procesar_solicitud
+        
+        self.canal.basic_qos(prefetch_count=self.prefetch)
+        self._consumer_tag = self.canal.basic_consume(
+            queue='solicitudes_adopcion',
+            on_message_callback=callback
+        )
+    
+    def _interrumpir(self):
+        raise KeyboardInterrupt
+    
+    def detener(self, timeout=30):
+        """Apagado ordenado: deja de recibir y espera las solicitudes en vuelo."""
+        try:
+            if self._consumer_tag:
+                # Los mensajes aún no despachados vuelven a la cola (nack)
+                self.canal.basic_cancel(self._consumer_tag)
+                self._consumer_tag = None
+            
+            if self.planificador is not None:
+                # Las que esperaban turno vuelven a la cola sin contar como intento fallido
+                for pendiente in self.planificador.vaciar():
+                    self.canal.basic_nack(delivery_tag=pendiente.method.delivery_tag, requeue=True)
+            
+            limite = time.time() + timeout
+            while self._en_vuelo and time.time() < limite:
+                self.canal.connection.process_data_events(time_limit=0.1)
+            
+            if self._en_vuelo:
+                print(f"[Procesador] {self._en_vuelo} solicitudes sin terminar volverán a la cola")
+        finally:
+            if self.ejecutor is not None:
+                self.ejecutor.shutdown(wait=False)
 
 if __name__ == "__main__":
+    iniciar_volcado_periodico('procesador')
+    instalar_senales('procesador')
     procesador = ProcesadorAdopciones()
-    procesador.iniciar_procesamiento()
\ No newline at end of file
+    procesador.iniciar_procesamiento()
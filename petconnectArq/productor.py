@@ -1,53 +1,268 @@
-from conexion import conectar_rabbitmq, declarar_colas
-import json
+from conexion import pool, conectar_rabbitmq, declarar_colas, PRIORIDAD_NORMAL, PRIORIDAD_LOTE
+from codec import empaquetar
+from metricas import contar
+from admision import ControlAdmision
+from arranque import etapa_arranque
+import os
 import time
 import random
-import pika
+import uuid
+
+# Pausa máxima antes de publicar cuando solicitudes_adopcion llega al límite de admisión
+PRODUCTOR_PAUSA_MAX_MS = int(os.environ.get('PRODUCTOR_PAUSA_MAX_MS', '2000'))
+# Ocupación de la cola (fracción del límite) desde la que el productor empieza a frenar
+PRODUCTOR_FRENAR_DESDE = float(os.environ.get('PRODUCTOR_FRENAR_DESDE', '0.5'))
+
+class LotePublicacion:
+    """Acumula solicitudes/notificaciones y las publica en una sola ráfaga confirmada.
+    
+    Se usa como context manager: al salir sin excepción se publica el lote.
+    """
+    def __init__(self, productor):
+        self.productor = productor
+        self.mensajes = []
+    
+    def agregar_solicitud(self, mascota_id, usuario_id, datos_adicionales=None):
+        mensaje = self.productor.crear_solicitud(mascota_id, usuario_id, datos_adicionales)
+        # Las cargas por lote van con prioridad baja para no frenar a la web
+        self.mensajes.append(('solicitudes_adopcion',) + empaquetar(
+            mensaje, delivery_mode=2, message_id=mensaje['solicitud_id'], priority=PRIORIDAD_LOTE
+        ))
+    
+    def agregar_notificacion(self, usuario_id, mensaje, tipo='info'):
+        notificacion = self.productor.crear_notificacion(usuario_id, mensaje, tipo)
+        self.mensajes.append(('notificaciones',) + empaquetar(notificacion, delivery_mode=2))
+    
+    def publicar(self):
+        """Publica lo acumulado y vacía el buffer. Devuelve cuántos mensajes confirmó el broker."""
+        mensajes, self.mensajes = self.mensajes, []
+        if any(cola == 'solicitudes_adopcion' for cola, _, _ in mensajes):
+            self.productor.frenar()
+        return self.productor.publicar_confirmado(mensajes)
+    
+    def __len__(self):
+        return len(self.mensajes)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, tipo_excepcion, excepcion, traza):
+        if tipo_excepcion is None:
+            self.publicar()
+        return False
 
 class ProductorAdopciones:
-    def __init__(self):
-        self.canal = conectar_rabbitmq()
-        declarar_colas(self.canal)
+    def __init__(self, max_reintentos=3, timeout_confirmacion=30, canal=None, pausa_max_ms=PRODUCTOR_PAUSA_MAX_MS):
+        # La conexión y la declaración de colas se hacen en el primer uso de self.canal
+        self._canal = canal
+        self._canal_listo = False
+        self.max_reintentos = max_reintentos
+        self.timeout_confirmacion = timeout_confirmacion
+        self.pausa_max = pausa_max_ms / 1000
+        self.admision = ControlAdmision('solicitudes_adopcion')
+        self._canal_confirmaciones = None
+        self._ultimo_tag = 0
+        self._sin_confirmar = {}  # delivery_tag -> (cola, body, propiedades)
+        self._devueltos = set()   # tags devueltos por mandatory (sin cola destino)
+        self._rechazados = []
     
-    def publicar_solicitud_adopcion(self, mascota_id, usuario_id, datos_adicionales=None):
-        """Publica una solicitud de adopción en la cola."""
-        mensaje = {
+    @property
+    def canal(self):
+        """Canal del productor: se conecta y declara las colas la primera vez que se usa."""
+        if self._canal_listo and not self._canal.is_open:
+            # La conexión se cayó: se abre otra y se vuelven a declarar las colas
+            self._canal, self._canal_listo = None, False
+        if not self._canal_listo:
+            if self._canal is None:
+                with etapa_arranque('conexion'):
+                    self._canal = conectar_rabbitmq()
+            with etapa_arranque('declaracion'):
+                declarar_colas(self._canal)
+            self._canal_listo = True
+        return self._canal
+    
+    def crear_solicitud(self, mascota_id, usuario_id, datos_adicionales=None):
+        """Construye el mensaje de una solicitud de adopción."""
+        return {
             'tipo': 'solicitud_adopcion',
+            'solicitud_id': uuid.uuid4().hex,
             'mascota_id': mascota_id,
             'usuario_id': usuario_id,
             'datos_adicionales': datos_adicionales or {},
             'timestamp': time.time(),
             'estado': 'pendiente'
         }
+    
+    def crear_notificacion(self, usuario_id, mensaje, tipo='info'):
+        """Construye el mensaje de una notificación."""
+        return {
+            'tipo': 'notificacion',
+            'usuario_id': usuario_id,
+            'mensaje': mensaje,
+            'tipo_notificacion': tipo,
+            'timestamp': time.time()
+        }
+    
+    def pausa(self):
+        """Segundos a esperar antes de publicar según la ocupación de solicitudes_adopcion.
+
+        Cero hasta PRODUCTOR_FRENAR_DESDE del límite de admisión, y de ahí
+        crece en proporción hasta `pausa_max` al alcanzarlo.
+        """
+        if not self.admision.activo:
+            return 0.0
+        # La profundidad se consulta por el canal del productor, no por una conexión del pool
+        self.admision.canal = self.canal
+        ocupacion = self.admision.ocupacion()
+        if ocupacion <= PRODUCTOR_FRENAR_DESDE:
+            return 0.0
+        proporcion = (ocupacion - PRODUCTOR_FRENAR_DESDE) / (1 - PRODUCTOR_FRENAR_DESDE)
+        return self.pausa_max * min(1.0, proporcion)
+    
+    def frenar(self):
+        """Espera lo que indique pausa() para dar tiempo a los consumidores a drenar la cola."""
+        pausa = self.pausa()
+        if pausa:
+            contar('pausas_productor', 'solicitudes_adopcion')
+            time.sleep(pausa)
+        return pausa
+    
+    def publicar_solicitud_adopcion(self, mascota_id, usuario_id, datos_adicionales=None,
+                                    prioridad=PRIORIDAD_NORMAL):
+        """Publica una solicitud de adopción en la cola."""
+        self.frenar()
+        mensaje = self.crear_solicitud(mascota_id, usuario_id, datos_adicionales)
+        body, propiedades = empaquetar(
+            mensaje,
+            delivery_mode=2,  # Hacer el mensaje persistente
+            message_id=mensaje['solicitud_id'],  # El procesador deduplica reentregas por este id
+            priority=prioridad
+        )
         
         self.canal.basic_publish(
             exchange='',
             routing_key='solicitudes_adopcion',
-            body=json.dumps(mensaje),
-            properties=pika.BasicProperties(
-                delivery_mode=2,  # Hacer el mensaje persistente
-            )
+            body=body,
+            properties=propiedades
         )
+        contar('publicados', 'solicitudes_adopcion')
         
         print(f"🐾 [Productor] Solicitud de adopción publicada: Mascota {mascota_id}, Usuario {usuario_id}")
     
     def publicar_notificacion(self, usuario_id, mensaje, tipo='info'):
         """Publica una notificación para el usuario."""
-        notificacion = {
-            'tipo': 'notificacion',
-            'usuario_id': usuario_id,
-            'mensaje': mensaje,
-            'tipo_notificacion': tipo,
-            'timestamp': time.time()
-        }
+        notificacion = self.crear_notificacion(usuario_id, mensaje, tipo)
+        body, propiedades = empaquetar(notificacion)
         
         self.canal.basic_publish(
             exchange='',
             routing_key='notificaciones',
-            body=json.dumps(notificacion)
+            body=body,
+            properties=propiedades
         )
+        contar('publicados', 'notificaciones')
         
         print(f"[Productor] Notificación enviada: {mensaje}")
+    
+    def lote(self):
+        """Devuelve un LotePublicacion para usar con `with`."""
+        return LotePublicacion(self)
+    
+    def publicar_lote(self, solicitudes=(), notificaciones=()):
+        """Publica muchas solicitudes/notificaciones en una ráfaga con confirmaciones.
+        
+        `solicitudes` son tuplas (mascota_id, usuario_id, datos_adicionales) y
+        `notificaciones` tuplas (usuario_id, mensaje, tipo).
+        """
+        with self.lote() as lote:
+            for solicitud in solicitudes:
+                lote.agregar_solicitud(*solicitud)
+            for notificacion in notificaciones:
+                lote.agregar_notificacion(*notificacion)
+            total = len(lote)
+        
+        print(f"[Productor] Lote publicado y confirmado: {total} mensajes")
+        return total
+    
+    def _obtener_canal_confirmaciones(self):
+        # Conexión propia en modo confirm asíncrono: basic_publish no espera al
+        # broker y los acks/nacks llegan a _al_confirmar mientras se espera el lote
+        if self._canal_confirmaciones is None or not self._canal_confirmaciones.is_open:
+            self.canal  # declara las colas
+            self._canal_confirmaciones = pool.canal_confirmaciones(self._al_confirmar, self._al_devolver)
+            self._ultimo_tag = 0
+            self._sin_confirmar.clear()
+            self._devueltos.clear()
+        return self._canal_confirmaciones
+    
+    def _al_confirmar(self, frame):
+        metodo = frame.method
+        if metodo.multiple:
+            tags = [tag for tag in self._sin_confirmar if tag <= metodo.delivery_tag]
+        else:
+            tags = [metodo.delivery_tag]
+        
+        rechazado = metodo.NAME == 'Basic.Nack'
+        for tag in tags:
+            mensaje = self._sin_confirmar.pop(tag, None)
+            if mensaje is None:
+                continue
+            if rechazado or tag in self._devueltos:
+                self._devueltos.discard(tag)
+                self._rechazados.append(mensaje)
+                contar('nacks', mensaje[0])
+            else:
+                contar('publicados', mensaje[0])
+    
+    def _al_devolver(self, canal, metodo, propiedades, body):
+        # mandatory sin cola destino: el broker lo devuelve antes de su ack, que no dice
+        # el tag. Se marca el primer mensaje sin confirmar con la misma cola y cuerpo
+        for tag, (cola, cuerpo, _) in self._sin_confirmar.items():
+            if cola == metodo.routing_key and cuerpo == body and tag not in self._devueltos:
+                self._devueltos.add(tag)
+                return
+    
+    def publicar_confirmado(self, mensajes):
+        """Publica (cola, body, propiedades) en ráfaga y reintenta solo los nacks.
+        
+        Todo el lote se publica sin esperar; después una sola espera resuelve los
+        acks/nacks por delivery tag.
+        """
+        canal = self._obtener_canal_confirmaciones()
+        pendientes = list(mensajes)
+        
+        for intento in range(self.max_reintentos + 1):
+            if not pendientes:
+                break
+            if intento:
+                # Un nack suele ser la cola llena (x-overflow reject-publish): dejar que se drene
+                time.sleep(min(self.pausa_max, 0.1 * 2 ** (intento - 1)))
+                print(f"[Productor] Reintentando {len(pendientes)} mensajes rechazados (intento {intento})")
+            
+            self._rechazados = []
+            for cola, body, propiedades in pendientes:
+                canal.basic_publish(
+                    exchange='',
+                    routing_key=cola,
+                    body=body,
+                    properties=propiedades,
+                    mandatory=True
+                )
+                self._ultimo_tag += 1
+                self._sin_confirmar[self._ultimo_tag] = (cola, body, propiedades)
+            
+            if not canal.esperar(lambda: not self._sin_confirmar, self.timeout_confirmacion):
+                sin_respuesta = len(self._sin_confirmar)
+                self._sin_confirmar.clear()
+                self._devueltos.clear()
+                raise RuntimeError(f"{sin_respuesta} mensajes sin confirmar tras {self.timeout_confirmacion}s")
+            
+            pendientes = self._rechazados
+        
+        if pendientes:
+            raise RuntimeError(f"{len(pendientes)} mensajes rechazados por el broker tras {self.max_reintentos} reintentos")
+        
+        return len(mensajes)
 
 def simular_solicitudes():
     """Simula múltiples solicitudes de adopción para testing."""
@@ -0,0 +1,237 @@
+import random
+
+_numpy = False  # False = todavía sin importar
+
+def numpy():
+    """NumPy, importado en el primer uso (~80 ms), o None si no está instalado.
+
+    Es opcional: sin él, el lote se evalúa fila por fila.
+    """
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        _numpy = np
+    return _numpy
+
+SALARIO_MINIMO = 1600000
+LONGITUD_MINIMA_NOMBRE = 4
+PUNTAJE_MINIMO = 3  # Necesita al menos 3 de 5 criterios
+
+# Perfil usado cuando la mascota no está en el catálogo
+MASCOTA_POR_DEFECTO = {'nombre': 'la mascota', 'tipo': 'perro', 'dificultad': 'baja'}
+
+# Fila de la tabla para los valores de la mascota que no tienen una propia
+OTRO = '*'
+# Datos sí/no: cuenta su valor de verdad, así que None o 0 valen como False
+DATOS_BOOLEANOS = frozenset({'experiencia_previa', 'otros_animales'})
+
+def _normalizar(dato, valor):
+    return bool(valor) if dato in DATOS_BOOLEANOS else valor
+
+# Definición declarativa de los criterios de adopción.
+# Cada criterio es (nombre, atributo de la mascota, dato del solicitante, valor por
+# defecto del dato, tabla {valor de la mascota: {valor del dato: probabilidad}}).
+# Una probabilidad de 1 o 0 es determinista; valores intermedios modelan la parte
+# aleatoria de la evaluación (p. ej. entrevista de compatibilidad). Una dificultad
+# desconocida no exige experiencia y un tipo que no es perro sigue las reglas de gato.
+CRITERIOS = (
+    ('experiencia_suficiente', 'dificultad', 'experiencia_previa', False, {
+        'alta': {True: 1.0, False: 0.0},
+        'media': {True: 1.0, False: 0.7},
+        'baja': {True: 1.0, False: 1.0},  # Baja dificultad, no necesita experiencia
+        OTRO: {True: 1.0, False: 1.0},
+    }),
+    ('vivienda_adecuada', 'tipo', 'tipo_vivienda', 'desconocido', {
+        'perro': {'casa': 1.0, 'apartamento': 1.0},
+        'gato': {'casa': 1.0, 'apartamento': 1.0, 'duplex': 1.0},
+        OTRO: {'casa': 1.0, 'apartamento': 1.0, 'duplex': 1.0},
+    }),
+    ('compatibilidad_animales', None, 'otros_animales', False, {
+        None: {False: 1.0, True: 0.6},  # 60% de compatibilidad
+    }),
+    ('tiempo_suficiente', None, None, None, {
+        None: {None: 0.7},  # 70% de aprobación
+    }),
+    ('estabilidad_economica', None, None, None, {
+        None: {None: 0.8},  # 80% de aprobación
+    }),
+)
+
+def evaluar_solicitud_web(mascota_id, usuario_nombre, usuario_salario):
+    """Veredicto de salario/nombre usado por las solicitudes del portal web."""
+    salario_suficiente = usuario_salario >= SALARIO_MINIMO
+    nombre_valido = len(usuario_nombre) >= LONGITUD_MINIMA_NOMBRE
+
+    # Aprobado solo si cumple ambas condiciones
+    aprobado = salario_suficiente and nombre_valido
+
+    if not salario_suficiente:
+        resultado = "RECHAZADA"
+        motivo = f"Salario insuficiente (${usuario_salario:,}) para aplicar en la adopción de la mascota. Mínimo requerido: ${SALARIO_MINIMO:,}"
+    elif not nombre_valido:
+        resultado = "RECHAZADA"
+        motivo = "Nombre muy corto para validación"
+    else:
+        resultado = "APROBADA"
+        motivo = "¡Cumples con todos los requisitos!"
+
+    return {
+        'aprobado': aprobado,
+        'resultado': resultado,
+        'mascota_id': mascota_id,
+        'motivo': motivo,
+        'salario_usuario': usuario_salario
+    }
+
+def tramo_salarial(usuario_salario):
+    """Tramo de salario para cachear veredictos de evaluar_solicitud_web.
+
+    Desde el mínimo todos los salarios dan el mismo veredicto y motivo; por
+    debajo el motivo cita la cifra exacta, así que cada salario es su tramo.
+    """
+    return 'suficiente' if usuario_salario >= SALARIO_MINIMO else usuario_salario
+
+def evaluar_lote_web(salarios, nombres):
+    """Versión por lotes del filtro salario/nombre: devuelve una lista de booleanos."""
+    np = numpy()
+    if np is not None:
+        salarios = np.asarray(salarios)
+        longitudes = np.fromiter((len(n) for n in nombres), dtype=np.int64, count=len(nombres))
+        return ((salarios >= SALARIO_MINIMO) & (longitudes >= LONGITUD_MINIMA_NOMBRE)).tolist()
+    return [s >= SALARIO_MINIMO and len(n) >= LONGITUD_MINIMA_NOMBRE for s, n in zip(salarios, nombres)]
+
+class MotorReglas:
+    """Motor de reglas compilado una sola vez a partir de los criterios.
+
+    Las tablas dependen solo del perfil de la mascota (tipo, dificultad), así que
+    se precalculan por perfil: para cada criterio, {dato del solicitante:
+    probabilidad de cumplir}. Evaluar una solicitud es una búsqueda del perfil
+    en el catálogo y una búsqueda en diccionario por criterio.
+    """
+    def __init__(self, mascotas_info, criterios=CRITERIOS, puntaje_minimo=PUNTAJE_MINIMO):
+        self.criterios = criterios
+        self.nombres = tuple(c[0] for c in criterios)
+        self.atributos = tuple(sorted({c[1] for c in criterios if c[1]}))
+        self.puntaje_minimo = puntaje_minimo
+        self.compilar(mascotas_info)
+
+    def _perfil(self, info_mascota):
+        return tuple(info_mascota.get(a, MASCOTA_POR_DEFECTO.get(a)) for a in self.atributos)
+
+    def _tablas_de_perfil(self, perfil):
+        tablas = self._por_perfil.get(perfil)
+        if tablas is None:
+            valores = dict(zip(self.atributos, perfil))
+            tablas = tuple(
+                (dato, defecto, tabla.get(valores[atributo], tabla.get(OTRO, {})) if atributo else tabla[None])
+                for nombre, atributo, dato, defecto, tabla in self.criterios
+            )
+            self._por_perfil[perfil] = tablas
+            if self._densa is not None:
+                self._agregar_fila_densa(perfil, tablas)
+        return tablas
+
+    def compilar(self, mascotas_info):
+        """Asocia el catálogo (cualquier objeto con `.get`) y precalcula todos los perfiles conocidos."""
+        self.mascotas_info = mascotas_info
+        self._por_perfil = {}
+        self._indices = {}
+        # La tabla densa (NumPy) se arma recién en el primer evaluar_lote
+        self._densa = None
+
+        valores_posibles = {a: set() for a in self.atributos}
+        for nombre, atributo, dato, defecto, tabla in self.criterios:
+            if atributo:
+                valores_posibles[atributo].update(v for v in tabla if v != OTRO)
+        perfiles = [()]
+        for a in self.atributos:
+            perfiles = [p + (v,) for p in perfiles for v in sorted(valores_posibles[a])]
+        for perfil in perfiles + [self._perfil(MASCOTA_POR_DEFECTO)]:
+            self._tablas_de_perfil(perfil)
+
+    def tablas(self, mascota_id):
+        info = self.mascotas_info.get(mascota_id) or MASCOTA_POR_DEFECTO
+        return self._tablas_de_perfil(self._perfil(info))
+
+    def probabilidades(self, mascota_id, datos):
+        """Probabilidad de cumplir cada criterio para una solicitud."""
+        return [tabla.get(_normalizar(dato, datos.get(dato, defecto)) if dato else None, 0.0)
+                for dato, defecto, tabla in self.tablas(mascota_id)]
+
+    def evaluar(self, mascota_id, datos, aleatorio=random.random):
+        """Evalúa una solicitud: devuelve (criterios, puntaje, aprobado)."""
+        criterios = {}
+        puntaje = 0
+        for nombre, p in zip(self.nombres, self.probabilidades(mascota_id, datos)):
+            cumple = p >= 1.0 or (p > 0.0 and aleatorio() < p)
+            criterios[nombre] = cumple
+            puntaje += cumple
+        return criterios, puntaje, puntaje >= self.puntaje_minimo
+
+    def _compilar_codigos(self, np):
+        # Tabla densa [perfil, criterio, código del dato] -> probabilidad, para
+        # evaluar miles de solicitudes con indexado vectorizado.
+        self._codigos = []
+        for nombre, atributo, dato, defecto, tabla in self.criterios:
+            valores = {defecto}
+            for por_valor in tabla.values():
+                valores.update(por_valor)
+            self._codigos.append({valor: codigo for codigo, valor in enumerate(sorted(valores, key=repr))})
+        ancho = max(len(c) for c in self._codigos) + 1  # último código = valor desconocido
+        self._densa = np.zeros((0, len(self.criterios), ancho))
+        for perfil, tablas in list(self._por_perfil.items()):
+            self._agregar_fila_densa(perfil, tablas)
+
+    def _agregar_fila_densa(self, perfil, tablas):
+        np = numpy()
+        fila = np.zeros((1,) + self._densa.shape[1:])
+        for c, (dato, defecto, tabla) in enumerate(tablas):
+            for valor, codigo in self._codigos[c].items():
+                fila[0, c, codigo] = tabla.get(valor, 0.0)
+        self._indices[perfil] = len(self._densa)
+        self._densa = np.concatenate([self._densa, fila])
+
+    def evaluar_lote(self, mascota_ids, datos, semilla=None):
+        """Evalúa muchas solicitudes a la vez.
+
+        `mascota_ids` es una columna de ids y `datos` un dict {dato: columna}
+        (p. ej. {'experiencia_previa': [...], 'tipo_vivienda': [...]}).
+        Devuelve (puntajes, aprobados) como listas.
+        """
+        n = len(mascota_ids)
+        np = numpy()
+        if np is None:
+            aleatorio = random.Random(semilla).random
+            puntajes = []
+            for i, mascota_id in enumerate(mascota_ids):
+                fila = {dato: columna[i] for dato, columna in datos.items()}
+                puntajes.append(self.evaluar(mascota_id, fila, aleatorio)[1])
+            return puntajes, [p >= self.puntaje_minimo for p in puntajes]
+
+        if self._densa is None:
+            self._compilar_codigos(np)
+        perfiles = {}
+        for mascota_id in set(mascota_ids):
+            info = self.mascotas_info.get(mascota_id) or MASCOTA_POR_DEFECTO
+            perfil = self._perfil(info)
+            self._tablas_de_perfil(perfil)
+            perfiles[mascota_id] = self._indices[perfil]
+        filas = np.fromiter((perfiles[m] for m in mascota_ids), dtype=np.int64, count=n)
+        probabilidades = np.empty((n, len(self.criterios)))
+        for c, (nombre, atributo, dato, valor_defecto, tabla) in enumerate(self.criterios):
+            codigos = self._codigos[c]
+            desconocido = len(codigos)
+            if dato is None:
+                columna = np.full(n, codigos[None], dtype=np.int64)
+            else:
+                valores = datos.get(dato, [valor_defecto] * n)
+                columna = np.fromiter((codigos.get(_normalizar(dato, v), desconocido) for v in valores),
+                                      dtype=np.int64, count=n)
+            probabilidades[:, c] = self._densa[filas, c, columna]
+
+        sorteo = np.random.default_rng(semilla).random((n, len(self.criterios)))
+        puntajes = (sorteo < probabilidades).sum(axis=1)
+        return puntajes.tolist(), (puntajes >= self.puntaje_minimo).tolist()
@@ -0,0 +1,91 @@
+import copy
+import os
+from conexion import pool
+from metricas import contar
+
+# Intentos totales de un mensaje antes de mandarlo a la DLQ (el primero incluido)
+MAX_INTENTOS = int(os.environ.get('PETCONNECT_MAX_INTENTOS', '4'))
+# Espera del primer reintento; cada nivel siguiente la duplica
+REINTENTO_BASE_MS = int(os.environ.get('PETCONNECT_REINTENTO_BASE_MS', '1000'))
+
+ENCABEZADO_INTENTOS = 'x-intentos'
+ENCABEZADO_ERROR = 'x-ultimo-error'
+
+# Errores de contenido (cuerpo ilegible, campos faltantes): reintentar no los arregla
+ERRORES_PERMANENTES = (KeyError, ValueError, TypeError)
+
+def exchange_muerto(cola):
+    return f"{cola}.dlx"
+
+def cola_muerta(cola):
+    return f"{cola}.dlq"
+
+def cola_reintento(cola, nivel):
+    return f"{cola}.reintento.{nivel}"
+
+class PoliticaReintentos:
+    """Saca los mensajes fallidos del camino principal de una cola.
+
+    Cada fallo se reprograma en una cola de reintento cuyo TTL crece
+    exponencialmente (base, 2*base, 4*base...). Al vencer el TTL, el broker lo
+    devuelve a la cola original. Al agotar `max_intentos`, o ante un error
+    permanente, el mensaje va al exchange de dead-letter de la cola y termina
+    en `<cola>.dlq`. En los dos casos se hace ack del original para que el
+    consumidor siga con el resto.
+    """
+    def __init__(self, cola, max_intentos=MAX_INTENTOS, base_ms=REINTENTO_BASE_MS):
+        self.cola = cola
+        self.max_intentos = max(1, max_intentos)
+        self.base_ms = base_ms
+
+    def declarar(self, canal):
+        """Declara el DLX, la DLQ y las colas de reintento de la cola."""
+        pool.declarar_exchange(canal, exchange_muerto(self.cola), exchange_type='direct', durable=True)
+        pool.declarar_cola(canal, cola_muerta(self.cola), durable=True)
+        canal.queue_bind(queue=cola_muerta(self.cola), exchange=exchange_muerto(self.cola), routing_key=self.cola)
+
+        for nivel in range(1, self.max_intentos):
+            pool.declarar_cola(canal, cola_reintento(self.cola, nivel), durable=True, arguments={
+                'x-message-ttl': self.base_ms * 2 ** (nivel - 1),
+                'x-dead-letter-exchange': '',
+                'x-dead-letter-routing-key': self.cola
+            })
+
+    def intentos(self, properties):
+        """Intentos ya fallidos del mensaje según su cabecera."""
+        return (properties.headers or {}).get(ENCABEZADO_INTENTOS, 0)
+
+    def fallo(self, ch, method, properties, body, error):
+        """Reprograma o manda a la DLQ un mensaje que falló, y hace ack del original.
+
+        Si la republicación falla (canal caído, cola de reintento borrada), el
+        original se rechaza sin reencolar: la cola principal lo descarta a su
+        DLX. Nunca deja escapar la excepción al callback del consumidor.
+        """
+        intentos = self.intentos(properties) + 1
+        propiedades = copy.copy(properties)
+        propiedades.headers = dict(properties.headers or {})
+        propiedades.headers[ENCABEZADO_INTENTOS] = intentos
+        propiedades.headers[ENCABEZADO_ERROR] = repr(error)[:200]
+
+        try:
+            if isinstance(error, ERRORES_PERMANENTES) or intentos >= self.max_intentos:
+                ch.basic_publish(exchange=exchange_muerto(self.cola), routing_key=self.cola,
+                                 body=body, properties=propiedades)
+                contar('muertos', self.cola)
+                print(f"[Reintentos] Mensaje de {self.cola} enviado a {cola_muerta(self.cola)} tras {intentos} intento(s): {error!r}")
+            else:
+                ch.basic_publish(exchange='', routing_key=cola_reintento(self.cola, intentos),
+                                 body=body, properties=propiedades)
+                contar('reintentos', self.cola)
+        except Exception as e:
+            print(f"[Reintentos] No se pudo republicar un mensaje de {self.cola}, se rechaza: {e!r}")
+            contar('muertos', self.cola)
+            try:
+                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            except Exception as e:
+                # Con el canal cerrado el broker ya lo reentregará a otro consumidor
+                print(f"[Reintentos] No se pudo rechazar el mensaje de {self.cola}: {e!r}")
+            return
+
+        ch.basic_ack(delivery_tag=method.delivery_tag)
@@ -1,9 +1,21 @@
 // Estado de la aplicación
 let estadoApp = {
     solicitudesPendientes: new Map(),
-    notificacionesCargadas: false
+    notificacionesCargadas: false,
+    ultimaNotificacionId: 0,
+    streamNotificaciones: null,
+    paginaMascotas: 0
 };
 
+// Mascotas por página al cargar el catálogo
+const MASCOTAS_POR_PAGINA = 12;
+
+// Máximo de notificaciones del servidor visibles a la vez
+const MAX_NOTIFICACIONES_SERVIDOR = 15;
+
+// Cuánto esperar el veredicto de una solicitud asíncrona antes de dejar de consultar
+const ESPERA_RESULTADO_MAX_MS = 2 * 60 * 1000;
+
 // Función para solicitar adopción
 async function solicitarAdopcion(mascotaId) {
     const boton = document.querySelector(`[data-mascota-id="${mascotaId}"] .btn-adoptar`);
@@ -78,7 +90,24 @@ async function solicitarAdopcion(mascotaId) {
             })
         });
 
-        const resultado = await response.json();
+        let resultado = await response.json();
+        
+        // Modo asíncrono: el servidor responde 202 con un id y el veredicto llega después
+        if (response.status === 202 && resultado.solicitud_id) {
+            await cargarNotificaciones();
+            resultado = await esperarResultado(resultado.solicitud_id);
+            
+            if (resultado === null) {
+                // El procesador no respondió a tiempo: la solicitud sigue en cola
+                mostrarNotificacionLocal({
+                    tipo: 'warning',
+                    mensaje: `Tu solicitud para ${nombreMascota} sigue en proceso. Revisa las notificaciones más tarde.`,
+                    timestamp: new Date()
+                });
+                restaurarBoton(boton);
+                return;
+            }
+        }
         
         if (resultado.estado === 'success') {
             // Actualizar el botón según el resultado
@@ -111,6 +140,76 @@ async function solicitarAdopcion(mascotaId) {
     }
 }
 
+// Función para crear la tarjeta de una mascota del catálogo
+function crearTarjetaMascota(mascota) {
+    const tarjeta = document.createElement('div');
+    tarjeta.className = 'mascota-card';
+    tarjeta.dataset.mascotaId = mascota.mascota_id;
+    
+    const tipo = mascota.tipo.charAt(0).toUpperCase() + mascota.tipo.slice(1);
+    const imagen = mascota.imagen
+        ? `<img src="${mascota.imagen}" alt="${mascota.nombre}" loading="lazy">`
+        : '<div class="mascota-img-vacia"><i class="fas fa-paw"></i></div>';
+    const detalles = [
+        [mascota.sexo, 'fa-venus-mars'],
+        [mascota.edad, 'fa-birthday-cake'],
+        [mascota.tamano, 'fa-ruler']
+    ].filter(([valor]) => valor)
+     .map(([valor, icono]) => `<span><i class="fas ${icono}"></i> ${valor}</span>`)
+     .join('');
+    
+    tarjeta.innerHTML = `
+        <div class="mascota-img">
+            ${imagen}
+            <div class="mascota-badge ${mascota.tipo}">${tipo}</div>
+        </div>
+        <div class="mascota-info">
+            <h3>${mascota.nombre}</h3>
+            <div class="mascota-details">${detalles}</div>
+            <p>${mascota.descripcion || ''}</p>
+            <button class="btn-adoptar" onclick="solicitarAdopcion('${mascota.mascota_id}')">
+                <i class="fas fa-heart"></i> Solicitar Adopción
+            </button>
+        </div>
+    `;
+    return tarjeta;
+}
+
+// Función para cargar la siguiente página del catálogo
+async function cargarMascotas() {
+    const grid = document.getElementById('mascotas-grid');
+    const botonMas = document.getElementById('btn-mas-mascotas');
+    const pagina = estadoApp.paginaMascotas + 1;
+    
+    try {
+        const response = await fetch(`/mascotas?disponible=1&pagina=${pagina}&por_pagina=${MASCOTAS_POR_PAGINA}`);
+        const datos = await response.json();
+        
+        datos.mascotas.forEach(mascota => grid.appendChild(crearTarjetaMascota(mascota)));
+        estadoApp.paginaMascotas = pagina;
+        
+        botonMas.hidden = pagina * datos.por_pagina >= datos.total;
+    } catch (error) {
+        console.error('Error cargando mascotas:', error);
+    }
+}
+
+// Función para esperar el resultado de una solicitud asíncrona (long-poll)
+async function esperarResultado(solicitudId) {
+    // Devuelve null si pasa ESPERA_RESULTADO_MAX_MS sin veredicto
+    const limite = Date.now() + ESPERA_RESULTADO_MAX_MS;
+    while (Date.now() < limite) {
+        const esperar = Math.max(1, Math.min(20, Math.ceil((limite - Date.now()) / 1000)));
+        const response = await fetch(`/resultado_adopcion/${solicitudId}?esperar=${esperar}`);
+        const resultado = await response.json();
+        
+        if (response.status !== 202) {
+            return resultado;
+        }
+    }
+    return null;
+}
+
 // Función para restaurar botón
 function restaurarBoton(boton) {
     boton.innerHTML = '<i class="fas fa-heart"></i> Solicitar Adopción';
@@ -198,41 +297,81 @@ function mostrarNotificacionLocal(notificacion) {
     }
 }
 
-// Función para cargar notificaciones del servidor
+// Función para agregar UNA notificación del servidor (sin reconstruir el resto)
+function agregarNotificacionServidor(notif) {
+    const container = document.getElementById('notificaciones-container');
+    const placeholder = container.querySelector('.notificacion-placeholder');
+    
+    if (notif.id <= estadoApp.ultimaNotificacionId) {
+        return;
+    }
+    estadoApp.ultimaNotificacionId = notif.id;
+    placeholder.style.display = 'none';
+    
+    const notificacionElement = document.createElement('div');
+    notificacionElement.className = `notificacion servidor ${notif.tipo}`;
+    
+    notificacionElement.innerHTML = `
+        <div class="notificacion-header">
+            <span class="notificacion-tipo">${notif.titulo}</span>
+            <span class="notificacion-tiempo">${notif.timestamp}</span>
+        </div>
+        <div class="notificacion-mensaje">${notif.mensaje}</div>
+    `;
+    
+    // Las más nuevas arriba
+    container.insertBefore(notificacionElement, placeholder.nextSibling);
+    
+    const delServidor = container.querySelectorAll('.notificacion.servidor');
+    if (delServidor.length > MAX_NOTIFICACIONES_SERVIDOR) {
+        delServidor[delServidor.length - 1].remove();
+    }
+}
+
+// Función para vaciar las notificaciones del servidor
+function vaciarNotificaciones() {
+    const container = document.getElementById('notificaciones-container');
+    container.querySelectorAll('.notificacion.servidor').forEach(n => n.remove());
+    
+    if (container.querySelectorAll('.notificacion').length === 0) {
+        container.querySelector('.notificacion-placeholder').style.display = 'block';
+    }
+}
+
+// Función para recibir notificaciones en vivo (Server-Sent Events)
+function conectarStreamNotificaciones() {
+    if (!window.EventSource) {
+        return false;
+    }
+    
+    const fuente = new EventSource(`/notificaciones/stream?since=${estadoApp.ultimaNotificacionId}`);
+    
+    fuente.onmessage = (evento) => {
+        agregarNotificacionServidor(JSON.parse(evento.data));
+        estadoApp.notificacionesCargadas = true;
+    };
+    fuente.addEventListener('limpiar', vaciarNotificaciones);
+    fuente.onerror = () => {
+        // EventSource reconecta solo y reenvía Last-Event-ID
+        console.warn('Stream de notificaciones interrumpido, reconectando...');
+    };
+    
+    estadoApp.streamNotificaciones = fuente;
+    return true;
+}
+
+// Función para cargar notificaciones del servidor (solo las nuevas)
 async function cargarNotificaciones() {
+    // Con el stream activo el servidor ya empuja las novedades
+    if (estadoApp.streamNotificaciones) {
+        return;
+    }
+    
     try {
-        const response = await fetch('/notificaciones');
+        const response = await fetch(`/notificaciones?since=${estadoApp.ultimaNotificacionId}`);
         const notificaciones = await response.json();
         
-        const container = document.getElementById('notificaciones-container');
-        const placeholder = container.querySelector('.notificacion-placeholder');
-        
-        if (notificaciones.length > 0) {
-            placeholder.style.display = 'none';
-            
-            // Limpiar contenedor (excepto placeholder)
-            const notificacionesExistentes = container.querySelectorAll('.notificacion');
-            notificacionesExistentes.forEach(n => n.remove());
-            
-            // Agregar nuevas notificaciones
-            notificaciones.forEach(notif => {
-                const notificacionElement = document.createElement('div');
-                notificacionElement.className = `notificacion ${notif.tipo}`;
-                
-                notificacionElement.innerHTML = `
-                    <div class="notificacion-header">
-                        <span class="notificacion-tipo">${notif.titulo}</span>
-                        <span class="notificacion-tiempo">${notif.timestamp}</span>
-                    </div>
-                    <div class="notificacion-mensaje">${notif.mensaje}</div>
-                `;
-                
-                container.appendChild(notificacionElement);
-            });
-        } else {
-            // Mostrar placeholder si no hay notificaciones
-            placeholder.style.display = 'block';
-        }
+        notificaciones.forEach(agregarNotificacionServidor);
         
         estadoApp.notificacionesCargadas = true;
         
@@ -245,8 +384,10 @@ async function cargarNotificaciones() {
 async function limpiarNotificaciones() {
     try {
         await fetch('/limpiar_notificaciones', { method: 'POST' });
-        // Recargar notificaciones SOLO UNA VEZ después de limpiar
-        await cargarNotificaciones();
+        // Sin stream no llega el evento 'limpiar': vaciar localmente
+        if (!estadoApp.streamNotificaciones) {
+            vaciarNotificaciones();
+        }
     } catch (error) {
         console.error('Error limpiando notificaciones:', error);
     }
@@ -256,10 +397,14 @@ async function limpiarNotificaciones() {
 document.addEventListener('DOMContentLoaded', function() {
     console.log('PetConnect con RabbitMQ - VALIDACIÓN DE SALARIO ACTIVADA');
     console.log('Mínimo requerido: $1,600,000');
-    console.log('GETs exactos: 1 al cargar, 1 por adopción, 1 por limpiar');
     
-    // Cargar notificaciones iniciales SOLO UNA VEZ
-    cargarNotificaciones();
+    // Primera página del catálogo de mascotas
+    cargarMascotas();
+    
+    // Notificaciones en vivo por SSE; sin soporte, una carga inicial y luego incremental
+    if (!conectarStreamNotificaciones()) {
+        cargarNotificaciones();
+    }
     
     // Efectos de scroll suave
     document.querySelectorAll('a[href^="#"]').forEach(anchor => {
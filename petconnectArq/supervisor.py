@@ -0,0 +1,297 @@
+"""Supervisor de procesadores y consumidores, cada uno en su propio proceso.
+
+  python supervisor.py                                   # 1-4 procesadores, 1-2 consumidores
+  python supervisor.py --procesadores 2:8 --consumidores 1:3 --puerto 8081
+
+Cada trabajador corre ProcesadorAdopciones o ConsumidorResultados en un
+proceso (multiprocessing, spawn) contra RabbitMQ. El supervisor reinicia los
+que terminan sin que se les pidiera y, cada SUPERVISOR_INTERVALO segundos,
+ajusta cuántos hay según la profundidad de su cola y el ritmo al que la están
+procesando. Cada decisión queda en el log y, con --puerto, en GET /estado.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from conexion import pool
+from admision import ControlAdmision
+from metricas import metricas
+from perfilador import instalar_senales
+
+SUPERVISOR_INTERVALO = float(os.environ.get('SUPERVISOR_INTERVALO', '5'))
+# Segundos en los que se quiere vaciar lo acumulado en la cola al escalar
+SUPERVISOR_OBJETIVO_S = float(os.environ.get('SUPERVISOR_OBJETIVO_S', '30'))
+# Espera mínima entre dos reducciones de un mismo grupo
+SUPERVISOR_ENFRIAMIENTO_S = float(os.environ.get('SUPERVISOR_ENFRIAMIENTO_S', '60'))
+# Un trabajador que muere antes de esto cuenta como fallo de arranque (reinicio con espera)
+SUPERVISOR_VIDA_MINIMA_S = 10
+SUPERVISOR_ESPERA_MAX_S = 60
+
+def _interrumpir(signum, frame):
+    raise KeyboardInterrupt
+
+def _iniciar_procesador():
+    from procesador import ProcesadorAdopciones
+    ProcesadorAdopciones().iniciar_procesamiento()
+
+def _iniciar_consumidor():
+    from consumidor import ConsumidorResultados
+    ConsumidorResultados().iniciar_consumo()
+
+# tipo -> (cola que atiende, arranque del componente en el proceso hijo)
+TIPOS = {
+    'procesador': ('solicitudes_adopcion', _iniciar_procesador),
+    'consumidor': ('resultados_adopcion', _iniciar_consumidor),
+}
+
+def _reportar_procesados(cola, procesados):
+    # Copia el contador de acks del proceso al valor compartido con el supervisor
+    contador = metricas.contador('petconnect_acks_total', 'Mensajes (acks) por cola', cola=cola)
+    while True:
+        procesados.value = contador.valor
+        time.sleep(1)
+
+def _trabajador(tipo, procesados):
+    """Punto de entrada de cada proceso trabajador."""
+    cola, iniciar = TIPOS[tipo]
+    # SIGTERM como Ctrl+C: el componente drena lo que tiene en vuelo antes de salir
+    signal.signal(signal.SIGTERM, _interrumpir)
+    instalar_senales(tipo)
+    threading.Thread(target=_reportar_procesados, args=(cola, procesados), daemon=True).start()
+    iniciar()
+
+class Trabajador:
+    def __init__(self, proceso, procesados):
+        self.proceso = proceso
+        self.procesados = procesados
+        self.iniciado = time.monotonic()
+        self.leidos = 0  # procesados en la medición anterior
+
+class GrupoTrabajadores:
+    """Procesos de un mismo tipo, entre `minimo` y `maximo`."""
+    def __init__(self, tipo, minimo, maximo, contexto, objetivo_s=SUPERVISOR_OBJETIVO_S,
+                 enfriamiento_s=SUPERVISOR_ENFRIAMIENTO_S):
+        self.tipo = tipo
+        self.cola = TIPOS[tipo][0]
+        self.minimo = max(0, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.contexto = contexto
+        self.objetivo_s = objetivo_s
+        self.enfriamiento_s = enfriamiento_s
+        self.deseados = self.minimo
+        self.trabajadores = []
+        self.saliendo = []  # detenidos por el supervisor, esperando a que terminen
+        self.control = ControlAdmision(self.cola, cache_ms=0)
+        self.tasa = 0.0  # mensajes/s procesados por todo el grupo (suavizado)
+        self.reinicios = 0
+        self.fallos_seguidos = 0
+        self.reiniciar_desde = 0.0
+        self.ultimo_cambio = time.monotonic()
+        self.ultima_lectura = {}
+        self._secuencia = 0
+
+    def _lanzar(self):
+        self._secuencia += 1
+        procesados = self.contexto.Value('q', 0)
+        proceso = self.contexto.Process(
+            target=_trabajador, args=(self.tipo, procesados),
+            name=f'{self.tipo}-{self._secuencia}'
+        )
+        proceso.start()
+        self.trabajadores.append(Trabajador(proceso, procesados))
+        print(f"[Supervisor] {proceso.name} iniciado (pid {proceso.pid})")
+
+    def _detener_uno(self):
+        trabajador = self.trabajadores.pop()
+        trabajador.proceso.terminate()
+        self.saliendo.append(trabajador)
+        print(f"[Supervisor] {trabajador.proceso.name} detenido")
+
+    def revisar(self):
+        """Detecta trabajadores caídos y programa su reemplazo."""
+        ahora = time.monotonic()
+        for trabajador in [t for t in self.trabajadores if not t.proceso.is_alive()]:
+            self.trabajadores.remove(trabajador)
+            vida = ahora - trabajador.iniciado
+            print(f"[Supervisor] {trabajador.proceso.name} terminó (código {trabajador.proceso.exitcode}) "
+                  f"tras {vida:.0f}s; se reemplaza")
+            self.reinicios += 1
+            if vida < SUPERVISOR_VIDA_MINIMA_S:
+                # Falla al arrancar (p. ej. broker caído): reintentar con espera creciente
+                self.fallos_seguidos += 1
+                self.reiniciar_desde = ahora + min(SUPERVISOR_ESPERA_MAX_S, 2 ** self.fallos_seguidos)
+            else:
+                self.fallos_seguidos = 0
+        self.saliendo = [t for t in self.saliendo if t.proceso.is_alive()]
+
+    def medir(self, intervalo):
+        """Actualiza la tasa de procesamiento del grupo con los contadores de cada trabajador."""
+        procesados = 0
+        for trabajador in self.trabajadores:
+            valor = trabajador.procesados.value
+            procesados += max(0, valor - trabajador.leidos)
+            trabajador.leidos = valor
+        self.tasa = 0.5 * self.tasa + 0.5 * procesados / intervalo
+        self.ultima_lectura = self.control.estado()
+        return self.ultima_lectura
+
+    def decidir(self, intervalo):
+        """Recalcula cuántos trabajadores hacen falta. Devuelve el motivo si cambió algo."""
+        lectura = self.medir(intervalo)
+        mensajes = lectura['mensajes']
+        # Lo que entra a la cola = lo que se procesa - lo que la cola baja
+        entrada = max(0.0, self.tasa - lectura['tasa_drenaje'])
+        necesario = entrada + mensajes / self.objetivo_s
+        vivos = len(self.trabajadores)
+
+        if self.tasa > 0 and vivos:
+            deseados = math.ceil(necesario / (self.tasa / vivos))
+        elif mensajes == 0:
+            deseados = self.minimo
+        else:
+            # Sin ritmo medido todavía (recién arrancados): no hay base para cambiar
+            deseados = self.deseados
+        deseados = max(self.minimo, min(self.maximo, deseados))
+
+        ahora = time.monotonic()
+        if deseados > self.deseados:
+            nuevo = deseados
+        elif deseados < self.deseados and ahora - self.ultimo_cambio >= self.enfriamiento_s:
+            nuevo = self.deseados - 1  # se reduce de a uno para no oscilar
+        else:
+            return None
+
+        motivo = (f"{self.tipo}: {self.deseados} -> {nuevo} (cola={mensajes}, "
+                  f"procesados={self.tasa:.1f}/s, entrada={entrada:.1f}/s)")
+        self.deseados = nuevo
+        self.ultimo_cambio = ahora
+        return motivo
+
+    def ajustar(self):
+        """Lanza o detiene procesos hasta tener `deseados` vivos."""
+        while len(self.trabajadores) > self.deseados:
+            self._detener_uno()
+        if len(self.trabajadores) < self.deseados and time.monotonic() >= self.reiniciar_desde:
+            while len(self.trabajadores) < self.deseados:
+                self._lanzar()
+
+    def detener(self, timeout=35):
+        """Detiene todos los trabajadores dándoles tiempo para drenar."""
+        while self.trabajadores:
+            self._detener_uno()
+        limite = time.monotonic() + timeout
+        for trabajador in self.saliendo:
+            trabajador.proceso.join(max(0, limite - time.monotonic()))
+            if trabajador.proceso.is_alive():
+                trabajador.proceso.kill()
+        self.saliendo = []
+
+    def estado(self):
+        return {
+            'minimo': self.minimo,
+            'maximo': self.maximo,
+            'deseados': self.deseados,
+            'vivos': [t.proceso.pid for t in self.trabajadores],
+            'reinicios': self.reinicios,
+            'procesados_por_segundo': round(self.tasa, 2),
+            'cola': self.ultima_lectura
+        }
+
+class Supervisor:
+    def __init__(self, grupos, intervalo=SUPERVISOR_INTERVALO):
+        self.grupos = grupos
+        self.intervalo = intervalo
+        self.decisiones = deque(maxlen=50)
+        self._lock = threading.Lock()
+
+    def _registrar(self, motivo):
+        print(f"[Supervisor] Escalado {motivo}")
+        self.decisiones.append({'momento': time.time(), 'decision': motivo})
+
+    def paso(self):
+        with self._lock:
+            for grupo in self.grupos:
+                grupo.revisar()
+                motivo = grupo.decidir(self.intervalo)
+                if motivo:
+                    self._registrar(motivo)
+                grupo.ajustar()
+
+    def ejecutar(self):
+        signal.signal(signal.SIGTERM, _interrumpir)
+        with self._lock:
+            for grupo in self.grupos:
+                grupo.ajustar()
+        try:
+            while True:
+                time.sleep(self.intervalo)
+                self.paso()
+        except KeyboardInterrupt:
+            print("[Supervisor] Deteniendo trabajadores...")
+            with self._lock:
+                for grupo in self.grupos:
+                    grupo.detener()
+
+    def estado(self):
+        with self._lock:
+            return {
+                'grupos': {grupo.tipo: grupo.estado() for grupo in self.grupos},
+                'decisiones': list(self.decisiones)
+            }
+
+def servir_estado(supervisor, puerto):
+    """GET /estado con el estado del supervisor en JSON (hilo demonio)."""
+    class ManejadorEstado(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') not in ('', '/estado'):
+                self.send_error(404)
+                return
+            cuerpo = json.dumps(supervisor.estado(), ensure_ascii=False).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('', puerto), ManejadorEstado)
+    threading.Thread(target=servidor.serve_forever, name='supervisor-estado', daemon=True).start()
+    print(f"[Supervisor] Estado en http://localhost:{puerto}/estado")
+    return servidor
+
+def _rango(texto):
+    minimo, _, maximo = texto.partition(':')
+    return int(minimo), int(maximo or minimo)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--procesadores', type=_rango, default=(1, 4), help='mínimo:máximo (por defecto 1:4)')
+    parser.add_argument('--consumidores', type=_rango, default=(1, 2), help='mínimo:máximo (por defecto 1:2)')
+    parser.add_argument('--puerto', type=int, default=int(os.environ.get('SUPERVISOR_PUERTO', '0')),
+                        help='puerto de GET /estado (0 = sin endpoint)')
+    args = parser.parse_args()
+
+    if pool.transporte.nombre == 'memoria':
+        # Cada proceso tendría su propio broker en memoria
+        parser.error("el supervisor reparte el trabajo entre procesos y necesita PETCONNECT_BROKER=rabbitmq")
+
+    contexto = multiprocessing.get_context('spawn')
+    supervisor = Supervisor([
+        GrupoTrabajadores('procesador', *args.procesadores, contexto),
+        GrupoTrabajadores('consumidor', *args.consumidores, contexto),
+    ])
+    if args.puerto:
+        servir_estado(supervisor, args.puerto)
+    supervisor.ejecutar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+
+# Los módulos se importan planos (from conexion import ...), como al correrlos desde petconnectArq/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sin RabbitMQ: todo contra el broker en memoria
+os.environ.setdefault('PETCONNECT_BROKER', 'memoria')
+# Bases SQLite (catálogo, histórico) fuera del árbol del repositorio
+_DATOS = tempfile.mkdtemp(prefix='petconnect-tests-')
+os.environ.setdefault('PETCONNECT_CATALOGO_DB', os.path.join(_DATOS, 'catalogo.db'))
+os.environ.setdefault('PETCONNECT_HISTORIAL_DB', os.path.join(_DATOS, 'resultados.db'))
+
+import pytest
+
+from broker_memoria import BrokerMemoria
+from conexion import PoolConexiones, TransporteMemoria
+
+@pytest.fixture
+def broker():
+    return BrokerMemoria()
+
+@pytest.fixture
+def canal(broker):
+    conexion = broker.conectar()
+    yield conexion.channel()
+    conexion.close()
+
+@pytest.fixture
+def pool(broker):
+    pool = PoolConexiones(tamano=2, timeout_espera=0.3, transporte=TransporteMemoria(broker))
+    yield pool
+    pool.cerrar()
+
+def esperar(condicion, conexion=None, timeout=5):
+    """Procesa eventos de `conexion` hasta que `condicion()` sea verdadera o pase el timeout."""
+    import time
+    limite = time.monotonic() + timeout
+    while not condicion():
+        if time.monotonic() > limite:
+            raise AssertionError('condición no cumplida a tiempo')
+        if conexion is not None:
+            conexion.process_data_events(time_limit=0.01)
+        else:
+            time.sleep(0.01)
@@ -0,0 +1,28 @@
+import pytest
+
+from admision import ControlAdmision, ColaSaturada
+
+def test_admite_bajo_el_limite_y_rechaza_al_llegar(canal):
+    canal.queue_declare('solicitudes')
+    control = ControlAdmision('solicitudes', limite=3, cache_ms=0, canal=canal)
+    for _ in range(2):
+        canal.basic_publish(exchange='', routing_key='solicitudes', body=b'x')
+    control.admitir()
+
+    canal.basic_publish(exchange='', routing_key='solicitudes', body=b'x')
+    with pytest.raises(ColaSaturada) as error:
+        control.admitir()
+    assert error.value.mensajes == 3
+    assert 1 <= error.value.reintentar_en <= 60
+    assert control.ocupacion() == 1.0
+
+def test_sin_limite_no_consulta_al_broker(canal):
+    control = ControlAdmision('no_existe', limite=0, canal=canal)
+    assert not control.activo
+    control.admitir()
+    assert control.ocupacion() == 0.0
+    assert canal.is_open
+
+def test_cola_inexistente_cuenta_como_vacia(canal):
+    control = ControlAdmision('no_existe', limite=5, cache_ms=0, canal=canal)
+    assert control.estado()['mensajes'] == 0
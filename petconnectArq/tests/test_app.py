@@ -0,0 +1,88 @@
+import pytest
+
+import app as web
+from conexion import pool
+from conftest import esperar
+from procesador import ProcesadorAdopciones
+
+@pytest.fixture
+def cliente(monkeypatch):
+    # process_adoption simula 2 s de trabajo
+    monkeypatch.setattr(web.time, 'sleep', lambda segundos: None)
+    return web.app.test_client()
+
+@pytest.fixture
+def procesador():
+    # Mismo broker en memoria que el pool de la app
+    canal = pool.transporte.conectar().channel()
+    procesador = ProcesadorAdopciones(canal=canal, demora=(0,), trabajadores=1, planificar=False)
+    procesador.suscribir()
+    yield procesador
+    procesador.detener(timeout=1)
+    canal.connection.close()
+
+def solicitar(cliente, usuario, salario=2000000, mascota='Max_003'):
+    return cliente.post('/solicitar_adopcion', json={
+        'mascota_id': mascota, 'usuario_nombre': usuario, 'usuario_salario': salario
+    })
+
+def test_modo_sincrono_decide_en_la_web(cliente, monkeypatch):
+    monkeypatch.setattr(web, 'MODO_ASINCRONO', False)
+    respuesta = solicitar(cliente, 'Sincrona')
+    assert respuesta.status_code == 200
+    assert respuesta.json['resultado']['resultado'] == 'APROBADA'
+
+def test_modo_asincrono_responde_202_y_luego_el_veredicto(cliente, procesador, monkeypatch):
+    monkeypatch.setattr(web, 'MODO_ASINCRONO', True)
+    respuesta = solicitar(cliente, 'Asincrona', salario=1)
+    assert respuesta.status_code == 202
+    solicitud_id = respuesta.json['solicitud_id']
+
+    esperar(lambda: web.rabbit_mq.resultados.obtener(solicitud_id)['estado'] != 'pendiente',
+            procesador.canal.connection)
+    resultado = cliente.get(f'/resultado_adopcion/{solicitud_id}')
+    assert resultado.status_code == 200
+    assert resultado.json['resultado']['resultado'] == 'RECHAZADA'
+
+def test_salario_invalido_da_400(cliente):
+    respuesta = solicitar(cliente, 'Laura', salario='mucho')
+    assert respuesta.status_code == 400
+    assert 'salario' in respuesta.json['error']
+
+def test_sin_mascota_da_400(cliente):
+    assert cliente.post('/solicitar_adopcion', json={'usuario_nombre': 'Laura'}).status_code == 400
+
+def test_notificaciones_since_devuelve_solo_las_nuevas(cliente):
+    web.rabbit_mq.clear_notifications()
+    web.rabbit_mq.add_notification('uno', 'primera', 'info')
+    ultima = cliente.get('/notificaciones?since=0').json[-1]['id']
+    web.rabbit_mq.add_notification('dos', 'segunda', 'info')
+
+    nuevas = cliente.get(f'/notificaciones?since={ultima}').json
+    assert [n['titulo'] for n in nuevas] == ['dos']
+    assert cliente.get(f"/notificaciones?since={nuevas[-1]['id']}&esperar=0.05").json == []
+
+def test_los_veredictos_web_quedan_en_el_historico(cliente, procesador, monkeypatch):
+    monkeypatch.setattr(web, 'MODO_ASINCRONO', True)
+    solicitud_id = solicitar(cliente, 'Historica', salario=1).json['solicitud_id']
+    esperar(lambda: web.rabbit_mq.resultados.obtener(solicitud_id)['estado'] != 'pendiente',
+            procesador.canal.connection)
+    guardado = cliente.get(f'/resultados/{solicitud_id}')
+    assert guardado.status_code == 200
+    assert guardado.json['usuario_id'] == 'Historica' and guardado.json['aprobado'] is False
+
+    monkeypatch.setattr(web, 'MODO_ASINCRONO', False)
+    solicitar(cliente, 'HistoricaSincrona')
+    [sincrono] = cliente.get('/resultados?usuario=HistoricaSincrona').json['resultados']
+    assert sincrono['aprobado'] is True and sincrono['mascota_id'] == 'Max_003'
+
+def test_reenvio_identico_sale_de_la_cache_sin_encolar(cliente, monkeypatch):
+    monkeypatch.setattr(web, 'MODO_ASINCRONO', False)
+    primera = solicitar(cliente, 'Cacheada').json['resultado']
+    enviados = []
+    monkeypatch.setattr(web.rabbit_mq, 'send_to_rabbitmq', lambda *args, **kwargs: enviados.append(args))
+    # Otro salario sobre el mínimo: mismo tramo, mismo veredicto
+    segunda = solicitar(cliente, 'Cacheada', salario=3000000).json['resultado']
+    assert not enviados
+    assert segunda['resultado'] == primera['resultado'] == 'APROBADA'
+    assert segunda['salario_usuario'] == 3000000
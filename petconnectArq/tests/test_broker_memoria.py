@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pika
+import pytest
+from pika.exceptions import NackError, UnroutableError
+
+from conftest import esperar
+
+def consumir(canal, cola, auto_ack=False):
+    recibidos = []
+    canal.basic_consume(queue=cola, auto_ack=auto_ack,
+                        on_message_callback=lambda ch, method, props, body: recibidos.append((method, props, body)))
+    return recibidos
+
+def test_ack_multiple_toma_todo_hasta_el_tag(canal):
+    canal.queue_declare('trabajo')
+    for i in range(5):
+        canal.basic_publish(exchange='', routing_key='trabajo', body=str(i))
+    recibidos = consumir(canal, 'trabajo')
+    esperar(lambda: len(recibidos) == 5, canal.connection)
+
+    canal.basic_ack(delivery_tag=recibidos[2][0].delivery_tag, multiple=True)
+    assert len(canal._sin_ack) == 2
+    canal.basic_ack(delivery_tag=0, multiple=True)
+    assert not canal._sin_ack
+
+def test_ack_multiple_espera_el_lock_del_broker(broker, canal):
+    # _entregar llena _sin_ack con el lock del broker desde el hilo que publica:
+    # tomar los tags sin ese lock puede iterar el dict mientras cambia
+    canal.queue_declare('trabajo')
+    for _ in range(3):
+        canal.basic_publish(exchange='', routing_key='trabajo', body=b'x')
+    recibidos = consumir(canal, 'trabajo')
+    esperar(lambda: len(recibidos) == 3, canal.connection)
+
+    liberar, tomado = threading.Event(), threading.Event()
+
+    def entregando():
+        with broker._lock:
+            tomado.set()
+            liberar.wait()
+
+    hilo = threading.Thread(target=entregando, daemon=True)
+    hilo.start()
+    tomado.wait()
+    ack = threading.Thread(target=canal.basic_ack, kwargs={'delivery_tag': 0, 'multiple': True}, daemon=True)
+    try:
+        ack.start()
+        ack.join(0.1)
+        assert len(canal._sin_ack) == 3, 'basic_ack tomó los tags sin el lock del broker'
+    finally:
+        liberar.set()
+    ack.join()
+    assert not canal._sin_ack
+
+def test_nack_con_requeue_reentrega(canal):
+    canal.queue_declare('trabajo')
+    canal.basic_publish(exchange='', routing_key='trabajo', body=b'hola')
+    recibidos = consumir(canal, 'trabajo')
+    esperar(lambda: recibidos, canal.connection)
+
+    canal.basic_nack(delivery_tag=recibidos[0][0].delivery_tag, requeue=True)
+    esperar(lambda: len(recibidos) == 2, canal.connection)
+    assert recibidos[1][0].redelivered and recibidos[1][2] == b'hola'
+
+def test_cerrar_el_canal_devuelve_los_sin_ack(broker, canal):
+    canal.queue_declare('trabajo')
+    canal.basic_publish(exchange='', routing_key='trabajo', body=b'hola')
+    recibidos = consumir(canal, 'trabajo')
+    esperar(lambda: recibidos, canal.connection)
+
+    canal.close()
+    mensajes = broker.colas['trabajo'].mensajes
+    assert len(mensajes) == 1 and mensajes[0].redelivered
+
+def test_confirmaciones_nack_con_cola_llena(canal):
+    canal.queue_declare('trabajo', arguments={'x-max-length': 1, 'x-overflow': 'reject-publish'})
+    canal.confirm_delivery()
+    canal.basic_publish(exchange='', routing_key='trabajo', body=b'1')
+    with pytest.raises(NackError):
+        canal.basic_publish(exchange='', routing_key='trabajo', body=b'2')
+
+def test_confirmaciones_mandatory_sin_destino(canal):
+    canal.confirm_delivery()
+    with pytest.raises(UnroutableError):
+        canal.basic_publish(exchange='', routing_key='no_existe', body=b'1', mandatory=True)
+
+def test_cola_con_prioridades_entrega_primero_la_mayor(canal):
+    canal.queue_declare('trabajo', arguments={'x-max-priority': 10})
+    for cuerpo, prioridad in ((b'lote', 1), (b'web', 8), (b'normal', 5)):
+        canal.basic_publish(exchange='', routing_key='trabajo', body=cuerpo,
+                            properties=pika.BasicProperties(priority=prioridad))
+    recibidos = consumir(canal, 'trabajo', auto_ack=True)
+    esperar(lambda: len(recibidos) == 3, canal.connection)
+    assert [body for _, _, body in recibidos] == [b'web', b'normal', b'lote']
+
+def test_prefetch_limita_los_sin_ack(canal):
+    canal.queue_declare('trabajo')
+    for _ in range(5):
+        canal.basic_publish(exchange='', routing_key='trabajo', body=b'x')
+    canal.basic_qos(prefetch_count=2)
+    recibidos = consumir(canal, 'trabajo')
+    esperar(lambda: len(recibidos) == 2, canal.connection)
+    canal.connection.process_data_events(time_limit=0.05)
+    assert len(recibidos) == 2
+
+    canal.basic_ack(delivery_tag=recibidos[1][0].delivery_tag, multiple=True)
+    esperar(lambda: len(recibidos) == 4, canal.connection)
+
+def test_importar_el_broker_no_carga_pika():
+    codigo = 'import sys, broker_memoria, productor; print("pika" in sys.modules)'
+    salida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert salida.stdout.strip() == 'False'
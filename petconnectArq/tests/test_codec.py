@@ -0,0 +1,39 @@
+import time
+
+import pytest
+
+from codec import CodecJSON, empaquetar, desempaquetar, obtener_codec
+
+SOLICITUD = {
+    'tipo': 'solicitud_adopcion', 'solicitud_id': 'abc', 'mascota_id': 'Max_003',
+    'usuario': 'Laura', 'salario': 2000000, 'timestamp': time.time(), 'accion': 'solicitar'
+}
+
+def test_json_ida_y_vuelta():
+    body, propiedades = empaquetar(SOLICITUD, codec=CodecJSON(), delivery_mode=2)
+    assert propiedades.content_type == 'application/json'
+    assert propiedades.delivery_mode == 2
+    assert desempaquetar(body, propiedades) == SOLICITUD
+
+def test_sin_content_type_se_asume_json():
+    body, _ = empaquetar(SOLICITUD, codec=CodecJSON())
+    assert desempaquetar(body) == SOLICITUD
+
+def test_compacto_ida_y_vuelta_con_campos_parciales():
+    pytest.importorskip('msgpack')
+    codec = obtener_codec('compacto')
+    mensaje = {'tipo': 'notificacion', 'mensaje': 'hola', 'timestamp': 1.5}
+    body, propiedades = empaquetar(mensaje, codec=codec)
+    assert propiedades.content_type == codec.content_type
+    assert desempaquetar(body, propiedades) == mensaje
+    assert b'mensaje' not in body  # los nombres de campo no viajan
+
+def test_compacto_con_campos_fuera_del_esquema_usa_mapa():
+    pytest.importorskip('msgpack')
+    codec = obtener_codec('compacto')
+    mensaje = dict(SOLICITUD, extra={'anidado': [1, 2]})
+    body, propiedades = empaquetar(mensaje, codec=codec)
+    assert desempaquetar(body, propiedades) == mensaje
+
+def test_codec_desconocido_cae_en_json():
+    assert obtener_codec('no_existe').nombre == 'json'
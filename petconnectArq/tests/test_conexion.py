@@ -0,0 +1,86 @@
+import pytest
+
+def test_devolver_reutiliza_el_canal(pool):
+    canal = pool.obtener()
+    pool.devolver(canal)
+    assert pool.obtener() is canal
+    assert pool._creadas == 1
+
+def test_canal_muerto_se_reemplaza_al_obtener(pool):
+    canal = pool.obtener()
+    pool.devolver(canal)
+    canal.connection.close()
+
+    nuevo = pool.obtener()
+    assert nuevo is not canal and nuevo.is_open
+    assert pool._creadas == 1
+
+def test_reconexiones_no_agotan_el_pool(pool):
+    # Cada caída del broker devuelve un canal muerto: no debe quedar ocupando lugar
+    for _ in range(5):
+        canal = pool.obtener()
+        canal.connection.close()
+        pool.devolver(canal)
+    assert pool._creadas == 0
+
+    canales = [pool.obtener() for _ in range(pool.tamano)]
+    assert all(c.is_open for c in canales)
+
+def test_pool_lleno_falla_tras_el_timeout(pool):
+    canales = [pool.obtener() for _ in range(pool.tamano)]
+    with pytest.raises(RuntimeError, match='No hay conexiones libres'):
+        pool.obtener()
+
+    pool.devolver(canales[0], descartar=True)
+    assert pool.obtener().is_open
+
+def test_context_manager_descarta_ante_error_amqp(pool):
+    from pika.exceptions import AMQPChannelError
+    with pytest.raises(AMQPChannelError):
+        with pool.canal():
+            raise AMQPChannelError('canal cerrado')
+    assert pool._creadas == 0
+
+def test_conexion_dedicada_no_ocupa_el_pool(pool):
+    with pool.conexion_dedicada() as dedicado:
+        canales = [pool.obtener() for _ in range(pool.tamano)]
+        assert dedicado.is_open
+        assert pool._creadas == pool.tamano
+    assert not dedicado.connection.is_open
+    for canal in canales:
+        pool.devolver(canal)
+
+def test_declaracion_una_vez_por_pool_y_de_nuevo_tras_reconectar(pool, broker):
+    with pool.canal() as canal:
+        pool.declarar_cola(canal, 'trabajo', durable=True)
+    broker.eliminar_cola('trabajo')
+    with pool.canal() as canal:
+        pool.declarar_cola(canal, 'trabajo', durable=True)
+    assert 'trabajo' not in broker.colas  # memo: no se volvió a declarar
+
+    canal = pool.obtener()
+    pool.devolver(canal, descartar=True)
+    with pool.canal() as canal:
+        pool.declarar_cola(canal, 'trabajo', durable=True)
+    assert 'trabajo' in broker.colas
+
+def test_consumidores_no_toman_canales_del_pool(pool, monkeypatch):
+    import conexion
+    monkeypatch.setattr(conexion, 'pool', pool)
+    canal = conexion.conectar_rabbitmq()
+    assert canal.is_open and pool._creadas == 0
+    assert id(canal) not in pool._entradas
+    canal.connection.close()
+
+def test_redeclarar_distinto_llega_al_broker(pool):
+    from pika.exceptions import ChannelClosedByBroker
+    with pool.canal() as canal:
+        pool.declarar_cola(canal, 'trabajo', durable=True)
+    with pytest.raises(ChannelClosedByBroker) as error:
+        with pool.canal() as canal:
+            pool.declarar_cola(canal, 'trabajo', durable=False)
+    assert error.value.reply_code == 406
+
+    with pool.canal() as canal:
+        pool.declarar_cola(canal, 'trabajo', durable=True)
+        pool.declarar_cola(canal, 'trabajo', durable=True, arguments={})
@@ -0,0 +1,74 @@
+import pytest
+
+from codec import empaquetar
+from conftest import esperar
+from consumidor import ConsumidorResultados
+from historial import HistorialResultados
+from reintentos import cola_muerta
+
+def resultado(i):
+    return {
+        'tipo': 'resultado_adopcion', 'solicitud_id': f's{i}', 'mascota_id': 'Max_003',
+        'usuario_id': 'Laura', 'timestamp': 1000.0 + i,
+        'resultado': {'aprobado': True, 'puntaje': 6, 'mensaje': 'ok'}
+    }
+
+def publicar(canal, body, **propiedades):
+    canal.basic_publish(exchange='', routing_key='resultados_adopcion', body=body, **propiedades)
+
+@pytest.fixture
+def historial(tmp_path):
+    historial = HistorialResultados(str(tmp_path / 'historial.db'))
+    yield historial
+    historial.cerrar()
+
+@pytest.fixture
+def acks(canal, monkeypatch):
+    acks = []
+    basic_ack = canal.basic_ack
+
+    def registrar(delivery_tag=0, multiple=False):
+        acks.append((delivery_tag, multiple))
+        basic_ack(delivery_tag=delivery_tag, multiple=multiple)
+
+    monkeypatch.setattr(canal, 'basic_ack', registrar)
+    return acks
+
+def sin_pendientes(broker, canal):
+    return lambda: not broker.colas['resultados_adopcion'].mensajes and not canal._sin_ack
+
+def test_lote_completo_se_confirma_con_un_ack_multiple(broker, canal, historial, acks):
+    consumidor = ConsumidorResultados(canal=canal, lote=4, lote_ms=60000, historial=historial)
+    consumidor.suscribir()
+    for i in range(4):
+        body, propiedades = empaquetar(resultado(i))
+        publicar(canal, body, properties=propiedades)
+    esperar(sin_pendientes(broker, canal), canal.connection)
+    consumidor.detener()
+    assert acks == [(4, True)]
+    assert all(historial.obtener(f's{i}') for i in range(4))
+
+def test_lote_incompleto_se_procesa_al_vencer_el_plazo(broker, canal, historial, acks):
+    consumidor = ConsumidorResultados(canal=canal, lote=10, lote_ms=20, historial=historial)
+    consumidor.suscribir()
+    for i in range(3):
+        body, propiedades = empaquetar(resultado(i))
+        publicar(canal, body, properties=propiedades)
+    esperar(sin_pendientes(broker, canal), canal.connection)
+    consumidor.detener()
+    assert acks == [(3, True)]
+
+def test_un_resultado_ilegible_no_frena_al_resto_del_lote(broker, canal, historial, acks):
+    consumidor = ConsumidorResultados(canal=canal, lote=3, lote_ms=60000, historial=historial)
+    consumidor.suscribir()
+    body, propiedades = empaquetar(resultado(0))
+    publicar(canal, body, properties=propiedades)
+    publicar(canal, b'{"tipo": "resultado_adopcion"}')
+    body, propiedades = empaquetar(resultado(2))
+    publicar(canal, body, properties=propiedades)
+    esperar(sin_pendientes(broker, canal), canal.connection)
+    consumidor.detener()
+    # El ilegible va a la DLQ con su propio ack; el múltiple cubre a los otros dos
+    assert acks == [(2, False), (3, True)]
+    assert len(broker.colas[cola_muerta('resultados_adopcion')].mensajes) == 1
+    assert historial.obtener('s0') and historial.obtener('s2')
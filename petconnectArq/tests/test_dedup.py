@@ -0,0 +1,22 @@
+from dedup import RegistroVeredictos
+
+def test_recuerda_el_veredicto_por_solicitud():
+    registro = RegistroVeredictos(ruta='')
+    assert registro.obtener('s1') is None
+    registro.guardar('s1', {'resultado': 'APROBADA'})
+    assert registro.obtener('s1') == {'resultado': 'APROBADA'}
+    assert registro.obtener(None) is None
+
+def test_sobrevive_a_un_reinicio_con_sqlite(tmp_path):
+    ruta = str(tmp_path / 'veredictos.db')
+    registro = RegistroVeredictos(ruta=ruta)
+    registro.guardar('s1', {'resultado': 'RECHAZADA'})
+    registro.cerrar()
+    assert RegistroVeredictos(ruta=ruta).obtener('s1') == {'resultado': 'RECHAZADA'}
+
+def test_olvida_los_veredictos_vencidos(tmp_path):
+    ruta = str(tmp_path / 'veredictos.db')
+    registro = RegistroVeredictos(ttl_segundos=-1, ruta=ruta)
+    registro.guardar('s1', {'resultado': 'APROBADA'})
+    registro.cerrar()
+    assert RegistroVeredictos(ruta=ruta).obtener('s1') is None
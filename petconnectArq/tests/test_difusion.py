@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+import difusion
+from app import RabbitMQManager
+from codec import empaquetar
+from conftest import esperar
+from difusion import DifusionWeb
+
+@pytest.fixture
+def trabajadores(pool, monkeypatch):
+    """Dos workers web que comparten estado por el exchange del broker en memoria."""
+    monkeypatch.setattr(difusion, 'pool', pool)
+
+    def trabajador():
+        manager = RabbitMQManager()
+        manager.difusion = DifusionWeb(manager, exchange='petconnect.web.test')
+        manager.difusion.iniciar()
+        assert manager.difusion._listo.wait(2)
+        return manager
+
+    return trabajador(), trabajador()
+
+def titulos(manager, desde=0):
+    return [n['titulo'] for n in manager.get_notifications_since(desde)]
+
+def test_cada_worker_ve_las_notificaciones_de_todos(trabajadores):
+    a, b = trabajadores
+    a.add_notification('uno', 'de a', 'info')
+    b.add_notification('dos', 'de b', 'info')
+    esperar(lambda: len(a.notifications) == 2 and len(b.notifications) == 2)
+    assert sorted(titulos(a)) == sorted(titulos(b)) == ['dos', 'uno']
+
+def test_una_notificacion_atrasada_no_se_salta(trabajadores):
+    a, b = trabajadores
+    a.add_notification('nueva', 'm', 'info')
+    esperar(lambda: len(b.notifications) == 1)
+    visto = b.get_notifications()[0]['id']
+    # Creada antes en otro worker, pero llega después de la que ya vio el navegador
+    b.difusion.publicar('notificacion', titulo='atrasada', mensaje='m',
+                        tipo_notificacion='info', timestamp=time.time() - 60)
+    esperar(lambda: len(b.notifications) == 2)
+    assert titulos(b, visto) == ['atrasada']
+
+def test_el_veredicto_llega_al_worker_que_registro_la_solicitud(trabajadores, broker, canal):
+    a, b = trabajadores
+    # Registrada solo en `a` (p. ej. `b` arrancó después del evento 'registrada')
+    a.resultados.registrar('s1')
+    canal.queue_declare('respuestas_adopcion')
+    canal.basic_consume(queue='respuestas_adopcion', on_message_callback=b.handle_response)
+    body, propiedades = empaquetar({
+        'solicitud_id': 's1', 'mascota_id': 'Max_003', 'usuario': 'Laura', 'aprobado': True,
+        'resultado': 'APROBADA', 'motivo': 'ok', 'salario_usuario': 2000000, 'timestamp': time.time()
+    }, correlation_id='s1')
+    canal.basic_publish(exchange='', routing_key='respuestas_adopcion', body=body, properties=propiedades)
+    esperar(lambda: a.resultados.obtener('s1')['estado'] == 'completado', canal.connection)
+    assert a.resultados.obtener('s1')['resultado']['resultado'] == 'APROBADA'
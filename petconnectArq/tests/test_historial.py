@@ -0,0 +1,50 @@
+import pytest
+
+from historial import HistorialResultados
+
+def resultado(i, usuario='ana', timestamp=None):
+    return {
+        'solicitud_id': f's{i}',
+        'mascota_id': 'Max_003' if i % 2 else 'Luna_002',
+        'usuario_id': usuario,
+        'timestamp': timestamp if timestamp is not None else 1000.0 + i,
+        'resultado': {'aprobado': i % 3 == 0, 'puntaje': i % 6, 'mensaje': 'ok',
+                      'criterios_evaluados': {'tiempo_suficiente': True}}
+    }
+
+@pytest.fixture
+def historial(tmp_path):
+    historial = HistorialResultados(str(tmp_path / 'historial.db'))
+    yield historial
+    historial.cerrar()
+
+def paginar(historial, **filtros):
+    vistos, cursor = [], None
+    while True:
+        pagina = historial.consultar(cursor=cursor, **filtros)
+        vistos += pagina['resultados']
+        cursor = pagina['siguiente']
+        if cursor is None:
+            return vistos
+
+def test_cursor_recorre_todo_sin_repetir(historial):
+    # Varios con el mismo timestamp: el desempate por id no debe saltear ni repetir filas
+    historial.guardar_varios([resultado(i, timestamp=1000.0 + i // 3) for i in range(25)])
+    vistos = paginar(historial, por_pagina=4)
+    assert len(vistos) == 25
+    assert len({r['solicitud_id'] for r in vistos}) == 25
+    claves = [(r['timestamp'], r['id']) for r in vistos]
+    assert claves == sorted(claves, reverse=True)
+
+def test_filtros_por_usuario_y_mascota(historial):
+    historial.guardar_varios([resultado(i, usuario='ana' if i < 6 else 'luis') for i in range(10)])
+    assert {r['solicitud_id'] for r in paginar(historial, usuario='luis', por_pagina=3)} == {'s6', 's7', 's8', 's9'}
+    assert all(r['mascota_id'] == 'Max_003' for r in paginar(historial, mascota='Max_003'))
+
+def test_reentregas_se_ignoran(historial):
+    historial.guardar_varios([resultado(1)])
+    historial.guardar_varios([resultado(1), resultado(2)])
+    assert len(paginar(historial)) == 2
+    guardado = historial.obtener('s1')
+    assert guardado['criterios_evaluados'] == {'tiempo_suficiente': True}
+    assert guardado['aprobado'] is False
@@ -0,0 +1,31 @@
+from notificaciones import BufferNotificaciones, DifusorNotificaciones, nuevo_id_global
+
+def test_descarta_la_mas_antigua_al_llenarse():
+    buffer = BufferNotificaciones(capacidad=3)
+    for i in range(5):
+        buffer.agregar(f't{i}', 'm', 'info')
+    assert [n['titulo'] for n in buffer.todas()] == ['t4', 't3', 't2']
+
+def test_desde_devuelve_las_posteriores_en_orden():
+    buffer = BufferNotificaciones(capacidad=10)
+    vistas = [buffer.agregar(f't{i}', 'm', 'info') for i in range(4)]
+    assert [n['titulo'] for n in buffer.desde(vistas[1].id)] == ['t2', 't3']
+    assert buffer.desde(vistas[-1].id) == []
+
+def test_ids_crecen_aunque_se_reinicie_el_proceso():
+    # Los ids salen del reloj: uno nuevo supera a los que ya vieron los navegadores
+    anterior = nuevo_id_global()
+    assert BufferNotificaciones().agregar('t', 'm', 'info').id > anterior
+
+def test_limpiar_cuenta_las_limpiezas():
+    buffer = BufferNotificaciones()
+    buffer.agregar('t', 'm', 'info')
+    buffer.limpiar()
+    assert len(buffer) == 0 and buffer.limpiezas == 1
+
+def test_difusor_despierta_a_quien_espera():
+    difusor = DifusorNotificaciones()
+    version = difusor.version()
+    assert difusor.esperar(version, 0.01) == version
+    difusor.publicar()
+    assert difusor.esperar(version, 1) == version + 1
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+from planificador import Pendiente, PlanificadorSolicitudes
+
+def pendiente(usuario, mascota, prioridad=0):
+    return Pendiente(SimpleNamespace(delivery_tag=0), SimpleNamespace(priority=prioridad), b'',
+                     {'usuario': usuario, 'mascota_id': mascota})
+
+def ids(grupo):
+    return [(p.usuario, p.mascota_id) for p in grupo]
+
+def test_prioridad_primero():
+    planificador = PlanificadorSolicitudes(max_grupo=1)
+    planificador.agregar(pendiente('ana', 'Max_003', prioridad=1))
+    planificador.agregar(pendiente('luis', 'Luna_002', prioridad=8))
+    assert ids(planificador.siguiente_grupo()) == [('luis', 'Luna_002')]
+
+def test_turnos_entre_usuarios():
+    planificador = PlanificadorSolicitudes(max_grupo=1)
+    for mascota in ('a', 'b', 'c'):
+        planificador.agregar(pendiente('ana', mascota))
+    planificador.agregar(pendiente('luis', 'd'))
+    orden = [ids(planificador.siguiente_grupo())[0][0] for _ in range(4)]
+    assert orden == ['ana', 'luis', 'ana', 'ana']
+    assert planificador.siguiente_grupo() == [] and len(planificador) == 0
+
+def test_agrupa_por_mascota_hasta_el_maximo():
+    planificador = PlanificadorSolicitudes(max_grupo=3)
+    for usuario in ('ana', 'luis', 'eva', 'juan'):
+        planificador.agregar(pendiente(usuario, 'Max_003'))
+    planificador.agregar(pendiente('ana', 'Luna_002'))
+    grupo = planificador.siguiente_grupo()
+    assert len(grupo) == 3 and {p.mascota_id for p in grupo} == {'Max_003'}
+    assert len(planificador) == 2
+
+def test_limite_por_usuario():
+    planificador = PlanificadorSolicitudes(tasa_usuario=1, rafaga_usuario=1, max_grupo=1)
+    planificador.agregar(pendiente('ana', 'a'))
+    planificador.agregar(pendiente('ana', 'b'))
+    assert planificador.siguiente_grupo()
+    assert planificador.siguiente_grupo() == []
+    assert 0 < planificador.espera() <= 1
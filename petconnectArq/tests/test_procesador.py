@@ -0,0 +1,113 @@
+import time
+
+import pytest
+
+from codec import empaquetar, desempaquetar
+from conftest import esperar
+from procesador import ProcesadorAdopciones
+
+def solicitud(solicitud_id='s1', **campos):
+    return dict({
+        'tipo': 'solicitud_adopcion', 'solicitud_id': solicitud_id, 'mascota_id': 'Max_003',
+        'usuario_id': 'Laura', 'datos_adicionales': {}, 'timestamp': time.time(), 'estado': 'pendiente'
+    }, **campos)
+
+def publicar(canal, mensaje, **propiedades):
+    body, propiedades = empaquetar(mensaje, message_id=mensaje['solicitud_id'], **propiedades)
+    canal.basic_publish(exchange='', routing_key='solicitudes_adopcion', body=body, properties=propiedades)
+
+def mensajes(broker, cola):
+    return [desempaquetar(m.body, m.properties) for m in broker.colas[cola].mensajes]
+
+@pytest.fixture
+def procesador(canal):
+    procesador = ProcesadorAdopciones(canal=canal, demora=(0,), trabajadores=1, planificar=False)
+    canal.queue_declare('respuestas_adopcion')
+    yield procesador
+    procesador.detener(timeout=1)
+
+def drenado(broker, canal):
+    return lambda: not broker.colas['solicitudes_adopcion'].mensajes and not canal._sin_ack
+
+def test_publica_el_resultado_de_una_solicitud(broker, canal, procesador):
+    procesador.suscribir()
+    publicar(canal, solicitud())
+    esperar(drenado(broker, canal), canal.connection)
+    [resultado] = mensajes(broker, 'resultados_adopcion')
+    assert resultado['solicitud_id'] == 's1' and resultado['usuario_id'] == 'Laura'
+
+def test_responde_a_reply_to_con_el_correlation_id(broker, canal, procesador):
+    procesador.suscribir()
+    publicar(canal, solicitud(usuario='Laura', salario=2000000, accion='inicio_proceso'),
+             reply_to='respuestas_adopcion', correlation_id='s1')
+    esperar(drenado(broker, canal), canal.connection)
+    [respuesta] = broker.colas['respuestas_adopcion'].mensajes
+    assert respuesta.properties.correlation_id == 's1'
+    assert desempaquetar(respuesta.body, respuesta.properties)['resultado'] == 'APROBADA'
+    assert not mensajes(broker, 'resultados_adopcion')
+
+def test_no_vuelve_a_decidir_las_solicitudes_que_decidio_la_web(broker, canal, procesador):
+    # process_adoption (modo síncrono) publica sin reply_to y decide por su cuenta
+    procesador.suscribir()
+    publicar(canal, {'tipo': 'solicitud_adopcion', 'solicitud_id': 's1', 'mascota_id': 'Max_003',
+                     'usuario': 'Laura', 'salario': 2000000, 'timestamp': time.time(),
+                     'accion': 'inicio_proceso'})
+    esperar(drenado(broker, canal), canal.connection)
+    assert not mensajes(broker, 'resultados_adopcion')
+    assert not broker.colas['solicitudes_adopcion.dlq'].mensajes
+
+def test_varios_trabajadores_confirman_desde_el_hilo_de_la_conexion(broker, canal):
+    procesador = ProcesadorAdopciones(canal=canal, demora=(0.01,), trabajadores=4, planificar=False)
+    procesador.suscribir()
+    for i in range(12):
+        publicar(canal, solicitud(f's{i}'))
+    esperar(drenado(broker, canal), canal.connection)
+    procesador.detener(timeout=1)
+    assert sorted(r['solicitud_id'] for r in mensajes(broker, 'resultados_adopcion')) == sorted(f's{i}' for i in range(12))
+    assert procesador._en_vuelo == 0
+
+def test_iniciar_procesamiento_fuera_del_hilo_principal(canal):
+    import threading
+    procesador = ProcesadorAdopciones(canal=canal, demora=(0,), trabajadores=1, planificar=False)
+    errores = []
+
+    def correr():
+        try:
+            procesador.iniciar_procesamiento()
+        except Exception as e:
+            errores.append(e)
+
+    hilo = threading.Thread(target=correr, daemon=True)
+    hilo.start()
+    esperar(lambda: procesador._consumer_tag is not None or errores or not hilo.is_alive())
+    canal.stop_consuming()
+    hilo.join(2)
+    assert not errores and not hilo.is_alive()
+
+def test_no_recalcula_una_solicitud_reentregada(broker, canal, procesador):
+    procesador.suscribir()
+    publicar(canal, solicitud(usuario='Laura', salario=2000000, accion='inicio_proceso'),
+             reply_to='respuestas_adopcion', correlation_id='s1')
+    esperar(drenado(broker, canal), canal.connection)
+    publicar(canal, solicitud(usuario='Laura', salario=100, accion='inicio_proceso'),
+             reply_to='respuestas_adopcion', correlation_id='s1')
+    esperar(drenado(broker, canal), canal.connection)
+    respuestas = [desempaquetar(m.body, m.properties) for m in broker.colas['respuestas_adopcion'].mensajes]
+    # La reentrega recibe el veredicto guardado, no uno nuevo con el salario cambiado
+    assert [r['resultado'] for r in respuestas] == ['APROBADA', 'APROBADA']
+
+def test_modo_planificado_decide_juntas_las_de_la_misma_mascota(broker, canal):
+    procesador = ProcesadorAdopciones(canal=canal, demora=(0,), trabajadores=1, planificar=True)
+    grupos = []
+    evaluar_grupo = procesador.evaluar_grupo
+    procesador.evaluar_grupo = lambda grupo: grupos.append(len(grupo)) or evaluar_grupo(grupo)
+    procesador.canal  # declara las colas antes de publicar
+    for i in range(6):
+        publicar(canal, solicitud(f's{i}', usuario_id=f'u{i % 2}'))
+    procesador.suscribir()
+    esperar(drenado(broker, canal), canal.connection)
+    procesador.detener(timeout=1)
+    assert sorted(r['solicitud_id'] for r in mensajes(broker, 'resultados_adopcion')) == sorted(f's{i}' for i in range(6))
+    # La primera llega sola; el resto se acumula en la ventana mientras tanto
+    assert sum(grupos) == 6 and len(grupos) < 6
+    assert procesador._en_vuelo == 0
@@ -0,0 +1,52 @@
+import pytest
+
+import conexion
+from codec import desempaquetar
+from conexion import TransporteMemoria
+from productor import ProductorAdopciones
+
+@pytest.fixture
+def productor(broker, canal, monkeypatch):
+    # El canal de confirmaciones sale del transporte del pool: el mismo broker del test
+    monkeypatch.setattr(conexion.pool, '_transporte', TransporteMemoria(broker))
+    # notificaciones acepta 2 mensajes listos y rechaza (nack) el resto
+    monkeypatch.setitem(conexion.ARGUMENTOS_COLAS, 'notificaciones',
+                        {'x-max-length': 2, 'x-overflow': 'reject-publish'})
+    productor = ProductorAdopciones(max_reintentos=2, timeout_confirmacion=5, canal=canal, pausa_max_ms=0)
+    yield productor
+    if productor._canal_confirmaciones is not None:
+        productor._canal_confirmaciones.close()
+
+def notificaciones(broker):
+    return [desempaquetar(m.body, m.properties)['mensaje'] for m in broker.colas['notificaciones'].mensajes]
+
+def test_lote_reintenta_solo_los_rechazados(broker, productor, monkeypatch):
+    publicados = []
+    original = productor.publicar_confirmado
+
+    def registrar(mensajes):
+        publicados.append(len(mensajes))
+        return original(mensajes)
+
+    # Entre intentos la cola se drena: el reintento entra
+    drenados = []
+    monkeypatch.setattr('productor.time.sleep', lambda s: drenados.extend(notificaciones(broker))
+                        or broker.purgar_cola('notificaciones'))
+    monkeypatch.setattr(productor, 'publicar_confirmado', registrar)
+
+    total = productor.publicar_lote(notificaciones=[('ana', f'n{i}', 'info') for i in range(3)])
+    assert total == 3 and publicados == [3]
+    assert drenados == ['n0', 'n1'] and notificaciones(broker) == ['n2']
+    assert not productor._sin_confirmar
+
+def test_lote_falla_si_el_broker_sigue_rechazando(broker, productor, monkeypatch):
+    monkeypatch.setattr('productor.time.sleep', lambda s: None)
+    with pytest.raises(RuntimeError, match='1 mensajes rechazados'):
+        productor.publicar_lote(notificaciones=[('ana', f'n{i}', 'info') for i in range(3)])
+    assert notificaciones(broker) == ['n0', 'n1']
+
+def test_mandatory_sin_destino_cuenta_como_rechazo(broker, productor, monkeypatch):
+    monkeypatch.setattr('productor.time.sleep', lambda s: None)
+    productor.canal  # declara las colas
+    with pytest.raises(RuntimeError, match='rechazados'):
+        productor.publicar_confirmado([('no_existe', b'{}', None)])
@@ -0,0 +1,34 @@
+from reglas import CRITERIOS, MotorReglas, evaluar_solicitud_web, SALARIO_MINIMO
+
+CATALOGO = {
+    'Max_003': {'nombre': 'Max', 'tipo': 'perro', 'dificultad': 'media'},
+    'Molly_004': {'nombre': 'Molly', 'tipo': 'perro', 'dificultad': 'alta'},
+    'Raro_009': {'nombre': 'Raro', 'tipo': 'conejo', 'dificultad': 'extrema'},
+}
+
+def test_valores_desconocidos_siguen_las_reglas_originales():
+    motor = MotorReglas(CATALOGO)
+    experiencia, vivienda, compatibilidad, _, _ = motor.probabilidades(
+        'Raro_009', {'experiencia_previa': None, 'tipo_vivienda': 'duplex', 'otros_animales': None})
+    # Dificultad desconocida no exige experiencia; un no-perro sigue las reglas de gato
+    assert (experiencia, vivienda, compatibilidad) == (1.0, 1.0, 1.0)
+
+def test_datos_si_no_por_valor_de_verdad():
+    motor = MotorReglas(CATALOGO)
+    assert motor.probabilidades('Molly_004', {'experiencia_previa': 'si'})[0] == 1.0
+    assert motor.probabilidades('Molly_004', {'experiencia_previa': None})[0] == 0.0
+    assert motor.probabilidades('Max_003', {'otros_animales': 1})[2] == 0.6
+
+def test_lote_coincide_con_la_evaluacion_por_fila():
+    # Solo los criterios deterministas, para que el sorteo no influya
+    motor = MotorReglas(CATALOGO, criterios=CRITERIOS[:2], puntaje_minimo=2)
+    ids = ['Max_003', 'Molly_004', 'Raro_009', 'No_existe']
+    datos = {'experiencia_previa': [True, None, 0, 'si'], 'tipo_vivienda': ['casa', 'duplex', 'duplex', 'x']}
+    por_fila = [motor.evaluar(m, {d: c[i] for d, c in datos.items()})[1:] for i, m in enumerate(ids)]
+    puntajes, aprobados = motor.evaluar_lote(ids, datos, semilla=1)
+    assert list(zip(puntajes, aprobados)) == por_fila == [(2, True), (0, False), (2, True), (1, False)]
+
+def test_veredicto_web():
+    assert evaluar_solicitud_web('Max_003', 'Laura', SALARIO_MINIMO)['aprobado']
+    assert not evaluar_solicitud_web('Max_003', 'Ana', SALARIO_MINIMO)['aprobado']
+    assert evaluar_solicitud_web('Max_003', 'Laura', 1)['resultado'] == 'RECHAZADA'
@@ -0,0 +1,50 @@
+from conftest import esperar
+from reintentos import PoliticaReintentos, cola_muerta, ENCABEZADO_INTENTOS
+
+def preparar(canal, error, max_intentos=3):
+    politica = PoliticaReintentos('trabajo', max_intentos=max_intentos, base_ms=10)
+    canal.queue_declare('trabajo')
+    politica.declarar(canal)
+    entregas = []
+
+    def fallar(ch, method, properties, body):
+        entregas.append(politica.intentos(properties))
+        politica.fallo(ch, method, properties, body, error)
+
+    canal.basic_consume(queue='trabajo', on_message_callback=fallar)
+    canal.basic_publish(exchange='', routing_key='trabajo', body=b'{}')
+    return entregas
+
+def en_dlq(canal):
+    return canal.queue_declare(cola_muerta('trabajo'), passive=True).method.message_count
+
+def test_error_transitorio_reintenta_y_termina_en_dlq(canal):
+    entregas = preparar(canal, RuntimeError('broker lento'), max_intentos=3)
+    esperar(lambda: en_dlq(canal) == 1, canal.connection)
+    # Vuelve a la cola original tras cada TTL: 3 entregas en total
+    assert entregas == [0, 1, 2]
+
+    muerto = canal.broker.colas[cola_muerta('trabajo')].mensajes[0]
+    assert muerto.properties.headers[ENCABEZADO_INTENTOS] == 3
+    assert not canal._sin_ack
+
+def test_error_permanente_va_directo_a_dlq(canal):
+    entregas = preparar(canal, KeyError('mascota_id'))
+    esperar(lambda: en_dlq(canal) == 1, canal.connection)
+    assert entregas == [0]
+    assert canal.queue_declare('trabajo.reintento.1', passive=True).method.message_count == 0
+
+def test_si_no_puede_republicar_rechaza_al_dlx_de_la_cola(canal, monkeypatch):
+    politica = PoliticaReintentos('trabajo', max_intentos=3, base_ms=10)
+    canal.queue_declare('trabajo', arguments={'x-dead-letter-exchange': 'trabajo.dlx'})
+    politica.declarar(canal)
+    canal.basic_publish(exchange='', routing_key='trabajo', body=b'{}')
+
+    def sin_republicar(**kwargs):
+        raise RuntimeError('canal caído')
+
+    monkeypatch.setattr(canal, 'basic_publish', sin_republicar)
+    canal.basic_consume(queue='trabajo', on_message_callback=lambda ch, method, properties, body:
+                        politica.fallo(ch, method, properties, body, RuntimeError('broker lento')))
+    esperar(lambda: en_dlq(canal) == 1, canal.connection)
+    assert not canal._sin_ack
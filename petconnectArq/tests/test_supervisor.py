@@ -0,0 +1,58 @@
+import time
+from types import SimpleNamespace
+
+from supervisor import GrupoTrabajadores
+
+class ColaFija:
+    """Sustituye a ControlAdmision con una lectura fija de la cola."""
+    def __init__(self, mensajes=0, tasa_drenaje=0.0):
+        self.lectura = {'mensajes': mensajes, 'tasa_drenaje': tasa_drenaje}
+
+    def estado(self):
+        return dict(self.lectura)
+
+def trabajador(procesados=0, vivo=True, iniciado=None):
+    proceso = SimpleNamespace(is_alive=lambda: vivo, exitcode=None if vivo else 1, name='procesador-x', pid=1)
+    return SimpleNamespace(proceso=proceso, procesados=SimpleNamespace(value=procesados), leidos=0,
+                           iniciado=iniciado if iniciado is not None else time.monotonic())
+
+def grupo(cola, trabajadores, enfriamiento_s=60):
+    grupo = GrupoTrabajadores('procesador', 1, 4, contexto=None, objetivo_s=30, enfriamiento_s=enfriamiento_s)
+    grupo.control = cola
+    grupo.trabajadores = trabajadores
+    grupo.deseados = len(trabajadores)
+    return grupo
+
+def test_escala_de_inmediato_si_la_cola_crece():
+    # 1 trabajador a 5/s (suavizado) con 300 en cola: 5/s de entrada + 300/30 s = 15/s -> 3
+    g = grupo(ColaFija(mensajes=300), [trabajador(procesados=10)])
+    assert g.decidir(intervalo=1) is not None
+    assert g.deseados == 3
+
+def test_respeta_el_maximo():
+    g = grupo(ColaFija(mensajes=100000), [trabajador(procesados=10)])
+    g.decidir(intervalo=1)
+    assert g.deseados == 4
+
+def test_reduce_de_a_uno_y_con_enfriamiento():
+    # Cola vacía y nada procesado: sobran trabajadores
+    trabajadores = [trabajador() for _ in range(3)]
+    g = grupo(ColaFija(mensajes=0), trabajadores, enfriamiento_s=60)
+    assert g.decidir(intervalo=1) is None  # recién cambió: espera el enfriamiento
+
+    g.enfriamiento_s = 0
+    g.decidir(intervalo=1)
+    assert g.deseados == 2
+
+def test_sin_ritmo_medido_no_cambia():
+    g = grupo(ColaFija(mensajes=50), [trabajador()])
+    assert g.decidir(intervalo=1) is None
+    assert g.deseados == 1
+
+def test_caida_al_arrancar_reinicia_con_espera():
+    g = grupo(ColaFija(), [trabajador(vivo=False)])
+    g.revisar()
+    assert g.trabajadores == [] and g.reinicios == 1
+    assert g.reiniciar_desde > time.monotonic()
+    g.ajustar()  # todavía en espera: no lanza (el contexto es None)
+    assert g.trabajadores == []
@@ -0,0 +1,176 @@
+"""Trazas opcionales de las etapas calientes, propagadas entre procesos por cabeceras.
+
+Cada tramo (span) mide una etapa y se exporta al terminar como una línea JSON
+(al logger 'petconnect.trazas' o a PETCONNECT_TRAZAS_ARCHIVO). Al publicar, el
+tramo actual viaja en la cabecera AMQP 'traceparent' (formato W3C), y quien
+consume el mensaje abre su tramo como hijo de ese: una solicitud se puede
+seguir desde la web hasta el consumidor con el mismo traza_id.
+
+Desactivadas (por defecto) cuestan una comparación por llamada. Se activan
+con PETCONNECT_TRAZAS=1 o en caliente con activar_trazas() (SIGUSR2 en los
+procesos que llaman a perfilador.instalar_senales(), POST /trazas en la web
+con PETCONNECT_ADMIN_TOKEN).
+La decisión de muestreo se toma en la raíz y la heredan todos los tramos hijos.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger('petconnect.trazas')
+
+TRAZAS_ACTIVAS = os.environ.get('PETCONNECT_TRAZAS', '0') == '1'
+# Fracción de trazas nuevas que se registran (las hijas siguen a su raíz)
+TRAZAS_MUESTREO = float(os.environ.get('PETCONNECT_TRAZAS_MUESTREO', '1'))
+# Archivo JSON Lines para los tramos ('' = logger 'petconnect.trazas')
+TRAZAS_ARCHIVO = os.environ.get('PETCONNECT_TRAZAS_ARCHIVO', '')
+
+ENCABEZADO_TRAZA = 'traceparent'
+
+_estado = {'activo': TRAZAS_ACTIVAS, 'muestreo': TRAZAS_MUESTREO}
+_actual = contextvars.ContextVar('petconnect_tramo', default=None)
+_archivo = None
+_lock_archivo = threading.Lock()
+
+def activar_trazas(activo=True, muestreo=None):
+    """Activa o desactiva las trazas en caliente (y opcionalmente cambia el muestreo)."""
+    _estado['activo'] = bool(activo)
+    if muestreo is not None:
+        _estado['muestreo'] = max(0.0, min(1.0, float(muestreo)))
+    logger.info(f"[Trazas] {'activadas' if _estado['activo'] else 'desactivadas'} (muestreo {_estado['muestreo']})")
+    return estado_trazas()
+
+def estado_trazas():
+    return dict(_estado)
+
+class _Remoto:
+    """Contexto de un tramo de otro proceso, leído de la cabecera traceparent."""
+    __slots__ = ('traza_id', 'tramo_id', 'muestreado')
+
+    def __init__(self, traza_id, tramo_id, muestreado):
+        self.traza_id = traza_id
+        self.tramo_id = tramo_id
+        self.muestreado = muestreado
+
+def _leer_encabezado(valor):
+    try:
+        version, traza_id, tramo_id, banderas = valor.split('-')
+        return _Remoto(traza_id, tramo_id, int(banderas, 16) & 1 == 1)
+    except (AttributeError, ValueError):
+        return None
+
+def _padre_de(padre):
+    # Tramo, properties de pika (con traceparent) o None; sin cabecera vale el tramo actual
+    if padre is None or isinstance(padre, (Tramo, _Remoto)):
+        return padre if padre is not None else _actual.get()
+    cabeceras = getattr(padre, 'headers', None) or {}
+    return _leer_encabezado(cabeceras.get(ENCABEZADO_TRAZA)) or _actual.get()
+
+class Tramo:
+    """Span: mide el bloque `with` y se exporta al salir si su traza está muestreada."""
+    __slots__ = ('nombre', 'traza_id', 'tramo_id', 'padre_id', 'muestreado',
+                 'atributos', 'inicio', '_t0', '_token')
+
+    def __init__(self, nombre, padre=None, **atributos):
+        padre = _padre_de(padre)
+        self.nombre = nombre
+        self.tramo_id = os.urandom(8).hex()
+        if padre is None:
+            self.traza_id = os.urandom(16).hex()
+            self.padre_id = None
+            self.muestreado = random.random() < _estado['muestreo']
+        else:
+            self.traza_id = padre.traza_id
+            self.padre_id = padre.tramo_id
+            self.muestreado = padre.muestreado
+        self.atributos = atributos
+
+    def encabezado(self):
+        return f"00-{self.traza_id}-{self.tramo_id}-{'01' if self.muestreado else '00'}"
+
+    def __enter__(self):
+        self.inicio = time.time()
+        self._t0 = time.perf_counter()
+        self._token = _actual.set(self)
+        return self
+
+    def __exit__(self, tipo_excepcion, excepcion, traza):
+        duracion = time.perf_counter() - self._t0
+        _actual.reset(self._token)
+        if self.muestreado:
+            if excepcion is not None:
+                self.atributos['error'] = repr(excepcion)[:200]
+            _exportar(self, duracion)
+        return False
+
+class _TramoNulo:
+    """Lo que devuelve tramo() con las trazas desactivadas: no mide nada."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_excepcion, excepcion, traza):
+        return False
+
+_NULO = _TramoNulo()
+
+def tramo(nombre, padre=None, **atributos):
+    """Context manager de un tramo hijo de `padre` (properties del mensaje, o el tramo actual)."""
+    if not _estado['activo']:
+        return _NULO
+    return Tramo(nombre, padre, **atributos)
+
+def trazado(nombre=None):
+    """Decorador: ejecuta la función dentro de un tramo con su nombre."""
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envuelta(*args, **kwargs):
+            if not _estado['activo']:
+                return funcion(*args, **kwargs)
+            with Tramo(etiqueta):
+                return funcion(*args, **kwargs)
+        return envuelta
+    return decorador
+
+def encabezados_traza(cabeceras=None):
+    """Cabeceras AMQP con el traceparent del tramo actual (o `cabeceras` tal cual si no hay)."""
+    actual = _actual.get() if _estado['activo'] else None
+    if actual is None:
+        return cabeceras
+    return dict(cabeceras or {}, **{ENCABEZADO_TRAZA: actual.encabezado()})
+
+def en_contexto(funcion):
+    """Envuelve `funcion` para que corra con el tramo actual aunque se ejecute en otro hilo.
+
+    Para las publicaciones que se difieren al hilo de la conexión (add_callback_threadsafe).
+    """
+    if _actual.get() is None:
+        return funcion
+    return functools.partial(contextvars.copy_context().run, funcion)
+
+def _exportar(tramo, duracion):
+    global _archivo
+    registro = {
+        'nombre': tramo.nombre,
+        'traza_id': tramo.traza_id,
+        'tramo_id': tramo.tramo_id,
+        'padre_id': tramo.padre_id,
+        'inicio': tramo.inicio,
+        'duracion_ms': round(duracion * 1000, 3),
+        'pid': os.getpid(),
+        'hilo': threading.current_thread().name,
+        'atributos': tramo.atributos
+    }
+    linea = json.dumps(registro, ensure_ascii=False, default=str)
+    if not TRAZAS_ARCHIVO:
+        logger.info(linea)
+        return
+    with _lock_archivo:
+        if _archivo is None:
+            _archivo = open(TRAZAS_ARCHIVO, 'a', buffering=1, encoding='utf-8')
+        _archivo.write(linea + '\n')
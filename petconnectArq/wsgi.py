@@ -0,0 +1,15 @@
+"""Punto de entrada WSGI para producción (varios workers y/o nodos).
+
+  gunicorn -c gunicorn.conf.py wsgi:app
+
+Activa por defecto las notificaciones compartidas: cada worker se suscribe al
+exchange fanout de difusion.py, así que /notificaciones, el stream SSE y
+/resultado_adopcion responden igual sin importar qué worker atienda.
+No usar --preload: las conexiones y los hilos de escucha se crean por worker.
+"""
+import os
+
+os.environ.setdefault('PETCONNECT_NOTIFICACIONES_COMPARTIDAS', '1')
+os.environ.setdefault('PETCONNECT_MODO_ASINCRONO', '1')
+
+from app import app  # noqa: E402